@@ -1,7 +1,15 @@
-from typing import List, Tuple
+import asyncio
+import threading
+from contextlib import nullcontext
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
 
+import ollama
+
+from telemetry.metrics import collect, latency_summary
+from telemetry.trace import tracing
 from tools.db_connection import DBConnection
 from tools.file_tracker import FileTracker
+from .context_budget import ContextBudget
 from .decomposer import QueryDecomposer
 from .executor import TaskExecutor
 
@@ -13,6 +21,13 @@ class Agent:
     - initialize model, FileTracker and DBConnection
     - run the tracker, obtain added/modified/deleted tools
     - sync ChromaDB accordingly via DBConnection
+
+    The query pipeline is asynchronous (see :class:`AsyncAgent`). The
+    synchronous :meth:`ask` runs it on an event loop thread owned by the
+    agent, with one ``ollama.AsyncClient`` whose connections are reused
+    across queries. Calls from several threads at once share that loop.
+    :meth:`close` (or leaving a ``with Agent(...)`` block) stops the loop
+    and closes the client.
     """
 
     def __init__(
@@ -20,8 +35,33 @@ class Agent:
         model: str = "llama3.1:8b",
         db: DBConnection = None,
         tracker: FileTracker = None,
+        max_workers: int = 4,
+        aggregation: str = "auto",
+        prewarm_tools: int = 0,
+        max_tool_rounds: int = 1,
+        context_budget: Optional[ContextBudget] = None,
     ):
+        """
+        :param max_workers: Maximum number of independent tasks of one plan
+            executed concurrently.
+        :param aggregation: How task answers are combined, one of
+            ``auto``, ``passthrough``, ``template`` or ``llm`` (see
+            :data:`agent.executor.AGGREGATION_MODES`).
+        :param prewarm_tools: Import this many of the most used tools (by
+            recorded call counts) on a background thread at startup; other
+            tools are imported on their first call.
+        :param max_tool_rounds: Tool-call rounds per task; each round runs
+            the model's tool calls concurrently and makes one follow-up chat.
+        :param context_budget: Token budget applied to task prompts and
+            aggregation inputs; defaults to :class:`ContextBudget` defaults.
+            Shared by all queries, so its :meth:`~ContextBudget.stats`
+            cover the agent's lifetime.
+        """
         self.model = model
+        self.max_workers = max_workers
+        self.aggregation = aggregation
+        self.max_tool_rounds = max_tool_rounds
+        self.context_budget = context_budget or ContextBudget()
         
         # instantiate or use provided FileTracker
         self.tracker = tracker or FileTracker()
@@ -29,36 +69,209 @@ class Agent:
         # instantiate or use provided DBConnection
         self.db = db or DBConnection()
 
+        # capability JSONs parsed once and shared with tasks and update_db
+        self.catalog = self.db.catalog
+
         # Run tracker and sync DB on initialization
         changes = self.tracker.get_file_changes()
         self.db.update_db(changes=changes)
 
-        # build runtime tool registry (callable functions)
-        self.tool_registry = self.tracker.get_tool_registry()
+        # long-lived so its fast-path counters and plan cache span queries
+        self.decomposer = QueryDecomposer(model=self.model)
+
+        # build runtime tool registry (lazy callables, imported on first call)
+        self.tool_registry = self.tracker.get_tool_registry(
+            self.tracker.capabilities_folder, self.tracker.functions_folder
+        )
+        if prewarm_tools:
+            self.tool_registry.prewarm(top_n=prewarm_tools)
+
+        # event loop thread and client behind the sync API, started on first use
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_client: Optional[ollama.AsyncClient] = None
+        self._loop_lock = threading.Lock()
 
         print(
             f"\n\n\nAgent initialized with model {self.model}. Tool registry: {len(self.tool_registry.keys())}"
         )
 
-    def ask(self, user_input: str) -> Tuple[dict, List[str]]:
+    def _event_loop(self) -> Tuple[asyncio.AbstractEventLoop, ollama.AsyncClient]:
+        """Return the agent's event loop and client, starting the loop thread
+        on first use."""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="agent-loop", daemon=True)
+                thread.start()
+                self._loop, self._loop_thread = loop, thread
+                self._loop_client = ollama.AsyncClient()
+            return self._loop, self._loop_client
+
+    def close(self) -> None:
+        """Close the client and stop the event loop thread of the sync API.
+
+        Safe to call more than once; a later :meth:`ask` starts a new loop.
+        """
+        with self._loop_lock:
+            loop, thread, client = self._loop, self._loop_thread, self._loop_client
+            self._loop = self._loop_thread = self._loop_client = None
+        if loop is None:
+            return
+
+        async def shutdown() -> None:
+            await client.close()
+            await loop.shutdown_asyncgens()
+            await loop.shutdown_default_executor()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    def __enter__(self) -> "Agent":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    def sync_tools(self) -> dict:
+        """Pick up tool edits made since startup: re-embed changed
+        capabilities and reload modified tools (and their argument
+        validators) on their next call. Returns the detected changes."""
+        changes = self.tracker.get_file_changes()
+        self.db.update_db(changes=changes)
+        self.tool_registry.apply_changes(changes)
+        return changes
+
+    def _make_executor(self) -> TaskExecutor:
+        return TaskExecutor(
+            model=self.model,
+            max_workers=self.max_workers,
+            aggregation=self.aggregation,
+            max_tool_rounds=self.max_tool_rounds,
+            context_budget=self.context_budget,
+        )
+
+    def ask(
+        self, user_input: str, with_metrics: bool = False, trace_file: Optional[str] = None
+    ) -> Tuple[dict, List[str]]:
         """A more advanced execution pipeline using query decomposition.
 
         Steps:
         1. Decompose the user query into atomic tasks with potential dependencies.
-        2. Execute each task sequentially while resolving dependencies.
+        2. Execute independent tasks concurrently while resolving dependencies.
         3. Aggregate all task results into a single final response.
+
+        :param with_metrics: Also return the query's per-stage breakdown
+            (:meth:`telemetry.metrics.QueryMetrics.as_dict`) as a third element.
+        :param trace_file: Record this query's timeline (decompose, per-task
+            route/embed/LLM/tool spans, aggregate) and write it to this path
+            as Chrome Trace Event JSON, viewable in Perfetto.
+
+        Blocks until the pipeline finishes on the agent's event loop thread,
+        so it must not be called from a coroutine running on that loop.
         """
-        # Initialize decomposer and executor
-        decomposer = QueryDecomposer(model=self.model)
-        executor = TaskExecutor(model=self.model)
+        loop, client = self._event_loop()
+        return asyncio.run_coroutine_threadsafe(
+            self._aask(user_input, with_metrics, trace_file, client), loop
+        ).result()
+
+    async def _aask(
+        self, user_input: str, with_metrics: bool, trace_file: Optional[str], client: ollama.AsyncClient
+    ) -> Tuple[dict, List[str]]:
+        # Initialize executor (the decomposer is shared to keep its plan cache)
+        decomposer = self.decomposer
+        executor = self._make_executor()
+
+        messages = [{"role": "user", "content": user_input}]
+
+        with collect() as metrics, self._trace(trace_file, user_input):
+            # 1. Decompose
+            print(f"Decomposing query: {user_input}")
+            plan = await decomposer.adecompose(user_input, messages=messages, client=client)
+
+            # 2. Execute & 3. Aggregate
+            final_message, tools_used = await executor.aexecute(plan, self.db, self.tool_registry, client)
+
+        if with_metrics:
+            return final_message, tools_used, metrics.as_dict()
+        return final_message, tools_used
+
+    @staticmethod
+    def _trace(trace_file: Optional[str], user_input: str):
+        if not trace_file:
+            return nullcontext()
+        return tracing(trace_file, name="Agent.ask", query=user_input)
+
+    @staticmethod
+    def latency_summary() -> dict:
+        """Rolling p50/p95/p99 (seconds) per stage over recent queries."""
+        return latency_summary()
+
+    def ask_stream(self, user_input: str) -> Iterator[dict]:
+        """Streaming variant of :meth:`ask` that yields progress events.
+
+        Events are dicts with a ``type`` key, in this order:
+
+        - ``{"type": "plan", "tasks": [{"id", "query", "depends_on"}, ...]}``
+        - ``{"type": "task", "id", "query", "status", "tools_used"}`` as each
+          task completes or fails
+        - ``{"type": "token", "content"}`` for every chunk of the aggregated
+          answer, as Ollama streams it
+        - ``{"type": "done", "message", "tools_used"}`` with the full answer
+
+        Like :meth:`ask`, it drives the async pipeline on the agent's event
+        loop thread, one event at a time.
+        """
+        loop, client = self._event_loop()
+        events = self._aask_stream(user_input, client)
+        try:
+            while True:
+                try:
+                    event = asyncio.run_coroutine_threadsafe(events.__anext__(), loop).result()
+                except StopAsyncIteration:
+                    break
+                yield event
+        finally:
+            asyncio.run_coroutine_threadsafe(events.aclose(), loop).result()
+
+    async def _aask_stream(self, user_input: str, client: ollama.AsyncClient) -> AsyncIterator[dict]:
+        decomposer = self.decomposer
+        executor = self._make_executor()
 
         messages = [{"role": "user", "content": user_input}]
 
         # 1. Decompose
         print(f"Decomposing query: {user_input}")
-        plan = decomposer.decompose(user_input,messages=messages)
+        plan = await decomposer.adecompose(user_input, messages=messages, client=client)
+        yield {
+            "type": "plan",
+            "tasks": [
+                {"id": t.id, "query": t.query, "depends_on": list(t.depends_on)}
+                for t in plan.tasks
+            ],
+        }
 
-        # 2. Execute & 3. Aggregate
-        final_message, tools_used = executor.execute(plan, self.db, self.tool_registry)
+        # 2. Execute
+        all_tools_used = []
+        async for task in executor.aiter_execute(plan, self.db, self.tool_registry, client):
+            all_tools_used.extend(task.tools_used)
+            yield {
+                "type": "task",
+                "id": task.id,
+                "query": task.query,
+                "status": task.status,
+                "tools_used": list(task.tools_used),
+            }
 
-        return final_message, tools_used
+        # 3. Aggregate, token by token
+        parts = []
+        async for content in executor.aaggregate_stream(plan, client):
+            parts.append(content)
+            yield {"type": "token", "content": content}
+
+        yield {
+            "type": "done",
+            "message": {"role": "assistant", "content": "".join(parts)},
+            "tools_used": list(set(all_tools_used)),
+        }
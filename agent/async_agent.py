@@ -0,0 +1,58 @@
+import asyncio
+from typing import AsyncIterator, List, Optional, Tuple
+
+import ollama
+
+from .agent import Agent
+
+
+class AsyncAgent(Agent):
+    """Agent whose :meth:`ask` is a coroutine built on ``ollama.AsyncClient``.
+
+    It runs the same pipeline as :class:`Agent` (whose synchronous ``ask``
+    drives it on the agent's own event loop thread), but on the caller's
+    loop. Decomposition, task LLM calls, embeddings and aggregation are
+    awaited, while Chroma searches and tool calls run in the default
+    executor, so one loop can serve many queries at once::
+
+        async with AsyncAgent(model="llama3.1:8b") as agent:
+            answers = await asyncio.gather(*(agent.ask(q) for q in queries))
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client: Optional[ollama.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> ollama.AsyncClient:
+        """Return an AsyncClient bound to the running loop (httpx connection
+        pools cannot be shared across event loops)."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = ollama.AsyncClient()
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the AsyncClient and its connections; a later :meth:`ask`
+        opens a new one."""
+        client, self._client, self._client_loop = self._client, None, None
+        if client is not None:
+            await client.close()
+
+    async def __aenter__(self) -> "AsyncAgent":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def ask(
+        self, user_input: str, with_metrics: bool = False, trace_file: Optional[str] = None
+    ) -> Tuple[dict, List[str]]:
+        """Async version of :meth:`Agent.ask` (decompose → execute → aggregate)."""
+        return await self._aask(user_input, with_metrics, trace_file, self._get_client())
+
+    async def ask_stream(self, user_input: str) -> AsyncIterator[dict]:
+        """Async version of :meth:`Agent.ask_stream`, yielding the same events."""
+        async for event in self._aask_stream(user_input, self._get_client()):
+            yield event
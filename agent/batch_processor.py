@@ -1,35 +1,284 @@
 from agent.base_agent import BaseAgent
+from telemetry.metrics import STAGES, latency_summary
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, Optional, Set, Tuple
 import csv
+import itertools
+import json
+import os
+import sys
 import time
 
+# Column/field names recognised in the input, in order of preference
+ID_FIELDS = ("id", "query_id", "row_id", "request_id")
+QUERY_FIELDS = ("query", "user_query", "prompt", "text")
+
+# Per-query breakdown from Agent.ask(with_metrics=True); empty for agents without it
+METRIC_FIELDS = [f"{stage}_s" for stage in STAGES] + [
+    "llm_calls", "prompt_tokens", "eval_tokens", "cache_hits", "cache_misses", "context_tokens_saved",
+]
+
+OUTPUT_FIELDS = ["row_id", "user_query", "agent_response", "tools_used", "query_duration"] + METRIC_FIELDS
+
+
 class BatchProcessor:
-    def __init__(self, agent:BaseAgent, input_file:str, output_file:str):
+    def __init__(
+        self,
+        agent:BaseAgent,
+        input_file:str,
+        output_file:str,
+        workers:int = 1,
+        query_field:Optional[str] = None,
+        id_field:Optional[str] = None,
+    ):
+        """
+        :param agent: Anything with ``ask(query)`` (``Agent``) or ``run(query)``
+            (``ClassicalAgent``) returning ``(response, tools_used)``.
+        :param input_file: ``.csv`` (one query per row, optionally with a
+            header naming the query/id columns) or ``.jsonl`` (one object per
+            line). Rows are streamed, never loaded all at once.
+        :param output_file: ``.csv`` or ``.jsonl``; rows are appended and
+            fsynced one by one. Completed ids are recorded in
+            ``<output_file>.ckpt`` so a re-run with the same output file
+            skips them. Failed queries are written as ``ERROR: ...`` rows
+            but not checkpointed, so a re-run retries them (appending a new
+            row for each).
+        :param workers: Number of queries in flight at once. With more than
+            one worker, queries run on a thread pool and rows are still
+            written in input order.
+        :param query_field: Column/field holding the query (defaults to the
+            first of :data:`QUERY_FIELDS` present, or the first CSV column).
+        :param id_field: Column/field holding a stable query id (defaults to
+            the first of :data:`ID_FIELDS` present, or the row number).
+
+        CSV header names are matched case-insensitively. An explicitly given
+        *query_field* or *id_field* that the input lacks raises ``ValueError``
+        instead of falling back to the defaults.
+        """
         self.agent = agent
         self.input_file = input_file
         self.output_file = output_file
+        self.checkpoint_file = f"{output_file}.ckpt"
+        self.workers = max(1, workers)
+        self.query_field = query_field
+        self.id_field = id_field
 
-    def process_batch(self):
-        # TODO: Implement TQDM for progress tracking and ETA estimation
-        with open(self.input_file, "r", newline="") as infile, \
-            open(self.output_file, "w", newline="") as outfile:
+    # ── Input ────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _is_jsonl(path: str) -> bool:
+        return path.lower().endswith((".jsonl", ".ndjson"))
+
+    @staticmethod
+    def _pick(fields, preferred: Optional[str], candidates) -> Optional[str]:
+        if preferred:
+            if preferred not in fields:
+                raise ValueError(f"Field {preferred!r} not found in input fields {list(fields)}")
+            return preferred
+        return next((c for c in candidates if c in fields), None)
+
+    @staticmethod
+    def _header_name(field: Optional[str]) -> Optional[str]:
+        # CSV headers are lowercased before matching
+        return field.strip().lower() if field else None
+
+    def _iter_rows(self) -> Iterator[Tuple[str, str]]:
+        """Stream ``(query_id, query)`` pairs from the input file."""
+        with open(self.input_file, "r", newline="") as infile:
+            if self._is_jsonl(self.input_file):
+                for index, line in enumerate(infile):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    query_key = self._pick(record, self.query_field, QUERY_FIELDS)
+                    if query_key is None:
+                        print(f"Skipping line {index + 1}: no query field")
+                        continue
+                    id_key = self._pick(record, self.id_field, ID_FIELDS)
+                    query_id = record[id_key] if id_key else index
+                    yield str(query_id), str(record[query_key])
+                return
 
             reader = csv.reader(infile)
-            writer = csv.writer(outfile)
+            first = next(reader, None)
+            if first is None:
+                return
+            header = [c.strip().lower() for c in first]
+            query_key = self._pick(header, self._header_name(self.query_field), QUERY_FIELDS)
+            if query_key is None:
+                # No header: first column is the query, row number is the id
+                for index, row in enumerate(filter(None, itertools.chain([first], reader))):
+                    yield str(index), row[0]
+                return
+
+            query_col = header.index(query_key)
+            id_key = self._pick(header, self._header_name(self.id_field), ID_FIELDS)
+            id_col = header.index(id_key) if id_key else None
+            for index, row in enumerate(filter(None, reader)):
+                query_id = row[id_col] if id_col is not None else index
+                yield str(query_id), row[query_col]
+
+    # ── Checkpointing ────────────────────────────────────────────────────
+
+    def _load_checkpoint(self) -> Set[str]:
+        if not os.path.exists(self.checkpoint_file):
+            return set()
+        with open(self.checkpoint_file, "r") as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+
+    @staticmethod
+    def _durable_write(f, text: str) -> None:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+    # ── Execution ────────────────────────────────────────────────────────
+
+    def _call_agent(self, query: str):
+        # Agent exposes ask(); ClassicalAgent and BaseAgent subclasses expose run()
+        if hasattr(self.agent, "ask"):
+            return self.agent.ask(query, with_metrics=True)
+        return self.agent.run(query)
+
+    @staticmethod
+    def _response_text(agent_response) -> str:
+        if isinstance(agent_response, str):
+            return agent_response
+        try:
+            return dict(agent_response).get("content", "")
+        except (TypeError, ValueError):
+            return str(agent_response)
+
+    def _process_query(self, row_id: str, query: str) -> Tuple[dict, bool]:
+        """Run one query and return its output row and whether it succeeded."""
+        print(f"Query: {query}")
+        query_start_time = time.time()
+        metrics = {}
+        ok = True
+        try:
+            agent_response, tools_used, *extra = self._call_agent(query)
+            response_text = self._response_text(agent_response)
+            if extra:
+                metrics = extra[0]
+        except Exception as e:
+            print(f"Query {row_id} failed: {e}")
+            response_text, tools_used = f"ERROR: {e}", []
+            ok = False
+        query_duration = time.time() - query_start_time
+        row = {
+            "row_id": row_id,
+            "user_query": query,
+            "agent_response": response_text,
+            "tools_used": list(tools_used),
+            "query_duration": query_duration,
+        }
+        row.update({field: metrics.get(field, "") for field in METRIC_FIELDS})
+        return row, ok
+
+    @staticmethod
+    def _print_latency_summary() -> None:
+        summary = latency_summary()
+        if not summary:
+            return
+        print("Latency per stage (s):")
+        for stage, stats in summary.items():
+            print(
+                f"  {stage:<10} n={stats['count']:<5} p50={stats['p50']:.3f} "
+                f"p95={stats['p95']:.3f} p99={stats['p99']:.3f}"
+            )
+
+    @staticmethod
+    def _print_failures(failed: int) -> None:
+        if failed:
+            print(f"{failed} queries failed and were not checkpointed; re-run to retry them")
+
+    @staticmethod
+    def _print_progress(done: int, total: int, start: float) -> None:
+        elapsed = time.time() - start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / rate if rate > 0 else 0.0
+        sys.stderr.write(
+            f"\r[{done}/{total}] {rate:.2f} q/s  elapsed {elapsed:.0f}s  ETA {eta:.0f}s"
+        )
+        sys.stderr.flush()
+
+    def process_batch(self):
+        done_ids = self._load_checkpoint()
+        total = sum(1 for query_id, _ in self._iter_rows() if query_id not in done_ids)
+        if done_ids:
+            print(f"Resuming: {len(done_ids)} queries already done, {total} remaining")
+        start = time.time()
+        done = 0
+        failed = 0
+
+        jsonl_output = self._is_jsonl(self.output_file)
+        new_output = not os.path.exists(self.output_file) or os.path.getsize(self.output_file) == 0
+
+        with open(self.output_file, "a", newline="") as outfile, \
+            open(self.checkpoint_file, "a") as ckptfile:
+
+            writer = None if jsonl_output else csv.writer(outfile)
+            if writer and new_output:
+                # TODO: Update header to match ollama output formats
+                writer.writerow(OUTPUT_FIELDS)
+                outfile.flush()
+
+            def write_result(result: dict, ok: bool) -> None:
+                nonlocal failed
+                # Output row first, then the checkpoint: a crash in between
+                # re-runs that query instead of losing it
+                if writer:
+                    writer.writerow([result[k] for k in OUTPUT_FIELDS])
+                    outfile.flush()
+                    os.fsync(outfile.fileno())
+                else:
+                    self._durable_write(outfile, json.dumps(result) + "\n")
+                if ok:
+                    self._durable_write(ckptfile, f"{result['row_id']}\n")
+                else:
+                    failed += 1
+
+            rows = ((i, q) for i, q in self._iter_rows() if i not in done_ids)
 
-            # TODO: Update header to match ollama output formats
-            writer.writerow(["user_query", "agent_response", "tools_used", "query_duration"])
-            outfile.flush()
+            if self.workers == 1:
+                for row_id, query in rows:
+                    write_result(*self._process_query(row_id, query))
+                    done += 1
+                    self._print_progress(done, total, start)
+                sys.stderr.write("\n")
+                self._print_failures(failed)
+                self._print_latency_summary()
+                return
 
-            for row in reader:
-                original_value = row[0]
-                print(f"Query: {original_value}")
+            # Keep a bounded window of queries in flight and write finished
+            # rows in input order as soon as every earlier row is written.
+            next_to_write = 0
+            finished: Dict[int, Tuple[dict, bool]] = {}
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch") as pool:
+                running: Dict[Future, int] = {}
+                submitted = 0
+                exhausted = False
+                while running or not exhausted:
+                    # rows waiting for an earlier row count against the window too
+                    while not exhausted and len(running) + len(finished) < self.workers * 4:
+                        item: Tuple[str, str] = next(rows, None)
+                        if item is None:
+                            exhausted = True
+                            break
+                        running[pool.submit(self._process_query, *item)] = submitted
+                        submitted += 1
 
-                query_start_time = time.time()
-                agent_response, tools_used = self.agent.run(original_value)
-                query_end_time = time.time()
-                query_duration = query_end_time - query_start_time
+                    if not running:
+                        break
+                    completed, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        finished[running.pop(future)] = future.result()
+                        done += 1
 
-                print(agent_response)
-                
-                # writer.writerow([original_value, agent_response["message"], tools_used, query_duration])
-                # outfile.flush()  # ensures it is saved immediately
\ No newline at end of file
+                    while next_to_write in finished:
+                        write_result(*finished.pop(next_to_write))
+                        next_to_write += 1
+                    self._print_progress(done, total, start)
+            sys.stderr.write("\n")
+            self._print_failures(failed)
+            self._print_latency_summary()
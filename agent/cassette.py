@@ -0,0 +1,282 @@
+"""Record/replay cassettes for Ollama calls.
+
+In ``record`` mode every ``ollama.chat`` / ``ollama.embed`` /
+``ollama.embeddings`` call (and the same methods on ``ollama.AsyncClient``)
+goes to the model server as usual, and the response is appended to a
+JSONL cassette under a hash of the request. In ``replay`` mode the cassette is loaded
+into a dict keyed by a hash of the request and calls are answered from
+memory, so runs are fast, deterministic and need no model server::
+
+    with Cassette("io/cassettes/run.jsonl", mode="record"):
+        agent = Agent(...)
+        BatchProcessor(agent, ...).process_batch()
+
+    with Cassette("io/cassettes/run.jsonl", mode="replay"):
+        ...  # same run, no Ollama needed
+
+A request recorded several times (e.g. sampled at temperature > 0)
+replays its responses in recording order, repeating the last one.
+Only the request hash is stored, and embedding vectors are packed as
+base64 float32; cassettes ending in ``.gz`` are also gzip-compressed.
+
+While a cassette is installed the embedding cache is turned off, so every
+text reaches ``embed`` and the recorded requests do not depend on what the
+cache held (a cassette recorded with a warm cache replays with a cold one).
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import ollama
+
+from embedding.embedder import get_embedding_cache, set_embedding_cache
+
+CASSETTE_MODES = ("record", "replay")
+
+# endpoint -> response type used to rebuild replayed responses
+_RESPONSE_TYPES = {
+    "chat": ollama.ChatResponse,
+    "embed": ollama.EmbedResponse,
+    "embeddings": ollama.EmbeddingsResponse,
+}
+
+
+def _plain(obj: Any) -> Any:
+    """JSON-able copy of *obj* (pydantic models from ollama become dicts)."""
+    if hasattr(obj, "model_dump"):
+        return _plain(obj.model_dump(exclude_none=True))
+    if isinstance(obj, dict):
+        return {str(k): _plain(v) for k, v in obj.items() if v is not None}
+    if isinstance(obj, (list, tuple)):
+        return [_plain(v) for v in obj]
+    if callable(obj):
+        # tools passed as Python functions
+        return getattr(obj, "__name__", repr(obj))
+    return obj
+
+
+def _pack_vectors(response: dict) -> dict:
+    for field in ("embeddings", "embedding"):
+        if field in response:
+            vectors = np.asarray(response[field], dtype=np.float32)
+            response[field] = {
+                "shape": list(vectors.shape),
+                "f32": base64.b64encode(vectors.tobytes()).decode("ascii"),
+            }
+    return response
+
+
+def _unpack_vectors(response: dict) -> dict:
+    response = dict(response)
+    for field in ("embeddings", "embedding"):
+        packed = response.get(field)
+        if isinstance(packed, dict):
+            vectors = np.frombuffer(base64.b64decode(packed["f32"]), dtype=np.float32)
+            response[field] = vectors.reshape(packed["shape"]).tolist()
+    return response
+
+
+def request_key(endpoint: str, kwargs: Dict[str, Any]) -> str:
+    """Stable hash of a request: endpoint plus every non-``None`` argument."""
+    canonical = json.dumps([endpoint, _plain(kwargs)], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str = "replay") -> None:
+        """
+        :param path: JSONL cassette (``.gz`` for gzip). Recording appends to it.
+        :param mode: ``record`` or ``replay``.
+        """
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected one of {CASSETTE_MODES}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Any]] = defaultdict(list)
+        self._replayed: Dict[str, int] = defaultdict(int)
+        self._file = None
+        self._originals: Dict[Any, Dict[str, Any]] = {}
+        self._embedding_cache = None
+        self.hits = 0
+        self.recorded = 0
+
+        if mode == "replay":
+            self._load()
+
+    # ── Storage ──────────────────────────────────────────────────────────
+
+    def _open(self, mode: str):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode + "t", encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Cassette not found: {self.path}")
+        with self._open("r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry["response"])
+        print(f"Cassette loaded: {sum(map(len, self._entries.values()))} responses from {self.path}")
+
+    def _record(self, endpoint: str, key: str, response: Any) -> None:
+        if endpoint != "chat":
+            response = _pack_vectors(response)
+        line = json.dumps(
+            {"key": key, "endpoint": endpoint, "response": response},
+            separators=(",", ":"),
+            default=str,
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.recorded += 1
+
+    def _lookup(self, endpoint: str, key: str) -> Any:
+        with self._lock:
+            responses = self._entries.get(key)
+            if not responses:
+                raise LookupError(f"No cassette entry for {endpoint} request {key[:12]} in {self.path}")
+            index = min(self._replayed[key], len(responses) - 1)
+            self._replayed[key] += 1
+            self.hits += 1
+            return responses[index]
+
+    # ── Call handling ────────────────────────────────────────────────────
+
+    @staticmethod
+    def _build(endpoint: str, data: Any) -> Any:
+        response_type = _RESPONSE_TYPES[endpoint]
+        if isinstance(data, list):
+            # streamed chat: one response per chunk
+            return [response_type(**chunk) for chunk in data]
+        return response_type(**_unpack_vectors(data))
+
+    def _call(self, endpoint: str, original, kwargs: Dict[str, Any]):
+        key = request_key(endpoint, kwargs)
+        stream = bool(kwargs.get("stream"))
+        if self.mode == "replay":
+            response = self._build(endpoint, self._lookup(endpoint, key))
+            return iter(response) if stream else response
+
+        response = original(**kwargs)
+        if not stream:
+            self._record(endpoint, key, _plain(response))
+            return response
+        return self._record_stream(endpoint, key, response)
+
+    def _record_stream(self, endpoint: str, key: str, chunks):
+        recorded = []
+        for chunk in chunks:
+            recorded.append(_plain(chunk))
+            yield chunk
+        self._record(endpoint, key, recorded)
+
+    async def _acall(self, endpoint: str, original, kwargs: Dict[str, Any]):
+        key = request_key(endpoint, kwargs)
+        stream = bool(kwargs.get("stream"))
+        if self.mode == "replay":
+            response = self._build(endpoint, self._lookup(endpoint, key))
+            return self._aiter(response) if stream else response
+
+        response = await original(**kwargs)
+        if not stream:
+            self._record(endpoint, key, _plain(response))
+            return response
+        return self._arecord_stream(endpoint, key, response)
+
+    @staticmethod
+    async def _aiter(chunks):
+        for chunk in chunks:
+            yield chunk
+
+    async def _arecord_stream(self, endpoint: str, key: str, chunks):
+        recorded = []
+        async for chunk in chunks:
+            recorded.append(_plain(chunk))
+            yield chunk
+        self._record(endpoint, key, recorded)
+
+    # ── Patching ─────────────────────────────────────────────────────────
+
+    def install(self) -> "Cassette":
+        """Route Ollama calls through this cassette until :meth:`uninstall`."""
+        if self._originals:
+            return self
+        if self.mode == "record":
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = self._open("a")
+
+        module_originals = {name: getattr(ollama, name) for name in _RESPONSE_TYPES}
+        async_originals = {name: getattr(ollama.AsyncClient, name) for name in _RESPONSE_TYPES}
+        self._originals = {ollama: module_originals, ollama.AsyncClient: async_originals}
+        # cache hits never reach embed(), and the batches sent hold only the misses
+        self._embedding_cache = get_embedding_cache()
+        set_embedding_cache(None)
+
+        for endpoint, original in module_originals.items():
+            def patched(*args, _endpoint=endpoint, _original=original, **kwargs):
+                if args:
+                    kwargs = {"model": args[0], **kwargs}
+                return self._call(_endpoint, _original, kwargs)
+            setattr(ollama, endpoint, patched)
+
+        for endpoint, original in async_originals.items():
+            async def apatched(client, *args, _endpoint=endpoint, _original=original, **kwargs):
+                if args:
+                    kwargs = {"model": args[0], **kwargs}
+                bound = _original.__get__(client)
+                return await self._acall(_endpoint, bound, kwargs)
+            setattr(ollama.AsyncClient, endpoint, apatched)
+
+        print(f"Cassette {self.mode} mode: {self.path}")
+        return self
+
+    def uninstall(self) -> None:
+        for target, originals in self._originals.items():
+            for name, original in originals.items():
+                setattr(target, name, original)
+        if self._originals:
+            set_embedding_cache(self._embedding_cache)
+            self._embedding_cache = None
+        self._originals = {}
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "recorded": self.recorded,
+                "replayed": self.hits,
+                "requests": len(self._entries),
+            }
+
+    def __enter__(self) -> "Cassette":
+        return self.install()
+
+    def __exit__(self, *exc) -> None:
+        self.uninstall()
+
+
+def use_cassette(record: Optional[str] = None, replay: Optional[str] = None) -> Optional[Cassette]:
+    """Install a cassette for ``--record``/``--replay`` style options, if either is set."""
+    if record and replay:
+        raise ValueError("Use either record or replay, not both")
+    if record:
+        return Cassette(record, mode="record").install()
+    if replay:
+        return Cassette(replay, mode="replay").install()
+    return None
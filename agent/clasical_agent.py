@@ -7,10 +7,16 @@ class Tool(BaseModel):
     parameters: dict
 
 class ClassicalAgent:
-    def __init__(self, tool_registry, tools_embeddings, model: str = "functiongemma:latest"):
+    def __init__(self, tool_registry, tools_embeddings, model: str = "functiongemma:latest", catalog=None):
+        """
+        :param catalog: Optional shared ``CapabilityCatalog``; when given, the
+            real capability schemas are offered to the model instead of
+            placeholder descriptions.
+        """
         self.tools_embeddings = tools_embeddings
         self.tool_registry = tool_registry
         self.model = model
+        self.catalog = catalog
 
     def run(self, user_input: str) -> tuple[str, list]:
         tools_called = []
@@ -26,14 +32,21 @@ class ClassicalAgent:
         ]
         # print(f"Tool registry: {self.tool_registry}")
 
-        # Convert tool_registry to a list of Tool objects
-        tools = [
-            Tool(
-                name=name,
-                description=f"Function {name} from the tool registry.",
-                parameters={"type": "object", "properties": {}}
-            ).dict() for name in self.tool_registry.keys()
-        ]
+        # Convert tool_registry to a list of tool schemas, preferring the
+        # capability JSON from the catalog over a placeholder Tool object
+        tools = []
+        for name in self.tool_registry.keys():
+            tool_data = self.catalog.get(name) if self.catalog is not None else None
+            if tool_data is not None:
+                tools.append(tool_data)
+            else:
+                tools.append(
+                    Tool(
+                        name=name,
+                        description=f"Function {name} from the tool registry.",
+                        parameters={"type": "object", "properties": {}}
+                    ).dict()
+                )
 
         response = ollama.chat(
             model=self.model,
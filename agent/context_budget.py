@@ -0,0 +1,219 @@
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+from telemetry.metrics import record_context
+
+# Rough tokens-per-character for English/JSON text; avoids a tokenizer dependency
+CHARS_PER_TOKEN = 4
+# Per-message overhead of the chat template (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Marks where truncate_text cut a text; counted within the budget
+TRUNCATION_MARKER = "\n...[{cut} characters truncated]...\n"
+
+
+def estimate_tokens(text: Any) -> int:
+    """Cheap token estimate of *text* (any object is measured by its ``str``)."""
+    if text is None:
+        return 0
+    if not isinstance(text, str):
+        text = str(text)
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _field(message: Any, key: str) -> Any:
+    # plain dicts and ollama Message objects both support .get
+    return message.get(key) if hasattr(message, "get") else None
+
+
+def estimate_message_tokens(message: Any) -> int:
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(_field(message, "content"))
+    tool_calls = _field(message, "tool_calls")
+    if tool_calls:
+        tokens += estimate_tokens(tool_calls)
+    return tokens
+
+
+def estimate_prompt_tokens(messages: List[Any]) -> int:
+    return sum(estimate_message_tokens(m) for m in messages)
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of *text* within about *max_tokens*, marking the cut.
+
+    The marker counts against the budget, so the result is never longer
+    than *text*; text that already fits is returned as is.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    # widest marker: the cut is never more than len(text) characters
+    keep = max_chars - len(TRUNCATION_MARKER.format(cut=len(text)))
+    if keep <= 0:
+        return text[:max_chars]
+    head = keep * 2 // 3
+    tail = keep - head
+    marker = TRUNCATION_MARKER.format(cut=len(text) - keep)
+    return f"{text[:head]}{marker}{text[-tail:] if tail else ''}"
+
+
+class ContextBudget:
+    """Keeps the prompts sent to ``ollama.chat`` within a token budget.
+
+    :meth:`fit` returns the messages to send for a history, leaving the
+    history itself untouched. It works in three steps:
+
+    1. Drop repeated messages (same role, content and tool calls): back to
+       back repeats, and later repeats of messages without tool calls.
+       Tool results are always kept, since the model pairs them with its calls.
+    2. Cut tool outputs over *max_tool_output_tokens* down to their head
+       and tail.
+    3. If the prompt is still over *max_prompt_tokens*, drop the oldest
+       turns. System messages, the first user message and the newest
+       turn are always kept, and an assistant tool call is dropped
+       together with its results.
+
+    Token counts are estimates (about 4 characters per token). Counters of
+    the estimated tokens saved per step are kept in :meth:`stats` and in the
+    ``context_tokens_saved`` query metric.
+    """
+
+    def __init__(
+        self,
+        max_prompt_tokens: Optional[int] = 4096,
+        max_tool_output_tokens: Optional[int] = 1024,
+        dedupe: bool = True,
+    ) -> None:
+        """
+        :param max_prompt_tokens: Estimated prompt size to trim the history
+            to (``None`` disables trimming).
+        :param max_tool_output_tokens: Longest tool output kept whole
+            (``None`` disables truncation).
+        :param dedupe: Drop repeated messages.
+        """
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_tool_output_tokens = max_tool_output_tokens
+        self.dedupe = dedupe
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.saved = {"dedupe": 0, "truncate": 0, "trim": 0}
+
+    # ---- Steps ------------------------------------------------------------
+    def _dedupe(self, messages: List[Any]) -> List[Any]:
+        seen = set()
+        previous = None
+        kept = []
+        for message in messages:
+            if _field(message, "role") != "tool":
+                tool_calls = _field(message, "tool_calls")
+                key = (
+                    _field(message, "role"),
+                    _field(message, "content"),
+                    json.dumps(tool_calls, sort_keys=True, default=str),
+                )
+                # a repeated tool call is only dropped right after itself,
+                # since later results would lose the call they answer
+                if key == previous or (key in seen and not tool_calls):
+                    continue
+                seen.add(key)
+                previous = key
+            else:
+                previous = None
+            kept.append(message)
+        return kept
+
+    def _truncate(self, messages: List[Any]) -> List[Any]:
+        out = []
+        for message in messages:
+            content = _field(message, "content")
+            if (
+                _field(message, "role") == "tool"
+                and isinstance(content, str)
+                and estimate_tokens(content) > self.max_tool_output_tokens
+            ):
+                message = {**message, "content": truncate_text(content, self.max_tool_output_tokens)}
+            out.append(message)
+        return out
+
+    def _trim(self, messages: List[Any]) -> List[Any]:
+        total = estimate_prompt_tokens(messages)
+        if total <= self.max_prompt_tokens:
+            return messages
+
+        first_user = next((i for i, m in enumerate(messages) if _field(m, "role") == "user"), None)
+        pinned = {i for i, m in enumerate(messages) if _field(m, "role") == "system"}
+        # the newest turn: the last non-tool message and any tool results after it
+        last_turn = max((i for i, m in enumerate(messages) if _field(m, "role") != "tool"), default=0)
+        pinned.update(range(last_turn, len(messages)))
+        if first_user is not None:
+            pinned.add(first_user)
+
+        dropped = set()
+        i = 0
+        while total > self.max_prompt_tokens and i < len(messages):
+            if i in pinned:
+                i += 1
+                continue
+            # a turn: the message plus the tool results answering its tool calls
+            end = i + 1
+            while end < len(messages) and _field(messages[end], "role") == "tool" and end not in pinned:
+                end += 1
+            for j in range(i, end):
+                dropped.add(j)
+                total -= estimate_message_tokens(messages[j])
+            i = end
+        return [m for i, m in enumerate(messages) if i not in dropped]
+
+    # ---- API --------------------------------------------------------------
+    def fit(self, messages: List[Any]) -> List[Any]:
+        """Return the messages to send for the history *messages*."""
+        before = estimate_prompt_tokens(messages)
+        saved = {}
+
+        fitted = list(messages)
+        if self.dedupe:
+            fitted = self._dedupe(fitted)
+            saved["dedupe"] = before - estimate_prompt_tokens(fitted)
+        if self.max_tool_output_tokens:
+            current = estimate_prompt_tokens(fitted)
+            fitted = self._truncate(fitted)
+            saved["truncate"] = current - estimate_prompt_tokens(fitted)
+        if self.max_prompt_tokens:
+            current = estimate_prompt_tokens(fitted)
+            fitted = self._trim(fitted)
+            saved["trim"] = current - estimate_prompt_tokens(fitted)
+
+        after = estimate_prompt_tokens(fitted)
+        with self._lock:
+            self.prompts += 1
+            self.tokens_in += before
+            self.tokens_out += after
+            for step, tokens in saved.items():
+                self.saved[step] += tokens
+        record_context(before, before - after)
+        return fitted
+
+    def clip(self, text: str, max_tokens: Optional[int] = None) -> str:
+        """Truncate a single text (e.g. a task answer fed into another prompt)."""
+        max_tokens = max_tokens or self.max_tool_output_tokens
+        if not max_tokens or not isinstance(text, str):
+            return text
+        clipped = truncate_text(text, max_tokens)
+        saved = estimate_tokens(text) - estimate_tokens(clipped)
+        if saved > 0:
+            with self._lock:
+                self.saved["truncate"] += saved
+            record_context(0, saved)
+        return clipped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "prompts": self.prompts,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "tokens_saved": sum(self.saved.values()),
+                "saved_by_step": dict(self.saved),
+            }
@@ -1,12 +1,120 @@
+import re
 import json
+import threading
 import ollama
-from typing import List
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from telemetry.metrics import record_cache, record_llm, span
+from telemetry.trace import trace_event
 from .models import Task, ExecutionPlan
 
+DECOMPOSE_OPTIONS = {"temperature": 0.0, "top_p": 0.9}
+
+# Signs that a query may hold more than one request: coordinating words,
+# sequencing words, clause separators and enumerations.
+COMPOUND_PATTERN = re.compile(
+    r"\b(and|then|also|plus|after|afterwards|before|additionally|followed by|as well as|next)\b"
+    r"|[;&\n]"
+    r"|\?\s*\S"
+    r"|,\s*(what|how|when|where|who|which|why|can|could|please|tell|find|get|show|give|calculate|convert)\b"
+    r"|(^|\s)(\d+[.)]|[-*])\s",
+    re.IGNORECASE,
+)
+FAST_PATH_MAX_WORDS = 20
+
 
 class QueryDecomposer:
-    def __init__(self, model: str = "llama3.1:8b"):
+    def __init__(self, model: str = "llama3.1:8b", fast_path: bool = True, plan_cache_size: int = 256):
+        """
+        :param fast_path: Skip the LLM and return a single-task plan for
+            queries that show no sign of being compound (see :meth:`is_single_intent`).
+        :param plan_cache_size: Number of LLM decompositions kept in an LRU
+            keyed by the normalized query (0 disables the cache).
+        """
         self.model = model
+        self.fast_path = fast_path
+        self.plan_cache_size = plan_cache_size
+
+        self._lock = threading.Lock()
+        self._plan_cache: "OrderedDict[str, List[Tuple[int, str, List[int]]]]" = OrderedDict()
+        self.queries = 0
+        self.fast_path_hits = 0
+        self.cache_hits = 0
+        self.llm_calls = 0
+
+    # ── Fast path & plan cache ──────────────────────────────────────────
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Cache key for a query: lower-cased, whitespace collapsed, trailing punctuation dropped."""
+        return " ".join(query.lower().split()).rstrip(" .!?")
+
+    @staticmethod
+    def is_single_intent(query: str) -> bool:
+        """Cheap pre-classifier: ``True`` when the query is short and has no
+        conjunction, sequencing word, clause separator or enumeration."""
+        stripped = query.strip()
+        if not stripped or len(stripped.split()) > FAST_PATH_MAX_WORDS:
+            return False
+        return COMPOUND_PATTERN.search(stripped) is None
+
+    def _lookup(self, user_query: str) -> Optional[ExecutionPlan]:
+        """Serve a plan without the LLM (fast path or cache hit), if possible."""
+        with self._lock:
+            self.queries += 1
+            if self.fast_path and self.is_single_intent(user_query):
+                self.fast_path_hits += 1
+                plan = ExecutionPlan([Task(id=1, query=user_query, depends_on=[])])
+                source = "fast path"
+            else:
+                cached = self._plan_cache.get(self.normalize_query(user_query))
+                if cached is None:
+                    self.llm_calls += 1
+                    record_cache("plan", misses=1)
+                    return None
+                self._plan_cache.move_to_end(self.normalize_query(user_query))
+                self.cache_hits += 1
+                record_cache("plan", hits=1)
+                # Fresh Task objects: tasks carry per-run state
+                plan = ExecutionPlan(
+                    [Task(id=i, query=q, depends_on=list(deps)) for i, q, deps in cached]
+                )
+                source = "plan cache"
+        print(f"Decomposition served from {source} ({self._stats_line()})")
+        trace_event("decompose", source=source, tasks=len(plan.tasks))
+        return plan
+
+    def _remember(self, user_query: str, plan: ExecutionPlan) -> None:
+        if self.plan_cache_size <= 0:
+            return
+        key = self.normalize_query(user_query)
+        with self._lock:
+            self._plan_cache[key] = [(t.id, t.query, list(t.depends_on)) for t in plan.tasks]
+            self._plan_cache.move_to_end(key)
+            while len(self._plan_cache) > self.plan_cache_size:
+                self._plan_cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Counters for tuning the fast-path heuristic and the plan cache."""
+        with self._lock:
+            queries = self.queries
+            return {
+                "queries": queries,
+                "fast_path": self.fast_path_hits,
+                "cache_hits": self.cache_hits,
+                "llm_calls": self.llm_calls,
+                "bypass_rate": self.fast_path_hits / queries if queries else 0.0,
+                "cache_hit_rate": self.cache_hits / queries if queries else 0.0,
+                "cached_plans": len(self._plan_cache),
+            }
+
+    def _stats_line(self) -> str:
+        queries = max(self.queries, 1)
+        return (
+            f"bypass {self.fast_path_hits / queries:.0%}, "
+            f"cache hits {self.cache_hits / queries:.0%}, "
+            f"llm {self.llm_calls}/{self.queries}"
+        )
 
     def _extract_json(self, content: str) -> dict:
         """Robustly extract JSON from a string that might contain LLM fluff or markdown."""
@@ -17,8 +125,6 @@ class QueryDecomposer:
             pass
 
         # 2. Try looking for markdown code blocks
-        import re
-
         code_block = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", content, re.DOTALL)
         if code_block:
             try:
@@ -37,8 +143,8 @@ class QueryDecomposer:
 
         raise ValueError("Could not extract valid JSON from LLM response")
 
-    def decompose(self, user_query: str, messages: List[dict]) -> ExecutionPlan:
-        """Break the user query into atomic tasks using LLM."""
+    def _build_messages(self, messages: List[dict]) -> List[dict]:
+        """Prepend the decomposition system prompt to *messages* (in place)."""
 
         system_prompt = """
             You are NOT an assistant.
@@ -78,38 +184,55 @@ class QueryDecomposer:
         """
 
         messages.insert(0, {"role": "system", "content": system_prompt})
+        return messages
 
-        try:
-            response = ollama.chat(
-                model=self.model,
-                messages=messages,
-                options={"temperature": 0.0, "top_p": 0.9},
-                format="json",
-            )
-            content = response["message"]["content"]
-            print(f"\n\nRAW DECOMPOSITION RESPONSE: {content}")
+    def _parse_plan(self, content: str, user_query: str) -> ExecutionPlan:
+        """Turn the raw decomposition reply into an ExecutionPlan."""
+        print(f"\n\nRAW DECOMPOSITION RESPONSE: {content}")
 
-            data = self._extract_json(content)
+        data = self._extract_json(content)
 
-            tasks = []
-            for t in data.get("tasks", []):
-                tasks.append(
-                    Task(
-                        id=t["id"], query=t["query"], depends_on=t.get("depends_on", [])
-                    )
+        tasks = []
+        for t in data.get("tasks", []):
+            tasks.append(
+                Task(
+                    id=t["id"], query=t["query"], depends_on=t.get("depends_on", [])
                 )
+            )
+
+        if not tasks:
+            # Fallback to single task if decomposition fails
+            tasks = [Task(id=1, query=user_query, depends_on=[])]
 
-            if not tasks:
-                # Fallback to single task if decomposition fails
-                tasks = [Task(id=1, query=user_query, depends_on=[])]
+        return ExecutionPlan(tasks)
 
-            return ExecutionPlan(tasks)
+    async def adecompose(
+        self, user_query: str, messages: List[dict], client: ollama.AsyncClient
+    ) -> ExecutionPlan:
+        """Break the user query into atomic tasks using the LLM behind *client*.
+
+        Single-intent queries and previously seen queries skip the LLM.
+        """
+        plan = self._lookup(user_query)
+        if plan is not None:
+            return plan
 
+        messages = self._build_messages(messages)
+
+        try:
+            with span("decompose", model=self.model):
+                response = await client.chat(
+                    model=self.model,
+                    messages=messages,
+                    options=DECOMPOSE_OPTIONS,
+                    format="json",
+                )
+            record_llm(response)
+            plan = self._parse_plan(response["message"]["content"], user_query)
+            self._remember(user_query, plan)
+            return plan
 
         except Exception as e:
             print(f"Decomposition failed: {e}")
             # Return single task as fallback
             return ExecutionPlan([Task(id=1, query=user_query, depends_on=[])])
-
-        # tasks = [Task(id=1, query=user_query, depends_on=[])]
-        # return ExecutionPlan(tasks)
\ No newline at end of file
@@ -1,18 +1,55 @@
 import json
+import asyncio
 import ollama
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 
+from telemetry.metrics import record_llm, span
+from telemetry.trace import trace_event
 from tools.db_connection import DBConnection
-from .models import ExecutionPlan
+from .context_budget import ContextBudget
+from .models import ExecutionPlan, Task
+
+# How per-task answers are combined into the final response:
+# - passthrough: a single-task plan's answer is returned as-is
+# - template:    per-task answers are concatenated deterministically
+# - llm:         one more ollama.chat call writes a combined answer
+# - auto:        passthrough for one task, template while the answers are
+#                short, llm otherwise
+AGGREGATION_MODES = ("auto", "passthrough", "template", "llm")
 
 class TaskExecutor:
-    def __init__(self, model: str = "llama3.1:8b", small_context: bool = True):
+    def __init__(
+        self,
+        model: str = "llama3.1:8b",
+        small_context: bool = True,
+        max_workers: int = 4,
+        aggregation: str = "auto",
+        template_max_chars: int = 1200,
+        max_tool_rounds: int = 1,
+        context_budget: Optional[ContextBudget] = None,
+    ):
         """
         :param model: The LLM model to use for result aggregation.
         :param small_context: Whether to use a small context for result aggregation.
+        :param max_workers: Maximum number of independent tasks run concurrently.
+        :param aggregation: One of :data:`AGGREGATION_MODES`.
+        :param template_max_chars: In ``auto`` mode, multi-task plans whose
+            answers total at most this many characters use ``template``.
+        :param max_tool_rounds: Tool-call rounds allowed per task (see
+            :meth:`Task.arun`).
+        :param context_budget: Token budget for task prompts, for task
+            results substituted into later queries and for the answers fed
+            into LLM aggregation.
         """
+        if aggregation not in AGGREGATION_MODES:
+            raise ValueError(f"Unknown aggregation mode '{aggregation}', expected one of {AGGREGATION_MODES}")
         self.model = model
         self.small_context = small_context
+        self.max_workers = max(1, max_workers)
+        self.aggregation = aggregation
+        self.template_max_chars = template_max_chars
+        self.max_tool_rounds = max(1, max_tool_rounds)
+        self.context_budget = context_budget
 
     def resolve_placeholders(self, query: str, completed_tasks: Dict[int, Any]) -> str:
         """Replace placeholders like <TASK_X_RESULT> with actual results."""
@@ -23,73 +60,159 @@ class TaskExecutor:
                 # If the result is a dict with 'content', extract it for better readability
                 if isinstance(result, dict):
                     result_text = result.get('content') or result.get('text') or str(result)
+                elif isinstance(result, list):
+                    # small_context=False keeps the whole history; substitute only its answer
+                    result_text = self._last_content(result)
                 else:
                     result_text = str(result)
+                if self.context_budget:
+                    result_text = self.context_budget.clip(result_text)
                 resolved_query = resolved_query.replace(placeholder, result_text)
         return resolved_query
 
-    def execute(self, plan: ExecutionPlan, db: DBConnection, tool_registry: Dict[str, callable]) -> Tuple[str, List[str]]:
-        """Process the tasks sequentially, respecting dependencies."""
-        completed_tasks = {}
+    def _start_tasks(self, ready: List[Task], routes: Optional[List[Optional[str]]], state: "_PlanState") -> List[Tuple[Task, Optional[str]]]:
+        """Mark *ready* tasks in progress and pair each with its routing decision."""
+        if routes is None:
+            routes = [None] * len(ready)
+        for task in ready:
+            task.status = "in-progress"
+            # Resolve any placeholders in the query
+            resolved_query = self.resolve_placeholders(task.query, state.completed_tasks)
+            print(f"Executing task {task.id}: {resolved_query}")
+        return list(zip(ready, routes))
+
+    async def aexecute(self, plan: ExecutionPlan, db: DBConnection, tool_registry: Dict[str, callable], client: ollama.AsyncClient) -> Tuple[str, List[str]]:
+        """Run the plan through the DAG scheduler, then aggregate all results."""
         all_tools_used = []
-        
-        # Simple sequential execution for now, ensuring dependencies are met
-        # To handle more complex DAGs efficiently, we'd need a topological sort
-        # But tasks are usually returned in order or can be processed in order by checking dependencies
-        
-        while not plan.is_complete():
-            task_executed_in_this_pass = False
-            for task in plan.tasks:
-                if task.status != "pending":
-                    continue
-                
-                # Check if all dependencies are completed
-                deps_met = all(dep_id in completed_tasks for dep_id in task.depends_on)
-                
-                if deps_met:
-                    task.status = "in-progress"
-                    
-                    # Resolve any placeholders in the query
-                    resolved_query = self.resolve_placeholders(task.query, completed_tasks)
-                    
-                    print(f"Executing task {task.id}: {resolved_query}")
-                    # Run the individual task through the Agent's existing tool-routing logic
-                    # result, tools_used = self.agent.run(resolved_query)
-
-                    if not task.run(db=db,model=self.model,tool_registry=tool_registry):
-                        task.result = f"Execution failed for task {task.id}"
-                        continue
-
-                    else:
-                        if self.small_context:
-                            task.result = task.get_result()
-                        else:
-                            task.result = task.get_context()
-
-                    tools_used = task.tools_used
-
-                    task.status = "completed"
-                    completed_tasks[task.id] = task.result
-                    all_tools_used.extend(tools_used)
-                    task_executed_in_this_pass = True
-            
-            if not task_executed_in_this_pass and not plan.is_complete():
-                # Avoid infinite loop if there's a circular dependency or missing task
-                print("Warning: Could not make progress on task execution plan.")
-                break
+        async for task in self.aiter_execute(plan, db, tool_registry, client):
+            all_tools_used.extend(task.tools_used)
 
         # Final aggregation
-        return self.aggregate_results(plan, all_tools_used)
+        return await self.aaggregate_results(plan, all_tools_used, client)
 
-    def aggregate_results(self, plan: ExecutionPlan, tools_used: List[str]) -> Tuple[str, List[str]]:
-        """Combine all individual task results into one final user-facing response."""
+    async def aiter_execute(self, plan: ExecutionPlan, db: DBConnection, tool_registry: Dict[str, callable], client: ollama.AsyncClient) -> AsyncIterator[Task]:
+        """Run the plan's tasks concurrently, respecting dependencies.
+
+        The plan is topologically sorted up front; tasks on a dependency cycle
+        (or depending on an unknown task) are failed immediately. Every task
+        whose dependencies are met is routed in one batch and started as an
+        asyncio task (at most *max_workers* at once) on the caller's event
+        loop; dependents are released as results arrive. Yields each task as
+        soon as it completes or fails.
+        """
+        state = _PlanState(plan, self.small_context)
+        for task in state.fail_blocked():
+            yield task
+
+        semaphore = asyncio.Semaphore(self.max_workers)
+        running: Dict[asyncio.Task, Task] = {}
+
+        async def run_one(task: Task, suggested_tools: Optional[str]) -> bool:
+            async with semaphore:
+                with span("task", task_id=task.id, query=task.query, tool=suggested_tools):
+                    return await task.arun(
+                        db=db,
+                        model=self.model,
+                        tool_registry=tool_registry,
+                        client=client,
+                        suggested_tools=suggested_tools,
+                        max_tool_rounds=self.max_tool_rounds,
+                        context_budget=self.context_budget,
+                    )
+
+        async def dispatch(ready: List[Task]) -> None:
+            try:
+                routes = await db.aroute_queries([task.query for task in ready], client=client)
+            except Exception as e:
+                print(f"Batch routing failed: {e}")
+                routes = None
+
+            for task, suggested_tools in self._start_tasks(ready, routes, state):
+                running[asyncio.create_task(run_one(task, suggested_tools))] = task
+
+        ready = state.initial_ready()
+        if ready:
+            await dispatch(ready)
+
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                released: List[Task] = []
+                for future in done:
+                    task = running.pop(future)
+                    try:
+                        ok = future.result()
+                    except Exception as e:
+                        print(f"Task {task.id} raised: {e}")
+                        ok = False
+                    finished, newly_ready = state.finish(task, ok)
+                    for finished_task in finished:
+                        yield finished_task
+                    released.extend(newly_ready)
+
+                if released:
+                    await dispatch(state.in_plan_order(released))
+        finally:
+            for future in running:
+                future.cancel()
+
+    @staticmethod
+    def _last_content(messages: List[Any]) -> str:
+        for message in reversed(messages):
+            content = message.get("content") if hasattr(message, "get") else None
+            if content:
+                return content
+        return ""
+
+    @staticmethod
+    def _answer_text(task: Task) -> str:
+        """Plain-text answer of a task, whatever shape its result has."""
+        if isinstance(task.result, list):
+            # small_context=False keeps the whole message history
+            return task.get_result() or ""
+        if isinstance(task.result, dict):
+            return task.result.get("content") or task.result.get("text") or str(task.result)
+        if task.result is None:
+            return ""
+        return str(task.result)
+
+    def _aggregation_mode(self, plan: ExecutionPlan) -> str:
+        """Resolve the aggregation mode to use for *plan*."""
+        if self.aggregation == "passthrough":
+            # passthrough only makes sense for one answer
+            return "passthrough" if len(plan.tasks) == 1 else "template"
+        if self.aggregation != "auto":
+            return self.aggregation
+        if len(plan.tasks) == 1:
+            return "passthrough"
+        total_chars = sum(len(self._answer_text(task)) for task in plan.tasks)
+        return "template" if total_chars <= self.template_max_chars else "llm"
+
+    def _aggregate_locally(self, plan: ExecutionPlan) -> Optional[str]:
+        """Build the final answer without the LLM, or return ``None`` if the
+        plan needs the ``llm`` aggregation."""
+        mode = self._aggregation_mode(plan)
+        print(f"Aggregation mode: {mode}")
+        if mode == "passthrough":
+            return self._answer_text(plan.tasks[0])
+        if mode == "template":
+            if len(plan.tasks) == 1:
+                return self._answer_text(plan.tasks[0])
+            return "\n\n".join(
+                f"**{task.query}**\n{self._answer_text(task)}" for task in plan.tasks
+            )
+        return None
+
+    def _aggregation_messages(self, plan: ExecutionPlan) -> List[dict]:
         qa_pairs = []
+        budget = self.context_budget
+        # each answer gets an equal share of the prompt budget
+        share = budget.max_prompt_tokens // len(plan.tasks) if budget and budget.max_prompt_tokens else None
         for task in plan.tasks:
-            if isinstance(task.result, dict):
-                answer_text = task.result.get("content") or task.result.get("text") or str(task.result)
-            else:
-                answer_text = str(task.result)
-            qa_pairs.append({"task_id": task.id, "query": task.query, "answer": answer_text})
+            answer = self._answer_text(task)
+            if share:
+                answer = budget.clip(answer, share)
+            qa_pairs.append({"task_id": task.id, "query": task.query, "answer": answer})
 
         combine_messages = [
             {
@@ -103,12 +226,114 @@ class TaskExecutor:
             {"role": "user", "content": json.dumps(qa_pairs, indent=2)},
         ]
 
-        print(f"DEBUG: Aggregating results with messages: {combine_messages}")
+        trace_event("aggregate_messages", tasks=len(qa_pairs), messages=combine_messages)
+        return combine_messages
+
+    async def aaggregate_results(self, plan: ExecutionPlan, tools_used: List[str], client: ollama.AsyncClient) -> Tuple[str, List[str]]:
+        """Combine all individual task results into one final user-facing response."""
+        local = self._aggregate_locally(plan)
+        if local is not None:
+            return {"role": "assistant", "content": local}, list(set(tools_used))
+
+        combine_messages = self._aggregation_messages(plan)
 
         try:
-            combined_resp = dict(ollama.chat(model=self.model, messages=combine_messages))
+            with span("aggregate", model=self.model, tasks=len(plan.tasks)):
+                combined_resp = dict(await client.chat(model=self.model, messages=combine_messages))
+            record_llm(combined_resp)
             final_message = combined_resp.get("message", {"content": "Failed to aggregate results."})
             return final_message, list(set(tools_used))
         except Exception as e:
             print(f"Aggregation failed: {e}")
             return {"content": "Failed to aggregate results."}, list(set(tools_used))
+
+    async def aaggregate_stream(self, plan: ExecutionPlan, client: ollama.AsyncClient) -> AsyncIterator[str]:
+        """Streaming :meth:`aaggregate_results`: yield the final answer's
+        content chunk by chunk as Ollama generates it."""
+        local = self._aggregate_locally(plan)
+        if local is not None:
+            yield local
+            return
+
+        combine_messages = self._aggregation_messages(plan)
+
+        try:
+            async for chunk in await client.chat(model=self.model, messages=combine_messages, stream=True):
+                content = chunk["message"]["content"]
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    # token counts arrive with the final chunk
+                    record_llm(chunk)
+        except Exception as e:
+            print(f"Aggregation failed: {e}")
+            yield "Failed to aggregate results."
+
+
+class _PlanState:
+    """Dependency bookkeeping for :meth:`TaskExecutor.aiter_execute`."""
+
+    def __init__(self, plan: ExecutionPlan, small_context: bool):
+        self.small_context = small_context
+        self.completed_tasks: Dict[int, Any] = {}
+
+        self.ordered, self.blocked = plan.schedule()
+        self.position = {task.id: i for i, task in enumerate(self.ordered)}
+        self.remaining = {task.id: len(set(task.depends_on)) for task in self.ordered}
+        self.dependents: Dict[int, List[Task]] = {task.id: [] for task in self.ordered}
+        for task in self.ordered:
+            for dep_id in set(task.depends_on):
+                self.dependents[dep_id].append(task)
+
+    def fail_blocked(self) -> List[Task]:
+        """Fail every task that can never be scheduled."""
+        for task in self.blocked:
+            print(f"Warning: task {task.id} has cyclic or missing dependencies {task.depends_on}; skipping.")
+            task.status = "failed"
+            task.result = f"Execution failed for task {task.id}: unsatisfiable dependencies"
+        return list(self.blocked)
+
+    def initial_ready(self) -> List[Task]:
+        return [task for task in self.ordered if self.remaining[task.id] == 0]
+
+    def in_plan_order(self, tasks: List[Task]) -> List[Task]:
+        return sorted(tasks, key=lambda t: self.position[t.id])
+
+    def finish(self, task: Task, ok: Any) -> Tuple[List[Task], List[Task]]:
+        """Record the outcome of *task*.
+
+        Returns ``(finished, released)``: the tasks that reached a final state
+        (the task itself plus any dependents failed along with it) and the
+        dependents whose last dependency just completed.
+        """
+        if not ok:
+            task.status = "failed"
+            task.result = f"Execution failed for task {task.id}"
+            return [task] + self._fail_dependents(task), []
+
+        if self.small_context:
+            task.result = task.get_result()
+        else:
+            task.result = task.get_context()
+        task.status = "completed"
+        self.completed_tasks[task.id] = task.result
+
+        released = []
+        for dependent in self.dependents[task.id]:
+            self.remaining[dependent.id] -= 1
+            if self.remaining[dependent.id] == 0 and dependent.status == "pending":
+                released.append(dependent)
+        return [task], released
+
+    def _fail_dependents(self, task: Task) -> List[Task]:
+        skipped = []
+        stack = list(self.dependents[task.id])
+        while stack:
+            dependent = stack.pop()
+            if dependent.status != "pending":
+                continue
+            dependent.status = "failed"
+            dependent.result = f"Execution failed for task {dependent.id}: dependency {task.id} failed"
+            skipped.append(dependent)
+            stack.extend(self.dependents[dependent.id])
+        return skipped
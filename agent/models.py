@@ -1,9 +1,15 @@
-from typing import Dict, List, Optional, Any
+import asyncio
+from collections import deque
+from typing import Dict, List, Optional, Any, Tuple
 
 import ollama
 
+from telemetry.metrics import record_llm, span
+from telemetry.trace import trace_event
 from tools.db_connection import DBConnection
-from .validation import validate_and_coerce
+from tools.tool_executor import ToolTimeoutError, submit_tool
+from .context_budget import ContextBudget
+from .validation import get_validator
 
 
 class Task:
@@ -27,8 +33,9 @@ class Task:
         import json
         from datetime import datetime
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"io/task_msg_jsons/task_message_{timestamp}.json"
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        # task id keeps concurrently finishing tasks from sharing a file
+        filename = f"io/task_msg_jsons/task_message_{timestamp}_task{self.id}.json"
         # Convert message to a serializable dict if needed
         def make_serializable(obj):
             if isinstance(obj, dict):
@@ -46,92 +53,180 @@ class Task:
         serializable_message = make_serializable(self.message)
         with open(filename, "w") as f:
             json.dump(serializable_message, f, indent=2)
-        print(f"DEBUG: Message dumped to {filename}")
+        trace_event("message_dumped", task_id=self.id, file=filename)
 
-    def run(self,db:DBConnection,model:str,tool_registry:Dict[str, callable]) -> bool:
-        """Execute the task by routing the query, selecting tools, and interacting with the LLM."""
+    def _select_tools(self, db: DBConnection, suggested_tools: Optional[str]) -> List[dict]:
+        """Return the capability JSON of the routed tool (as Ollama expects it), if any."""
+        # Try to locate the capability JSON for the selected tool
+        selected_tools = []
+        if suggested_tools and suggested_tools != "No confident match":
+            # Look the tool doc up in the catalog shared through DBConnection
+            tool_data = db.catalog.get(suggested_tools)
+            if tool_data is not None:
+                # Ensure the tool structure is exactly what Ollama expects
+                selected_tools = [tool_data]
+            else:
+                print(f"Tool '{suggested_tools}' not found in catalog.")
+
+        trace_event(
+            "select_tools",
+            task_id=self.id,
+            routed=suggested_tools,
+            selected=selected_tools[0]["function"]["name"] if selected_tools else None,
+        )
+        return selected_tools
+
+    @staticmethod
+    async def _call_tool(tool_name: str, arguments: dict, tool_registry: Dict[str, callable]) -> Any:
+        """Validate the model-supplied arguments, submit the tool to the
+        shared tool executor (see :mod:`tools.tool_executor`) and await it.
+
+        A tool that times out yields a structured error result instead of
+        an exception, so the model sees the timeout in the message history.
+        """
+        with span("tool", tool=tool_name, arguments=arguments):
+            tool = tool_registry[tool_name]
+            if not getattr(tool, "loaded", True):
+                # first call: import the tool module off the event loop
+                await asyncio.to_thread(tool.resolve)
+            validated_args = get_validator(tool)(arguments)
+            trace_event("validated_arguments", tool=tool_name, arguments=validated_args)
+
+            try:
+                result = await submit_tool(tool, validated_args).aresult()
+            except ToolTimeoutError as timeout:
+                print(f"Tool error: TOOL_TIMEOUT: {timeout}")
+                trace_event("tool_timeout", tool=tool_name, timeout=timeout.timeout, phase=timeout.phase)
+                result = timeout.as_result()
+
+        print(f"Tool result: {result}")
+        return result
+
+    def _record_tool_result(self, tool_name: str, result: Any) -> None:
+        self.tools_used.append(tool_name)
+        self.message.append(
+            {
+                "role": "tool",
+                "tool_name": tool_name,
+                "content": str(result),
+            }
+        )
+
+    @staticmethod
+    def _tool_error(error: Exception) -> str:
+        """Map a tool failure to the error string returned from arun()."""
+        if isinstance(error, ValueError):
+            kind = "VALIDATION_ERROR"
+        elif isinstance(error, TypeError):
+            kind = "TYPE_ERROR"
+        else:
+            kind = "RUNTIME_ERROR"
+        print(f"Tool error: {kind}: {error}")
+        trace_event("tool_error", kind=kind, error=str(error))
+        return f"{kind}:{error}"
+
+    @staticmethod
+    def _tool_calls(message: Any) -> List[Tuple[str, dict]]:
+        """``(tool_name, arguments)`` of every tool call in an assistant message."""
+        return [
+            (tool_call["function"]["name"], tool_call["function"]["arguments"])
+            for tool_call in (message.get("tool_calls") or [])
+        ]
+
+    async def _arun_tool_calls(self, calls: List[Tuple[str, dict]], tool_registry: Dict[str, callable]) -> List[Any]:
+        """Run the tool calls of one model turn concurrently on the shared
+        tool executor; results come back in call order. The first failure
+        is raised once all calls finish."""
+        results = await asyncio.gather(
+            *(self._call_tool(name, arguments, tool_registry) for name, arguments in calls),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    def _prompt(self, context_budget: Optional[ContextBudget]) -> List[Any]:
+        """Messages to send for the current history, fitted to *context_budget*."""
+        return context_budget.fit(self.message) if context_budget else self.message
+
+    def _record_tool_results(self, calls: List[Tuple[str, dict]], results: List[Any]) -> None:
+        for (tool_name, _), result in zip(calls, results):
+            self._record_tool_result(tool_name, result)
+
+    async def arun(
+        self,
+        db: DBConnection,
+        model: str,
+        tool_registry: Dict[str, callable],
+        client: ollama.AsyncClient,
+        suggested_tools: Optional[str] = None,
+        max_tool_rounds: int = 1,
+        context_budget: Optional[ContextBudget] = None,
+    ) -> bool:
+        """Execute the task by routing the query, selecting tools, and interacting with the LLM.
+
+        LLM calls go through *client*; routing lookups, tool calls and the
+        message dump run in worker threads. All tool calls of one model turn
+        run concurrently and are answered by a single follow-up chat, so a
+        task costs 2 LLM calls however many tools the model calls at once.
+
+        :param suggested_tools: Routing decision computed up front (e.g. by a
+            batched :meth:`DBConnection.aroute_queries`); routed here if ``None``.
+        :param max_tool_rounds: Tool-call rounds allowed per task. With more
+            than one, follow-up chats still offer the tools, so the model can
+            act on earlier results; the last round never does.
+        :param context_budget: Fits every prompt to a token budget; the
+            full history stays in :attr:`message`.
+        """
         try:
-            # Corrected route_query call
-            suggested_tools = db.route_query(self.query)
-
-            # Try to locate the capability JSON for the selected tool
-            selected_tools = []
-            if suggested_tools and suggested_tools != "No confident match":
-                # Load the tool doc from disk using DBConnection helper
-                tool_docs = DBConnection._load_tool_docs_map()
-                if suggested_tools in tool_docs:
-                    tool_data, _ = tool_docs[suggested_tools]
-                    # Ensure the tool structure is exactly what Ollama expects
-                    selected_tools = [tool_data]
-                else:
-                    print(f"DEBUG: Tool '{suggested_tools}' not found in registry.")
-
-            print(f"DEBUG: Selected tools: {selected_tools[0]['function']['name']}" if selected_tools else "DEBUG: No tools selected.")
-
-            response = ollama.chat(
-                model=model,
-                messages=self.message,
-                tools=selected_tools if selected_tools else None,
-            )
+            if suggested_tools is None:
+                suggested_tools = (await db.aroute_queries([self.query], client=client))[0]
+
+            selected_tools = self._select_tools(db, suggested_tools)
+
+            with span("llm", task_id=self.id, model=model, tools=len(selected_tools)):
+                response = await client.chat(
+                    model=model,
+                    messages=self._prompt(context_budget),
+                    tools=selected_tools if selected_tools else None,
+                )
+            record_llm(response)
 
             current_message = response["message"]
 
             self.message.append(current_message)
 
-            # Tool execution
-            if "tool_calls" in current_message:
-                for tool_call in current_message["tool_calls"]:
-                    tool_name = tool_call["function"]["name"]
-                    arguments = tool_call["function"]["arguments"]
-
-                    try:
-                        print(f"DEBUG: Executing tool: {tool_name} with arguments: {arguments}")
-                        validated_args = validate_and_coerce(
-                            arguments, tool_registry[tool_name]
-                        )
-                        print(f"DEBUG: Validated arguments: {validated_args}")
-
-                        result = tool_registry[tool_name](**validated_args)
-
-                        print(f"Tool result: {result}")
-
-                        self.message.append(current_message)
-                        self.tools_used.append(tool_name)
-                        self.message.append(
-                            {
-                                "role": "tool",
-                                "tool_name": tool_name,
-                                "content": str(result),
-                            }
-                        )
-
-                        final = ollama.chat(
-                            model=model,
-                            messages=self.message,
-                        )
-
-                        self.message.append(final["message"])
-                    except ValueError as error:
-                        error_message = f"VALIDATION_ERROR:{error}"
-                        print(f"DEBUG: Validation error: {error}")
-                        return error_message, self.tools_used
-
-                    except TypeError as error:
-                        error_message = f"TYPE_ERROR:{error}"
-                        print(f"DEBUG: Type error: {error}")
-                        return error_message, self.tools_used
-
-                    except Exception as error:
-                        error_message = f"RUNTIME_ERROR:{error}"
-                        print(f"DEBUG: Runtime error: {error}")
-                        return error_message, self.tools_used
+            # Tool execution: one concurrent batch and one follow-up chat per round
+            calls = self._tool_calls(current_message)
+            rounds = 0
+            while calls and rounds < max_tool_rounds:
+                rounds += 1
+                try:
+                    results = await self._arun_tool_calls(calls, tool_registry)
+                except Exception as error:
+                    return self._tool_error(error), self.tools_used
+                self._record_tool_results(calls, results)
+
+                offer_tools = selected_tools if selected_tools and rounds < max_tool_rounds else None
+                with span("llm", task_id=self.id, model=model, after_tools=[name for name, _ in calls], round=rounds):
+                    final = await client.chat(
+                        model=model,
+                        messages=self._prompt(context_budget),
+                        tools=offer_tools,
+                    )
+                record_llm(final)
+
+                self.message.append(final["message"])
+                calls = self._tool_calls(final["message"]) if offer_tools else []
 
             # Write the context of the task in a file before returning answer
-            self.write_message_to_file()
+            await asyncio.to_thread(self.write_message_to_file)
 
             return True
         except Exception as e:
-            print(f"DEBUG: Unexpected error in run(): {e}")
+            print(f"Task {self.id} failed: {e}")
+            trace_event("task_error", task_id=self.id, error=str(e))
             return False
 
     def get_context(self) -> List[dict]:
@@ -157,3 +252,45 @@ class ExecutionPlan:
 
     def is_complete(self) -> bool:
         return all(task.status == "completed" for task in self.tasks)
+
+    def schedule(self) -> Tuple[List[Task], List[Task]]:
+        """Topologically sort the tasks (Kahn's algorithm).
+
+        Returns ``(ordered, blocked)``: *ordered* lists every task after all
+        of its dependencies; *blocked* lists the tasks that can never run
+        because they sit on a dependency cycle, depend on an unknown task id,
+        or depend on such a task.
+        """
+        by_id = {task.id: task for task in self.tasks}
+        indegree = {task.id: 0 for task in self.tasks}
+        dependents: Dict[int, List[int]] = {task.id: [] for task in self.tasks}
+        for task in self.tasks:
+            for dep_id in set(task.depends_on):
+                indegree[task.id] += 1
+                # an unknown dependency is never released, so the task stays blocked
+                if dep_id in dependents:
+                    dependents[dep_id].append(task.id)
+
+        queue = deque(task.id for task in self.tasks if indegree[task.id] == 0)
+        ordered: List[Task] = []
+        while queue:
+            task_id = queue.popleft()
+            ordered.append(by_id[task_id])
+            for dependent_id in dependents[task_id]:
+                indegree[dependent_id] -= 1
+                if indegree[dependent_id] == 0:
+                    queue.append(dependent_id)
+
+        scheduled = {task.id for task in ordered}
+        blocked = [task for task in self.tasks if task.id not in scheduled]
+        return ordered, blocked
+
+    def topological_order(self) -> List[Task]:
+        """Return the tasks in dependency order; raise ValueError on a cycle
+        or an unknown dependency."""
+        ordered, blocked = self.schedule()
+        if blocked:
+            raise ValueError(
+                f"Unschedulable tasks (cyclic or missing dependencies): {[t.id for t in blocked]}"
+            )
+        return ordered
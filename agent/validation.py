@@ -1,8 +1,23 @@
 import json
 import inspect
-from typing import Any
+import weakref
+from typing import Any, Callable, List, Optional
 
-from pydantic import create_model, ValidationError
+from pydantic import ConfigDict, create_model, ValidationError
+
+# JSON-schema parameter types (as declared in capability JSONs) -> Python types
+JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": float,
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+# A number is accepted where a string is declared (``5`` -> ``"5"``): LLMs
+# often send ids, zip codes and the like unquoted.
+_MODEL_CONFIG = ConfigDict(coerce_numbers_to_str=True)
 
 
 def _coerce_value(v: Any) -> Any:
@@ -40,36 +55,113 @@ def _coerce_value(v: Any) -> Any:
     return v
 
 
-def validate_and_coerce(arguments: dict, func: callable) -> dict:
-    """Build a pydantic model from `func` parameter annotations and use it to
-    coerce/validate `arguments`.
+def _parse_json_string(v: Any) -> Any:
+    """Parse a JSON-encoded string for ``array``/``object`` parameters."""
+    if isinstance(v, str):
+        try:
+            return json.loads(v)
+        except ValueError:
+            pass
+    return v
 
-    - `arguments` is a mapping of name->value (often strings from user input).
-    - `func` is the tool function; its signature annotations are used to
-      construct the model types where available.
 
-    Returns the dict of coerced values suitable for calling `func(**result)`.
-    Raises ValueError on validation errors.
-    """
-    sig = inspect.signature(func)
+class ArgumentValidator:
+    """Argument validation for one tool, compiled once and reused per call.
 
-    model_fields = {}
-    for name, param in sig.parameters.items():
-        # Skip *args/**kwargs
-        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
-            continue
+    Each parameter's type comes from the function annotation or, failing
+    that, from the ``type`` declared for it in the capability JSON, and
+    pydantic coerces values to it (``"5"`` -> ``5`` for an ``integer``,
+    ``5`` -> ``"5"`` for a ``string``).
+    Parameters with neither keep the best-effort :func:`_coerce_value`.
+    """
 
-        annotation = param.annotation if param.annotation is not inspect._empty else Any
-        default = param.default if param.default is not inspect._empty else ...
-        model_fields[name] = (annotation, default)
+    def __init__(self, func: Callable, parameters: Optional[dict] = None) -> None:
+        """
+        :param func: The tool function.
+        :param parameters: The ``function.parameters`` object of the tool's
+            capability JSON, if known.
+        """
+        properties = (parameters or {}).get("properties") or {}
+        sig = inspect.signature(func)
+
+        model_fields = {}
+        self._json_fields: List[str] = []
+        self._untyped: List[str] = []
+        for name, param in sig.parameters.items():
+            # Skip *args/**kwargs
+            if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+                continue
+
+            json_type = JSON_TYPES.get((properties.get(name) or {}).get("type"))
+            if param.annotation is not inspect._empty:
+                annotation = param.annotation
+            elif json_type is not None:
+                annotation = json_type
+            else:
+                annotation = Any
+                self._untyped.append(name)
+            if json_type in (list, dict):
+                self._json_fields.append(name)
+
+            default = param.default if param.default is not inspect._empty else ...
+            model_fields[name] = (annotation, default)
+
+        self.model = create_model(
+            f"{getattr(func, '__name__', 'Tool')}Args", __config__=_MODEL_CONFIG, **model_fields
+        )
+
+    def __call__(self, arguments: Optional[dict]) -> dict:
+        """Return the coerced *arguments*. Raises ValueError on validation errors."""
+        coerced = dict(arguments or {})
+        for name in self._json_fields:
+            if name in coerced:
+                coerced[name] = _parse_json_string(coerced[name])
+        for name in self._untyped:
+            if name in coerced:
+                coerced[name] = _coerce_value(coerced[name])
+
+        try:
+            m = self.model(**coerced)
+        except ValidationError as e:
+            raise ValueError(e)
+
+        return m.model_dump()
+
+
+# plain callables (registries not built by tools.tool_registry) -> validator
+_validators: "weakref.WeakKeyDictionary[Callable, ArgumentValidator]" = weakref.WeakKeyDictionary()
+
+
+def get_validator(func: Callable) -> ArgumentValidator:
+    """Return the compiled validator for *func*.
+
+    Lazy registry tools carry their own (built from their capability JSON
+    and reset when the tool is reloaded); other callables are compiled from
+    their signature once and cached.
+    """
+    validator = getattr(func, "validator", None)
+    if isinstance(validator, ArgumentValidator):
+        return validator
+    try:
+        return _validators[func]
+    except (KeyError, TypeError):
+        pass
+    validator = ArgumentValidator(func)
+    try:
+        _validators[func] = validator
+    except TypeError:
+        pass  # not weak-referenceable; compile per call
+    return validator
 
-    Model = create_model("ToolArgsModel", **model_fields)
 
-    coerced = {k: _coerce_value(v) for k, v in (arguments or {}).items()}
+def validate_and_coerce(arguments: dict, func: callable) -> dict:
+    """Coerce/validate `arguments` for a call to `func`.
 
-    try:
-        m = Model(**coerced)
-    except ValidationError as e:
-        raise ValueError(e)
+    - `arguments` is a mapping of name->value (often strings from user input).
+    - `func` is the tool function; its signature annotations (and the
+      capability JSON types, for registry tools) give the parameter types.
 
-    return m.dict()
+    Returns the dict of coerced values suitable for calling `func(**result)`.
+    Raises ValueError on validation errors.
+    """
+    return get_validator(func)(arguments)
@@ -0,0 +1,172 @@
+"""Local stand-in for the Ollama HTTP API, for offline benchmarks.
+
+Serves deterministic bag-of-words embeddings (``/api/embed`` and the legacy
+``/api/embeddings``) and canned ``/api/chat`` replies: a JSON plan for
+decomposition requests (``format="json"``, split on "and"), a tool call
+for the first offered tool, and a short echo answer otherwise. Every
+request sleeps for a configurable latency first.
+
+Run standalone::
+
+    python -m bench.fake_ollama --port 11555 --latency 0.05
+
+and point the agent at it with ``OLLAMA_HOST=http://127.0.0.1:11555``.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+EMBED_DIM = 128
+
+
+def fake_embedding(text: str, dim: int = EMBED_DIM) -> list:
+    """Unit-length hashed bag-of-words vector: texts sharing words are close."""
+    vector = [0.0] * dim
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        digest = hashlib.sha256(word.encode()).digest()
+        for i in range(4):
+            vector[digest[i] % dim] += 1.0 if digest[i + 4] % 2 else -1.0
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def _chat_reply(request: dict) -> dict:
+    messages = request.get("messages") or []
+    tools = request.get("tools") or []
+    last = messages[-1] if messages else {}
+    message = {"role": "assistant", "content": ""}
+
+    if request.get("format") == "json":
+        parts = [p.strip() for p in re.split(r"\band\b", last.get("content", "")) if p.strip()]
+        message["content"] = json.dumps(
+            {"tasks": [{"id": i + 1, "query": p, "depends_on": []} for i, p in enumerate(parts)]}
+        )
+    elif tools and last.get("role") == "user":
+        function = tools[0]["function"]
+        properties = function.get("parameters", {}).get("properties", {})
+        arguments = {
+            name: ("1" if spec.get("type") in ("integer", "number") else "x")
+            for name, spec in properties.items()
+        }
+        message["tool_calls"] = [{"function": {"name": function["name"], "arguments": arguments}}]
+    else:
+        message["content"] = "Answer: " + (last.get("content") or "")[:80]
+    return message
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; without TCP_NODELAY every
+    # keep-alive reply waits on a delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+    server: "FakeOllamaServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, payload, stream: bool = False) -> None:
+        if stream:
+            body = "".join(json.dumps(chunk) + "\n" for chunk in payload).encode()
+        else:
+            body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson" if stream else "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self.server.count(self.path)
+        self._send({"models": [{"name": "fake:latest", "model": "fake:latest"}]})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.count(self.path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.path == "/api/embed":
+            inputs = request.get("input")
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            return self._send(
+                {"model": request.get("model"), "embeddings": [fake_embedding(t) for t in inputs]}
+            )
+        if self.path == "/api/embeddings":
+            return self._send({"embedding": fake_embedding(request.get("prompt", ""))})
+        if self.path == "/api/chat":
+            message = _chat_reply(request)
+            base = {
+                "model": request.get("model"),
+                "created_at": "2026-01-01T00:00:00Z",
+                "prompt_eval_count": 10,
+                "eval_count": 5,
+            }
+            if not request.get("stream"):
+                return self._send(dict(base, message=message, done=True, done_reason="stop"))
+            chunks = [
+                dict(base, message=dict(message, content=word + " "), done=False)
+                for word in message["content"].split(" ")
+            ]
+            chunks.append(dict(base, message={"role": "assistant", "content": ""}, done=True, done_reason="stop"))
+            return self._send(chunks, stream=True)
+
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """Threaded fake Ollama server; use as a context manager to run it in
+    the background for the duration of a benchmark."""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0) -> None:
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, path: str) -> None:
+        with self._lock:
+            self.requests[path] += 1
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama server for offline benchmarks")
+    parser.add_argument("--port", type=int, default=11555)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds slept before every reply")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(args.port, args.latency)
+    print(f"Fake Ollama listening on {server.host} (latency {args.latency}s)")
+    server.serve_forever()
@@ -0,0 +1,283 @@
+"""Microbenchmarks for the pure-Python hot paths run on every query.
+
+Each benchmark times one call with :mod:`timeit` on realistic inputs, in
+several independent rounds (each the best of a few repeats, iterations
+auto-ranged). A result is the median over the rounds plus their spread
+(median absolute deviation). Results can be saved as a baseline in the
+repo and later compared against it::
+
+    python -m bench.micro --save          # (re)write bench/baselines/micro.json
+    python -m bench.micro --save --filter get_file_changes   # re-measure some entries
+    python -m bench.micro                 # compare; exit 1 on regressions
+    python -m bench.micro --threshold 1.0 --filter validation
+
+A benchmark counts as regressed only when its median is more than the
+threshold slower than the baseline median *and* the gap is larger than
+:data:`NOISE_SPREADS` times the two spreads combined, so a noisy round
+does not flip the verdict on an unchanged tree.
+
+The same benchmarks run under pytest (``pytest bench/test_micro.py``),
+report-only unless ``VR_MICRO_ENFORCE=1`` is set.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "micro.json")
+DEFAULT_THRESHOLD = 0.5  # flag calls more than 50% slower than the baseline (timings are noisy)
+DEFAULT_ROUNDS = 7
+NOISE_SPREADS = 3  # a slowdown must also exceed this many spreads to count
+
+
+# ── Benchmarks ───────────────────────────────────────────────────────────
+# Each entry takes a scratch folder and returns the zero-argument callable
+# to time; all setup happens before timing starts.
+
+def _weather_tool(city: str, days: int = 3, units: str = "metric", include_hourly: bool = False) -> dict:
+    return {"city": city, "days": days, "units": units, "hourly": include_hourly}
+
+
+def bench_validate_and_coerce(tmpdir: str) -> Callable[[], Any]:
+    from agent.validation import validate_and_coerce
+
+    arguments = {"city": "Tokyo", "days": "5", "include_hourly": "true"}
+    return lambda: validate_and_coerce(arguments, _weather_tool)
+
+
+def bench_compiled_validator(tmpdir: str) -> Callable[[], Any]:
+    from agent.validation import ArgumentValidator
+
+    parameters = {
+        "properties": {
+            "city": {"type": "string"},
+            "days": {"type": "integer"},
+            "units": {"type": "string"},
+            "include_hourly": {"type": "boolean"},
+        }
+    }
+    validator = ArgumentValidator(_weather_tool, parameters)
+    arguments = {"city": "Tokyo", "days": "5", "include_hourly": "true"}
+    return lambda: validator(arguments)
+
+
+def bench_coerce_value(tmpdir: str) -> Callable[[], Any]:
+    from agent.validation import _coerce_value
+
+    values = ["42", "3.14", "true", "Tokyo", '{"lat": 35.6, "lon": 139.7}', " [1, 2, 3] ", 7, "1e3", "False"]
+    return lambda: [_coerce_value(v) for v in values]
+
+
+def bench_extract_json(tmpdir: str) -> Callable[[], Any]:
+    from agent.decomposer import QueryDecomposer
+
+    plan = {
+        "tasks": [
+            {"id": 1, "query": "Find the weather in Tokyo", "depends_on": []},
+            {"id": 2, "query": "Convert <TASK_1_RESULT> to Fahrenheit", "depends_on": [1]},
+            {"id": 3, "query": "Calculate loan EMI for 5 lakh at 8% for 5 years", "depends_on": []},
+        ]
+    }
+    raw = json.dumps(plan)
+    replies = [
+        raw,
+        f"Here is the plan:\n```json\n{json.dumps(plan, indent=2)}\n```\nLet me know if you need more.",
+        f"Sure! {raw} Hope this helps.",
+    ]
+    decomposer = QueryDecomposer(model="bench")
+    return lambda: [decomposer._extract_json(reply) for reply in replies]
+
+
+def bench_resolve_placeholders(tmpdir: str) -> Callable[[], Any]:
+    from agent.executor import TaskExecutor
+
+    executor = TaskExecutor(model="bench")
+    completed = {
+        1: {"role": "assistant", "content": "It is 21°C and sunny in Tokyo with light wind from the east."},
+        2: "EMI is 10,138.87 per month",
+        3: {"text": "The flight to Paris departs at 09:40."},
+        4: {"role": "assistant", "content": "Converted: 69.8°F"},
+        5: "No results",
+    }
+    query = "Summarize <TASK_1_RESULT> and compare it with <TASK_4_RESULT> for the trip report"
+    return lambda: executor.resolve_placeholders(query, completed)
+
+
+def bench_get_file_changes(tmpdir: str) -> Callable[[], Any]:
+    from bench.synthetic_tools import generate_tool_tree
+    from tools.file_tracker import FileTracker
+
+    root = os.path.join(tmpdir, "VectorRoute-Tools")
+    generate_tool_tree(root, 200)
+    tracker = FileTracker(
+        base_dir=tmpdir,
+        db_path=os.path.join(tmpdir, "file_hashes.db"),
+        capabilities_folder=os.path.join(root, "capabilities"),
+        functions_folder=os.path.join(root, "functions"),
+    )
+    with _quiet():
+        tracker.get_file_changes()  # first sync; the benchmark is the steady state
+
+    def run():
+        with _quiet():
+            return tracker.get_file_changes()
+
+    return run
+
+
+def bench_compute_file_hash(tmpdir: str) -> Callable[[], Any]:
+    from tools.file_tracker import FileTracker
+
+    path = os.path.join(tmpdir, "tool.py")
+    with open(path, "wb") as f:
+        f.write(os.urandom(64 * 1024))
+    return lambda: FileTracker._compute_file_hash(path)
+
+
+BENCHMARKS: Dict[str, Callable[[str], Callable[[], Any]]] = {
+    "validation.validate_and_coerce": bench_validate_and_coerce,
+    "validation.ArgumentValidator": bench_compiled_validator,
+    "validation._coerce_value": bench_coerce_value,
+    "QueryDecomposer._extract_json": bench_extract_json,
+    "TaskExecutor.resolve_placeholders": bench_resolve_placeholders,
+    "FileTracker.get_file_changes": bench_get_file_changes,
+    "FileTracker._compute_file_hash": bench_compute_file_hash,
+}
+
+
+# ── Harness ──────────────────────────────────────────────────────────────
+
+@contextlib.contextmanager
+def _quiet():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def time_call(fn: Callable[[], Any], rounds: int = DEFAULT_ROUNDS, repeat: int = 3, min_time: float = 0.1) -> Dict[str, float]:
+    """Seconds per call of *fn*: ``{"median", "spread"}`` over *rounds*
+    rounds, each the best of *repeat* timings of about *min_time* seconds."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    samples = [min(timer.repeat(repeat=repeat, number=number)) / number for _ in range(rounds)]
+    median = statistics.median(samples)
+    return {"median": median, "spread": statistics.median(abs(s - median) for s in samples)}
+
+
+def run_benchmark(name: str, rounds: int = DEFAULT_ROUNDS, repeat: int = 3, min_time: float = 0.1) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory(prefix="vectorroute-micro-") as tmpdir:
+        return time_call(BENCHMARKS[name](tmpdir), rounds=rounds, repeat=repeat, min_time=min_time)
+
+
+def run_all(
+    names: Optional[List[str]] = None, rounds: int = DEFAULT_ROUNDS, repeat: int = 3, min_time: float = 0.1
+) -> Dict[str, Dict[str, float]]:
+    return {name: run_benchmark(name, rounds, repeat, min_time) for name in names or BENCHMARKS}
+
+
+def load_baseline(path: str = DEFAULT_BASELINE) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(results: Dict[str, Dict[str, float]], path: str = DEFAULT_BASELINE) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "meta": {
+                    "timestamp": datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "unit": "seconds per call (median and median absolute deviation over rounds)",
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+
+def regressed(current: Dict[str, float], base: Dict[str, float], threshold: float = DEFAULT_THRESHOLD) -> bool:
+    """Whether *current* is slower than *base* beyond both *threshold* and the noise."""
+    gap = current["median"] - base["median"]
+    return (
+        current["median"] > base["median"] * (1 + threshold)
+        and gap > NOISE_SPREADS * (current["spread"] + base["spread"])
+    )
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float = DEFAULT_THRESHOLD
+) -> List[Tuple[str, Optional[Dict[str, float]], Dict[str, float], Optional[float], bool]]:
+    """Return ``(name, baseline, current, ratio, regressed)`` per benchmark,
+    with *ratio* the quotient of the medians; see :func:`regressed`."""
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        ratio = current["median"] / base["median"] if base else None
+        rows.append((name, base, current, ratio, base is not None and regressed(current, base, threshold)))
+    return rows
+
+
+def _format_time(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.2f}µs"
+    return f"{seconds * 1e3:.2f}ms"
+
+
+def format_result(result: Optional[Dict[str, float]]) -> str:
+    if result is None:
+        return "-"
+    return f"{_format_time(result['median'])} ±{100 * result['spread'] / result['median']:.0f}%"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="VectorRoute hot-path microbenchmarks")
+    parser.add_argument("--save", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown ratio (0.5 = 50%%)")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="Independent rounds; the median is kept")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repeats per round; the best is kept")
+    parser.add_argument("--min-time", type=float, default=0.1, help="Seconds per timing repeat")
+    args = parser.parse_args(argv)
+
+    names = [n for n in BENCHMARKS if not args.filter or args.filter.lower() in n.lower()]
+    results = run_all(names, rounds=args.rounds, repeat=args.repeat, min_time=args.min_time)
+
+    if args.save:
+        merged = {**load_baseline(args.baseline), **results}
+        save_baseline(merged, args.baseline)
+        for name, result in results.items():
+            print(f"{name:<36} {format_result(result):>16}")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = 0
+    print(f"{'benchmark':<36} {'baseline':>16} {'current':>16} {'ratio':>7}")
+    for name, base, current, ratio, regressed in compare(results, load_baseline(args.baseline), args.threshold):
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(f"{name:<36} {format_result(base):>16} {format_result(current):>16} {ratio_text:>7}{flag}")
+    if regressions:
+        print(f"{regressions} benchmark(s) slower than baseline by more than {args.threshold:.0%} and the noise")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""Offline end-to-end benchmark suite.
+
+Starts a :class:`bench.fake_ollama.FakeOllamaServer`, generates synthetic
+tool trees of the requested sizes (see :mod:`bench.synthetic_tools`) in a
+scratch folder, and for each size measures:
+
+- ``update_db``: change detection and the initial ChromaDB index build
+  (cold embedding cache), plus a no-op re-sync
+- ``route_query``: per-query latency (p50/p95) and QPS, and batched
+  ``route_queries`` QPS, against Chroma and the NumPy routing index
+- ``agent_startup``: ``Agent()`` construction against the built index
+- ``batch``: ``BatchProcessor`` throughput with 1 and N workers
+
+Results are written as JSON (``bench/results/`` by default), named after
+the current commit so runs can be compared::
+
+    python -m bench.run_bench --sizes 10,100,1000 --latency 0.02
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from bench.fake_ollama import FakeOllamaServer
+from bench.synthetic_tools import generate_tool_tree, sample_queries
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """Silence the pipeline's progress prints while timing."""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, \
+        contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        yield
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCH_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(len(ordered) * q / 100) - 1))
+    return ordered[index]
+
+
+class Workspace:
+    """Scratch layout for one tool-tree size."""
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.tools = os.path.join(root, "VectorRoute-Tools")
+        self.capabilities = os.path.join(self.tools, "capabilities")
+        self.functions = os.path.join(self.tools, "functions")
+        self.chroma = os.path.join(root, "chroma")
+        self.file_hashes = os.path.join(root, "file_hashes.db")
+        self.embedding_cache = os.path.join(root, "embedding_cache.db")
+        os.makedirs(os.path.join(root, "io", "task_msg_jsons"), exist_ok=True)
+
+    def tracker(self):
+        from tools.file_tracker import FileTracker
+        return FileTracker(
+            base_dir=self.root,
+            db_path=self.file_hashes,
+            capabilities_folder=self.capabilities,
+            functions_folder=self.functions,
+        )
+
+    def db(self, use_routing_index: bool = False):
+        from tools.capability_catalog import CapabilityCatalog
+        from tools.db_connection import DBConnection
+        return DBConnection(
+            db_path=self.chroma,
+            use_routing_index=use_routing_index,
+            catalog=CapabilityCatalog(self.capabilities),
+        )
+
+
+def bench_update_db(ws: Workspace, server: FakeOllamaServer) -> dict:
+    from embedding.cache import EmbeddingCache
+    from embedding.embedder import set_embedding_cache
+
+    set_embedding_cache(EmbeddingCache(db_path=ws.embedding_cache))
+    embed_requests = server.requests["/api/embed"]
+
+    start = time.perf_counter()
+    tracker = ws.tracker()
+    changes = tracker.get_file_changes()
+    detect_s = time.perf_counter() - start
+
+    db = ws.db()
+    start = time.perf_counter()
+    db.update_db(changes)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    db.update_db(tracker.get_file_changes())
+    resync_s = time.perf_counter() - start
+    tracker.close_connection()
+
+    return {
+        "change_detection_s": detect_s,
+        "index_build_s": build_s,
+        "noop_resync_s": resync_s,
+        "indexed_entries": db.collection.count(),
+        "embed_requests": server.requests["/api/embed"] - embed_requests,
+    }
+
+
+def bench_routing(ws: Workspace, queries: List[str], use_routing_index: bool) -> dict:
+    from embedding.embedder import set_embedding_cache
+
+    # Unique user queries never hit the cache: measure the embed round trip too
+    set_embedding_cache(None)
+    db = ws.db(use_routing_index=use_routing_index)
+    db.route_query(queries[0])  # warm-up (and lazy routing-index build)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        db.route_query(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    db.route_queries(queries)
+    batched_s = time.perf_counter() - start
+
+    return {
+        "queries": len(queries),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "qps": len(latencies) / sum(latencies),
+        "batched_qps": len(queries) / batched_s,
+    }
+
+
+def bench_agent_startup(ws: Workspace):
+    from agent.agent import Agent
+
+    start = time.perf_counter()
+    agent = Agent(model="fake", db=ws.db(), tracker=ws.tracker())
+    return agent, {"startup_s": time.perf_counter() - start, "registry_size": len(agent.tool_registry)}
+
+
+def bench_batch(ws: Workspace, agent, queries: List[str], workers: int) -> dict:
+    from agent.batch_processor import BatchProcessor
+
+    input_file = os.path.join(ws.root, "queries.csv")
+    with open(input_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "query"])
+        for index, query in enumerate(queries):
+            # every third query is compound, to exercise decomposition
+            if index % 3 == 2:
+                query = f"{query} and {queries[index - 1]}"
+            writer.writerow([index, query])
+
+    output_file = os.path.join(ws.root, f"results_w{workers}.csv")
+    for path in (output_file, f"{output_file}.ckpt"):
+        if os.path.exists(path):
+            os.remove(path)
+
+    start = time.perf_counter()
+    BatchProcessor(agent, input_file, output_file, workers=workers).process_batch()
+    elapsed = time.perf_counter() - start
+    return {"queries": len(queries), "workers": workers, "elapsed_s": elapsed, "qps": len(queries) / elapsed}
+
+
+def run_size(n_tools: int, server: FakeOllamaServer, args) -> dict:
+    root = tempfile.mkdtemp(prefix=f"vectorroute-bench-{n_tools}-", dir=args.workdir)
+    ws = Workspace(root)
+    cwd = os.getcwd()
+    try:
+        generate_tool_tree(ws.tools, n_tools, seed=args.seed)
+        queries = sample_queries(ws.tools, args.queries, seed=args.seed)
+        # Tasks dump their messages relative to the working directory
+        os.chdir(root)
+        result = {"tools": n_tools}
+        with quiet(not args.verbose):
+            result["update_db"] = bench_update_db(ws, server)
+            result["route_query"] = {
+                "chroma": bench_routing(ws, queries, use_routing_index=False),
+                "routing_index": bench_routing(ws, queries, use_routing_index=True),
+            }
+            agent, result["agent_startup"] = bench_agent_startup(ws)
+            batch_queries = queries[: args.batch_queries]
+            try:
+                result["batch"] = [
+                    bench_batch(ws, agent, batch_queries, workers)
+                    for workers in sorted({1, args.workers})
+                ]
+            finally:
+                agent.close()
+        return result
+    finally:
+        os.chdir(cwd)
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def summarize(result: dict) -> str:
+    routing = result["route_query"]
+    batch = ", ".join(f"{b['workers']}w {b['qps']:.1f} q/s" for b in result["batch"])
+    return (
+        f"{result['tools']:>6} tools | build {result['update_db']['index_build_s']:.2f}s | "
+        f"route p50 chroma {routing['chroma']['p50_ms']:.1f}ms / index {routing['routing_index']['p50_ms']:.1f}ms | "
+        f"startup {result['agent_startup']['startup_s']:.2f}s | batch {batch}"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> str:
+    parser = argparse.ArgumentParser(description="Offline VectorRoute benchmark suite")
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma-separated tool counts (e.g. 10,100,1000,10000)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake Ollama latency per request, in seconds")
+    parser.add_argument("--queries", type=int, default=200, help="Queries used for route_query latency")
+    parser.add_argument("--batch-queries", type=int, default=30, help="Queries processed in the batch benchmark")
+    parser.add_argument("--workers", type=int, default=4, help="Worker count compared against 1 in the batch benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=0, help="Fake Ollama port (0 picks a free one)")
+    parser.add_argument("--workdir", default=None, help="Parent folder for scratch trees (default: system temp)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch trees")
+    parser.add_argument("--output", default=None, help="Results JSON path (default: bench/results/<time>_<commit>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = parser.parse_args(argv)
+
+    server = FakeOllamaServer(args.port, args.latency).start()
+    # The ollama package reads OLLAMA_HOST when its default client is created,
+    # so it must be set before any project module imports ollama
+    os.environ["OLLAMA_HOST"] = server.host
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latency_s": args.latency,
+            "queries": args.queries,
+            "batch_queries": args.batch_queries,
+            "seed": args.seed,
+        },
+        "results": [],
+    }
+    try:
+        for n_tools in (int(s) for s in args.sizes.split(",") if s.strip()):
+            result = run_size(n_tools, server, args)
+            report["results"].append(result)
+            print(summarize(result))
+    finally:
+        server.stop()
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}_{commit}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    return output
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
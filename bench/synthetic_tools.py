@@ -0,0 +1,118 @@
+"""Generate synthetic ``VectorRoute-Tools`` trees for benchmarks.
+
+Each tool gets a capability JSON under ``capabilities/<domain>/`` (same
+schema as the real tools, with four example queries) and a matching
+function file under ``functions/<domain>/``. Output is deterministic for a
+given ``(n_tools, seed)``::
+
+    python -m bench.synthetic_tools /tmp/tools-1000 --tools 1000
+"""
+
+import argparse
+import json
+import os
+import random
+from typing import Dict, List, Tuple
+
+DOMAINS = [
+    "weather", "finance", "math", "travel", "calendar", "email", "files",
+    "music", "news", "sports", "health", "shopping", "maps", "translation",
+]
+VERBS = ["get", "compute", "find", "list", "convert", "check", "estimate", "search", "create", "summarize"]
+NOUNS = [
+    "forecast", "rate", "balance", "route", "event", "invoice", "report", "score",
+    "price", "distance", "reminder", "playlist", "headline", "dose", "ticket", "quote",
+]
+PLACES = ["tokyo", "paris", "london", "berlin", "delhi", "lima", "oslo", "cairo"]
+PARAM_TYPES = [("city", "string"), ("amount", "number"), ("count", "integer"), ("date", "string"), ("query", "string")]
+
+FUNCTION_TEMPLATE = '''def {name}({signature}):
+    """Synthetic benchmark tool ({domain})."""
+    return {{"tool": "{name}", "args": {{{echo}}}}}
+'''
+
+
+def tool_spec(index: int, rng: random.Random) -> Tuple[str, str, dict]:
+    """Return ``(domain, name, capability_json)`` for tool number *index*."""
+    domain = DOMAINS[index % len(DOMAINS)]
+    verb, noun = rng.choice(VERBS), rng.choice(NOUNS)
+    name = f"{verb}_{domain}_{noun}_{index}"
+    place = rng.choice(PLACES)
+    params = rng.sample(PARAM_TYPES, rng.randint(1, 3))
+    return domain, name, {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": f"{verb.capitalize()} the {domain} {noun}",
+            "long_description": f"{verb.capitalize()} the {domain} {noun} for the given inputs (synthetic tool {index})",
+            "domain": domain,
+            "example_user_queries": [
+                f"{verb} {domain} {noun} {index}",
+                f"please {verb} the {noun} for {domain} number {index}",
+                f"what is the {domain} {noun} {index} in {place}",
+                f"{noun} {index} {domain} {verb}",
+            ],
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    p: {"type": t, "description": f"{p}:{t}"} for p, t in params
+                },
+                "required": [p for p, _ in params],
+            },
+        },
+    }
+
+
+def generate_tool_tree(root: str, n_tools: int, seed: int = 0) -> Dict[str, str]:
+    """Write *n_tools* synthetic tools under *root* and return ``{name: domain}``.
+
+    Creates ``<root>/capabilities`` and ``<root>/functions``; existing files
+    with the same names are overwritten.
+    """
+    rng = random.Random(seed)
+    tools = {}
+    for index in range(n_tools):
+        domain, name, capability = tool_spec(index, rng)
+        cap_dir = os.path.join(root, "capabilities", domain)
+        fn_dir = os.path.join(root, "functions", domain)
+        os.makedirs(cap_dir, exist_ok=True)
+        os.makedirs(fn_dir, exist_ok=True)
+
+        with open(os.path.join(cap_dir, f"{name}.json"), "w") as f:
+            json.dump(capability, f, indent=1)
+
+        params = list(capability["function"]["parameters"]["properties"])
+        with open(os.path.join(fn_dir, f"{name}.py"), "w") as f:
+            f.write(
+                FUNCTION_TEMPLATE.format(
+                    name=name,
+                    domain=domain,
+                    signature=", ".join(f"{p}=None" for p in params),
+                    echo=", ".join(f'"{p}": {p}' for p in params),
+                )
+            )
+        tools[name] = domain
+    return tools
+
+
+def sample_queries(root: str, n_queries: int, seed: int = 0) -> List[str]:
+    """Pick *n_queries* example queries (with replacement) from the tree at *root*."""
+    examples = []
+    for dirpath, _, files in os.walk(os.path.join(root, "capabilities")):
+        for fname in sorted(files):
+            if fname.endswith(".json"):
+                with open(os.path.join(dirpath, fname)) as f:
+                    examples.extend(json.load(f)["function"]["example_user_queries"])
+    rng = random.Random(seed)
+    return [rng.choice(examples) for _ in range(n_queries)] if examples else []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic VectorRoute-Tools tree")
+    parser.add_argument("root", help="Output folder (gets capabilities/ and functions/)")
+    parser.add_argument("--tools", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generated = generate_tool_tree(args.root, args.tools, args.seed)
+    print(f"Wrote {len(generated)} tools to {args.root}")
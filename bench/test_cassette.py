@@ -0,0 +1,57 @@
+"""Cassette record/replay against the embedding cache.
+
+``ollama.embed`` is replaced by the fake server's hashed embedding, so no
+model server is needed.
+"""
+
+import numpy as np
+import ollama
+import pytest
+
+from agent.cassette import Cassette
+from bench.fake_ollama import fake_embedding
+from embedding import embedder
+from embedding.cache import EmbeddingCache
+from embedding.embedder import get_embedding_cache, get_embeddings, set_embedding_cache
+
+TEXTS = ["weather in tokyo", "loan emi calculator", "convert usd to eur"]
+
+
+@pytest.fixture
+def embed_calls(monkeypatch):
+    """Serve ``ollama.embed`` locally and record the inputs it receives."""
+    calls = []
+
+    def embed(model, input, **kwargs):
+        calls.append(list(input))
+        return ollama.EmbedResponse(model=model, embeddings=[fake_embedding(text) for text in input])
+
+    monkeypatch.setattr(ollama, "embed", embed)
+    # restore the process-wide cache setting afterwards
+    monkeypatch.setattr(embedder, "_cache", None)
+    monkeypatch.setattr(embedder, "_cache_disabled", False)
+    return calls
+
+
+def test_record_with_warm_cache_replays_with_cold_cache(tmp_path, monkeypatch, embed_calls):
+    warm = EmbeddingCache(db_path=str(tmp_path / "warm.db"))
+    set_embedding_cache(warm)
+    get_embeddings(TEXTS[:2])
+
+    cassette = str(tmp_path / "run.jsonl")
+    with Cassette(cassette, mode="record"):
+        recorded = get_embeddings(TEXTS)
+    # the cache was bypassed while recording, and is back afterwards
+    assert embed_calls[-1] == TEXTS
+    assert get_embedding_cache() is warm
+
+    def offline(**kwargs):
+        raise ConnectionError("no model server during replay")
+
+    monkeypatch.setattr(ollama, "embed", offline)
+    set_embedding_cache(EmbeddingCache(db_path=str(tmp_path / "cold.db")))
+    with Cassette(cassette, mode="replay"):
+        replayed = get_embeddings(TEXTS)
+
+    # replayed vectors went through the cassette's float32 packing
+    np.testing.assert_allclose(replayed, recorded, atol=1e-6)
@@ -0,0 +1,27 @@
+"""Tool-output truncation in :mod:`agent.context_budget`."""
+
+import pytest
+
+from agent.context_budget import CHARS_PER_TOKEN, ContextBudget, estimate_tokens, truncate_text
+
+
+@pytest.mark.parametrize("length", [0, 1, 7, 40, 4095, 4096, 4097, 4100, 4128, 10_000, 123_457])
+@pytest.mark.parametrize("max_tokens", [1, 2, 8, 16, 1024])
+def test_truncated_text_is_never_longer_than_input(length, max_tokens):
+    text = "x" * length
+    truncated = truncate_text(text, max_tokens)
+    assert len(truncated) <= len(text)
+    if length <= max_tokens * CHARS_PER_TOKEN:
+        assert truncated == text
+    else:
+        # the cut marker counts against the budget
+        assert len(truncated) <= max_tokens * CHARS_PER_TOKEN
+
+
+def test_truncation_saves_tokens_for_outputs_just_over_budget():
+    budget = ContextBudget(max_prompt_tokens=None, max_tool_output_tokens=1024, dedupe=False)
+    output = "y" * 4100
+    messages = [{"role": "user", "content": "q"}, {"role": "tool", "content": output}]
+    fitted = budget.fit(messages)
+    assert len(fitted[1]["content"]) <= 1024 * CHARS_PER_TOKEN
+    assert budget.stats()["saved_by_step"]["truncate"] == estimate_tokens(output) - estimate_tokens(fitted[1]["content"]) > 0
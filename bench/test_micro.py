@@ -0,0 +1,30 @@
+"""Run the hot-path microbenchmarks under pytest.
+
+By default the tests only report each timing next to its stored baseline:
+wall-clock numbers depend on the machine and its load, so they do not
+gate the suite. Set ``VR_MICRO_ENFORCE=1`` to fail benchmarks that
+:func:`bench.micro.regressed` flags against the baseline, with
+``VR_MICRO_THRESHOLD`` (default :data:`bench.micro.DEFAULT_THRESHOLD`).
+``python -m bench.micro`` always enforces it.
+"""
+
+import os
+
+import pytest
+
+from bench.micro import BENCHMARKS, DEFAULT_THRESHOLD, format_result, load_baseline, regressed, run_benchmark
+
+ENFORCE = os.environ.get("VR_MICRO_ENFORCE", "").lower() in ("1", "true", "yes")
+THRESHOLD = float(os.environ.get("VR_MICRO_THRESHOLD", DEFAULT_THRESHOLD))
+BASELINE = load_baseline()
+
+
+@pytest.mark.parametrize("name", list(BENCHMARKS))
+def test_microbenchmark(name):
+    result = run_benchmark(name, rounds=3, repeat=3, min_time=0.05)
+    baseline = BASELINE.get(name)
+    print(f"{name}: {format_result(result)} (baseline {format_result(baseline)})")
+    if baseline and ENFORCE:
+        assert not regressed(result, baseline, THRESHOLD), (
+            f"{name} regressed: {format_result(result)} vs baseline {format_result(baseline)}"
+        )
@@ -0,0 +1,109 @@
+"""Tool result cache (tools.result_cache) and its registry wiring."""
+
+import json
+
+import pytest
+
+from tools import result_cache
+from tools.result_cache import ToolResultCache, cache_policy
+from tools.tool_registry import build_tool_registry
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Manually advanced stand-in for ``time.monotonic``."""
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _counted(calls):
+    def tool(city):
+        calls.append(city)
+        return {"city": city, "days": [1, 2]}
+    return tool
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache, calls = ToolResultCache(), []
+    tool = _counted(calls)
+
+    cache.call("weather", "h", 10, tool, (), {"city": "Oslo"})
+    clock[0] += 9
+    cache.call("weather", "h", 10, tool, (), {"city": "Oslo"})
+    assert calls == ["Oslo"]
+
+    clock[0] += 2
+    cache.call("weather", "h", 10, tool, (), {"city": "Oslo"})
+    assert calls == ["Oslo", "Oslo"]
+    assert cache.stats()["expired"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache, calls = ToolResultCache(max_entries=2), []
+    tool = _counted(calls)
+
+    for city in ("Oslo", "Lima", "Oslo", "Cairo"):
+        cache.call("weather", "h", 60, tool, (), {"city": city})
+    # Lima was the least recently used when Cairo arrived
+    assert calls == ["Oslo", "Lima", "Cairo"]
+    cache.call("weather", "h", 60, tool, (), {"city": "Oslo"})
+    cache.call("weather", "h", 60, tool, (), {"city": "Lima"})
+    assert calls == ["Oslo", "Lima", "Cairo", "Lima"]
+    assert cache.stats()["evictions"] == 2
+
+
+def test_hits_are_isolated_from_callers():
+    cache = ToolResultCache()
+    tool = _counted([])
+
+    first = cache.call("weather", "h", 60, tool, (), {"city": "Oslo"})
+    first["days"].append(3)
+    second = cache.call("weather", "h", 60, tool, (), {"city": "Oslo"})
+    second["city"] = "changed"
+    assert cache.call("weather", "h", 60, tool, (), {"city": "Oslo"}) == {"city": "Oslo", "days": [1, 2]}
+
+
+def test_keys_ignore_argument_order_and_include_file_hash():
+    cache, calls = ToolResultCache(), []
+
+    def tool(a, b):
+        calls.append((a, b))
+        return a + b
+
+    cache.call("add", "v1", 60, tool, (), {"a": 1, "b": 2})
+    cache.call("add", "v1", 60, tool, (), {"b": 2, "a": 1})
+    cache.call("add", "v2", 60, tool, (), {"a": 1, "b": 2})
+    assert len(calls) == 2
+
+
+def test_cache_policy():
+    assert cache_policy({"function": {"cacheable": True, "ttl_seconds": 30}}) == 30
+    assert cache_policy({"function": {"cacheable": True}}) == float("inf")
+    assert cache_policy({"function": {"ttl_seconds": 30}}) is None
+    assert cache_policy({"function": {"cacheable": True, "ttl_seconds": 0}}) is None
+    assert cache_policy(None) is None
+
+
+def test_apply_changes_invalidates_cached_results(tmp_path):
+    capabilities = tmp_path / "capabilities"
+    functions = tmp_path / "functions"
+    capabilities.mkdir()
+    functions.mkdir()
+    capability = {"type": "function", "function": {"name": "rate", "cacheable": True, "ttl_seconds": 3600}}
+    (capabilities / "rate.json").write_text(json.dumps(capability))
+    (functions / "rate.py").write_text("def rate(code):\n    return {'code': code, 'rate': 1}\n")
+
+    registry = build_tool_registry(str(capabilities), str(functions), usage_path=None)
+    assert registry["rate"](code="usd") == {"code": "usd", "rate": 1}
+    assert registry["rate"](code="usd") == {"code": "usd", "rate": 1}
+    assert registry.result_cache.stats()["hits"] == 1
+
+    (functions / "rate.py").write_text("def rate(code):\n    return {'code': code, 'rate': 2}\n")
+    registry.apply_changes({"added": [], "modified": ["rate"], "deleted": []})
+    assert registry.result_cache.stats()["entries"] == 0
+    assert registry["rate"](code="usd") == {"code": "usd", "rate": 2}
+
+    registry.apply_changes({"added": [], "modified": [], "deleted": ["rate"]})
+    assert "rate" not in registry
+    assert registry.result_cache.stats()["entries"] == 0
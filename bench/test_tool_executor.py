@@ -0,0 +1,89 @@
+"""Tool timeouts on the shared executor (tools.tool_executor)."""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from agent.models import Task
+from tools.tool_executor import ToolExecutor, ToolTimeoutError
+from tools.tool_registry import build_tool_registry
+
+SLOW_TOOL = "import time\n\ndef {name}(seconds):\n    time.sleep(seconds)\n    return seconds\n"
+
+
+def _registry(tmp_path, name: str, **policy):
+    capabilities = tmp_path / "capabilities"
+    functions = tmp_path / "functions"
+    capabilities.mkdir(exist_ok=True)
+    functions.mkdir(exist_ok=True)
+    capability = {"type": "function", "function": {"name": name, **policy, "parameters": {
+        "type": "object",
+        "properties": {"seconds": {"type": "number"}},
+    }}}
+    (capabilities / f"{name}.json").write_text(json.dumps(capability))
+    (functions / f"{name}.py").write_text(SLOW_TOOL.format(name=name))
+    return build_tool_registry(str(capabilities), str(functions), usage_path=None)
+
+
+def test_slow_tool_yields_structured_timeout(tmp_path):
+    registry = _registry(tmp_path, "slow_thread_tool", timeout_seconds=0.2)
+
+    start = time.perf_counter()
+    result = asyncio.run(Task._call_tool("slow_thread_tool", {"seconds": "1"}, registry))
+    assert time.perf_counter() - start < 1
+    assert result["error"] == "TOOL_TIMEOUT"
+    assert result["tool"] == "slow_thread_tool"
+    assert result["timeout_seconds"] == 0.2
+    assert result["phase"] == "running"
+
+    assert asyncio.run(Task._call_tool("slow_thread_tool", {"seconds": 0}, registry)) == 0
+
+
+def test_inline_tools_do_not_block_the_event_loop(tmp_path):
+    registry = _registry(tmp_path, "slow_inline_tool", execution="inline", timeout_seconds=0.3)
+
+    async def main():
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.05)
+
+        _, result = await asyncio.gather(
+            ticker(), Task._call_tool("slow_inline_tool", {"seconds": 0.5}, registry)
+        )
+        return result, ticks
+
+    result, ticks = asyncio.run(main())
+    assert result["error"] == "TOOL_TIMEOUT"
+    # the ticker kept running while the tool slept
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.25
+
+    assert ToolExecutor().run(registry["slow_inline_tool"], {"seconds": 0.4}) == 0.4
+
+
+def test_process_timeout_kills_the_stuck_worker(tmp_path):
+    registry = _registry(tmp_path, "slow_process_tool", execution="process", timeout_seconds=3, max_concurrency=1)
+    executor = ToolExecutor(process_workers=1)
+    try:
+        tool = registry["slow_process_tool"]
+        assert executor.run(tool, {"seconds": 0}) == 0
+        pool = executor._process_pool()
+        workers = list(pool._processes.values())
+        with pytest.raises(ToolTimeoutError):
+            executor.run(tool, {"seconds": 60})
+
+        deadline = time.monotonic() + 10
+        while any(worker.is_alive() for worker in workers) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not any(worker.is_alive() for worker in workers)
+        assert executor.killed_pools == 1
+
+        # later calls run on a fresh pool, and the stuck call gave its slot back
+        assert executor.run(tool, {"seconds": 0}) == 0
+        assert executor._process_pool() is not pool
+    finally:
+        executor.shutdown()
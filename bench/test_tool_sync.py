@@ -0,0 +1,170 @@
+"""Incremental re-indexing: tool-level change detection and facet diffing.
+
+Embeddings come from the fake server's hashed embedding, so no model
+server is needed.
+"""
+
+import json
+import os
+
+import pytest
+
+from bench.fake_ollama import fake_embedding
+from bench.synthetic_tools import generate_tool_tree
+from tools import db_connection
+from tools.capability_catalog import CapabilityCatalog
+from tools.db_connection import DBConnection
+from tools.file_tracker import FileTracker
+
+
+class _SpyCollection:
+    """Forward to a Chroma collection, recording upserted and deleted ids."""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.upserted = []
+        self.deleted = []
+
+    def upsert(self, ids, **kwargs):
+        self.upserted.append(list(ids))
+        return self._collection.upsert(ids=ids, **kwargs)
+
+    def delete(self, ids=None, **kwargs):
+        self.deleted.append(list(ids))
+        return self._collection.delete(ids=ids, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    generate_tool_tree(str(tmp_path / "tools"), n_tools=3)
+    return tmp_path
+
+
+@pytest.fixture
+def embedded(monkeypatch):
+    """Record every batch of texts sent to the embedder."""
+    calls = []
+
+    def get_embeddings(texts, batch_size=None):
+        calls.append(list(texts))
+        return [fake_embedding(text) for text in texts]
+
+    monkeypatch.setattr(db_connection, "get_embeddings", get_embeddings)
+    return calls
+
+
+def _tracker(root) -> FileTracker:
+    return FileTracker(
+        base_dir=str(root),
+        db_path=str(root / "file_hashes.db"),
+        capabilities_folder=str(root / "tools" / "capabilities"),
+        functions_folder=str(root / "tools" / "functions"),
+    )
+
+
+def _detect(root) -> dict:
+    tracker = _tracker(root)
+    try:
+        return tracker.get_file_changes()
+    finally:
+        tracker.close_connection()
+
+
+def _changes(root) -> dict:
+    """The non-empty entries of the detected changes."""
+    return {kind: names for kind, names in _detect(root).items() if names}
+
+
+def _files(root, kind: str, extension: str) -> dict:
+    """``{tool_name: path}`` of the *kind* (capabilities/functions) files."""
+    paths = {}
+    for folder, _, files in os.walk(root / "tools" / kind):
+        for fn in files:
+            if fn.endswith(extension):
+                paths[os.path.splitext(fn)[0]] = os.path.join(folder, fn)
+    return paths
+
+
+def _edit_capability(path: str, **fields) -> None:
+    with open(path) as f:
+        capability = json.load(f)
+    capability["function"].update(fields)
+    with open(path, "w") as f:
+        json.dump(capability, f, indent=1)
+
+
+def test_one_example_edit_reembeds_one_facet(tree, embedded):
+    capabilities = str(tree / "tools" / "capabilities")
+    db = DBConnection(db_path=str(tree / "chroma"), catalog=CapabilityCatalog(capabilities))
+    db.update_db(_detect(tree))
+
+    name, path = sorted(_files(tree, "capabilities", ".json").items())[0]
+    with open(path) as f:
+        examples = json.load(f)["function"]["example_user_queries"]
+    _edit_capability(path, example_user_queries=["an edited example"] + examples[1:])
+
+    changes = _detect(tree)
+    assert (changes["added"], changes["modified"], changes["deleted"]) == ([], [name], [])
+    db.collection = _SpyCollection(db.collection)
+    embedded.clear()
+    db.update_db(changes)
+
+    assert embedded == [["an edited example"]]
+    assert len(db.collection.upserted) == 1 and len(db.collection.upserted[0]) == 1
+    assert db.collection.deleted == [[DBConnection._facet_id(name, "example_query", examples[0])]]
+    stored = db.collection.get(where={"tool": name}, include=[])["ids"]
+    assert len(stored) == len(db._collect_facets(name, db.catalog.get(name)))
+
+
+def test_json_only_changes(tree):
+    _changes(tree)
+    capabilities = _files(tree, "capabilities", ".json")
+    name = sorted(capabilities)[0]
+
+    _edit_capability(capabilities[name], description="edited")
+    assert _changes(tree) == {"modified": [name]}
+
+    os.remove(capabilities[name])
+    assert _changes(tree) == {"deleted": [name]}
+
+    # the function file never went away, so the JSON completes the pair again
+    with open(capabilities[name], "w") as f:
+        json.dump({"type": "function", "function": {"name": name}}, f)
+    assert _changes(tree) == {"added": [name]}
+
+
+def test_py_only_changes(tree):
+    _changes(tree)
+    functions = _files(tree, "functions", ".py")
+    name = sorted(functions)[0]
+
+    with open(functions[name], "a") as f:
+        f.write("\n# edited\n")
+    assert _changes(tree) == {"modified": [name]}
+
+    with open(functions[name]) as f:
+        source = f.read()
+    os.remove(functions[name])
+    assert _changes(tree) == {"deleted": [name]}
+
+    with open(functions[name], "w") as f:
+        f.write(source)
+    assert _changes(tree) == {"added": [name]}
+
+
+def test_half_a_pair_is_not_reported(tree):
+    _changes(tree)
+    folder = tree / "tools" / "capabilities" / "extra"
+    folder.mkdir()
+    with open(folder / "lonely_tool.json", "w") as f:
+        json.dump({"type": "function", "function": {"name": "lonely_tool"}}, f)
+    assert _changes(tree) == {}
+
+    _edit_capability(str(folder / "lonely_tool.json"), description="edited")
+    assert _changes(tree) == {}
+
+    os.remove(folder / "lonely_tool.json")
+    assert _changes(tree) == {}
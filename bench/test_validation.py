@@ -0,0 +1,102 @@
+"""Compiled argument validators (agent.validation)."""
+
+import json
+
+import pytest
+
+from agent.validation import ArgumentValidator, get_validator, validate_and_coerce
+from tools.tool_registry import build_tool_registry
+
+PARAMETERS = {
+    "properties": {
+        "city": {"type": "string"},
+        "zip_code": {"type": "string"},
+        "days": {"type": "integer"},
+        "amount": {"type": "number"},
+        "hourly": {"type": "boolean"},
+        "stops": {"type": "array"},
+        "options": {"type": "object"},
+    }
+}
+
+
+def _untyped_tool(city, zip_code=None, days=3, amount=None, hourly=False, stops=None, options=None, extra=None):
+    return city
+
+
+def _typed_tool(city: str, days: int = 3):
+    return city
+
+
+def test_capability_types_are_coerced():
+    validator = ArgumentValidator(_untyped_tool, PARAMETERS)
+    args = validator({
+        "city": "Tokyo",
+        "days": "5",
+        "amount": "2.5",
+        "hourly": "true",
+        "stops": '["a", "b"]',
+        "options": '{"fast": true}',
+    })
+    assert args["days"] == 5
+    assert args["amount"] == 2.5
+    assert args["hourly"] is True
+    assert args["stops"] == ["a", "b"]
+    assert args["options"] == {"fast": True}
+
+
+def test_numbers_are_accepted_for_strings():
+    validator = ArgumentValidator(_untyped_tool, PARAMETERS)
+    args = validator({"city": "Tokyo", "zip_code": 94107, "amount": 3})
+    assert args["zip_code"] == "94107"
+    assert args["amount"] == 3.0
+
+    assert ArgumentValidator(_typed_tool)({"city": 12, "days": "4"}) == {"city": "12", "days": 4}
+
+
+def test_undeclared_parameters_keep_best_effort_coercion():
+    validator = ArgumentValidator(_untyped_tool, PARAMETERS)
+    assert validator({"city": "Tokyo", "extra": "[1, 2]"})["extra"] == [1, 2]
+    assert validator({"city": "Tokyo", "extra": "not json"})["extra"] == "not json"
+
+
+def test_annotations_take_precedence_over_capability_types():
+    validator = ArgumentValidator(_typed_tool, {"properties": {"days": {"type": "string"}}})
+    assert validator({"city": "Tokyo", "days": "7"})["days"] == 7
+
+
+def test_invalid_arguments_raise_value_error():
+    validator = ArgumentValidator(_untyped_tool, PARAMETERS)
+    with pytest.raises(ValueError):
+        validator({"days": 1})  # city is required
+    with pytest.raises(ValueError):
+        validator({"city": "Tokyo", "days": "five"})
+
+
+def test_validator_is_compiled_once_per_function():
+    assert get_validator(_typed_tool) is get_validator(_typed_tool)
+    assert validate_and_coerce({"city": "Oslo"}, _typed_tool) == {"city": "Oslo", "days": 3}
+
+
+def test_registry_tools_use_capability_types_until_reset(tmp_path):
+    capabilities = tmp_path / "capabilities"
+    functions = tmp_path / "functions"
+    capabilities.mkdir()
+    functions.mkdir()
+    (functions / "lookup.py").write_text("def lookup(code, count=1):\n    return code * count\n")
+    capability = {"type": "function", "function": {"name": "lookup", "parameters": {
+        "type": "object",
+        "properties": {"code": {"type": "string"}, "count": {"type": "integer"}},
+    }}}
+    (capabilities / "lookup.json").write_text(json.dumps(capability))
+
+    tool = build_tool_registry(str(capabilities), str(functions), usage_path=None)["lookup"]
+    validator = get_validator(tool)
+    assert validator is tool.validator
+    assert validator({"code": 7, "count": "2"}) == {"code": "7", "count": 2}
+
+    capability["function"]["parameters"]["properties"]["count"]["type"] = "string"
+    (capabilities / "lookup.json").write_text(json.dumps(capability))
+    tool.reset()
+    assert get_validator(tool) is not validator
+    assert get_validator(tool)({"code": "x", "count": 2}) == {"code": "x", "count": "2"}
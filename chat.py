@@ -7,6 +7,7 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--model", default="llama3.2:3b", help="Ollama model to use")
     # parser.add_argument("--model", default="functiongemma:latest", help="Ollama model to use")
+    parser.add_argument("--no-stream", action="store_true", help="Wait for the full answer instead of streaming it")
     args = parser.parse_args()
 
     agent = Agent(model=args.model)
@@ -25,19 +26,38 @@ def main():
             if not user_input:
                 continue
 
-            # response, tools_used = agent.run(user_input)
-            response, tools_used = agent.ask(user_input)
-            print(f"\n\nTools used: {tools_used}")
+            if args.no_stream:
+                # response, tools_used = agent.run(user_input)
+                response, tools_used = agent.ask(user_input)
+                print(f"\n\nTools used: {tools_used}")
 
-            response_dict = dict(response)
+                response_dict = dict(response)
 
-            content = response_dict.get("content", "")
+                content = response_dict.get("content", "")
 
-            print(f"Agent: {content}\n\n")
+                print(f"Agent: {content}\n\n")
+                continue
+
+            streaming = False
+            for event in agent.ask_stream(user_input):
+                if event["type"] == "plan":
+                    print(f"[plan] {len(event['tasks'])} task(s)")
+                elif event["type"] == "task":
+                    tools = ", ".join(event["tools_used"]) or "no tools"
+                    print(f"[task {event['id']}] {event['status']} ({tools})")
+                elif event["type"] == "token":
+                    if not streaming:
+                        print("Agent: ", end="", flush=True)
+                        streaming = True
+                    print(event["content"], end="", flush=True)
+                elif event["type"] == "done":
+                    print(f"\n\nTools used: {event['tools_used']}\n\n")
 
 
     except KeyboardInterrupt:
         print("\nInterrupted. Exiting.")
+    finally:
+        agent.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# Paths (base_dir inferred from this file's parent)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, "embedding_db", "embedding_cache.db")
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache: in-memory LRU in front of SQLite.
+
+    Entries are keyed by ``(model, sha256(text))`` so the same string is
+    never embedded twice by the same model, across runs and processes.
+
+    - The memory tier is an ``OrderedDict`` bounded to *max_memory_entries*;
+      the least recently used entry is dropped when it is full.
+    - The disk tier stores vectors as float32 blobs and is bounded to
+      *max_disk_entries*; when it overflows, the least recently used rows
+      are pruned down to 90% of the limit.
+    - :meth:`invalidate` drops everything stored for one model (or all).
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_memory_entries: int = 4096,
+        max_disk_entries: int = 200_000,
+    ) -> None:
+        self.db_path = db_path or DEFAULT_CACHE_PATH
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[Tuple[str, str], list]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.conn = self._init_db()
+
+    # ---- Database helpers -------------------------------------------------
+    def _init_db(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        # Shared by every thread of the process; access is serialised by _lock
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        conn.commit()
+        return conn
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _encode(vector: Sequence[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _decode(blob: bytes) -> list:
+        vec = array("f")
+        vec.frombytes(blob)
+        return vec.tolist()
+
+    def _remember(self, key: Tuple[str, str], vector: list) -> None:
+        """Insert into the memory LRU, evicting the oldest entry when full."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    # ---- Public API -------------------------------------------------------
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[list]]:
+        """Return the cached vector for each text, or ``None`` on a miss."""
+        keys = [(model, self.text_hash(t)) for t in texts]
+        found: Dict[Tuple[str, str], list] = {}
+        from_disk = set()
+
+        with self._lock:
+            pending = []
+            for key in dict.fromkeys(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                else:
+                    pending.append(key[1])
+
+            if pending:
+                rows = []
+                # Stay well below SQLite's bound-parameter limit
+                for start in range(0, len(pending), 500):
+                    chunk = pending[start : start + 500]
+                    marks = ",".join("?" * len(chunk))
+                    rows.extend(
+                        self.conn.execute(
+                            f"SELECT text_hash, vector FROM embeddings "
+                            f"WHERE model = ? AND text_hash IN ({marks})",
+                            (model, *chunk),
+                        ).fetchall()
+                    )
+                for text_hash, blob in rows:
+                    key = (model, text_hash)
+                    found[key] = self._decode(blob)
+                    from_disk.add(key)
+                    self._remember(key, found[key])
+                if rows:
+                    now = time.time()
+                    self.conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model, text_hash) for text_hash, _ in rows],
+                    )
+                    self.conn.commit()
+
+            results = []
+            for key in keys:
+                vector = found.get(key)
+                if vector is None:
+                    self.misses += 1
+                elif key in from_disk:
+                    self.disk_hits += 1
+                else:
+                    self.memory_hits += 1
+                results.append(vector)
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[list]) -> None:
+        """Store freshly computed vectors in both tiers. Empty vectors are ignored."""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                if not vector:
+                    continue
+                key = (model, self.text_hash(text))
+                self._remember(key, list(vector))
+                rows.append((model, key[1], len(vector), self._encode(vector), now))
+            if not rows:
+                return
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._prune_disk()
+            self.conn.commit()
+
+    def _prune_disk(self) -> None:
+        """Drop least recently used rows once the disk tier exceeds its bound."""
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count <= self.max_disk_entries:
+            return
+        excess = count - int(self.max_disk_entries * 0.9)
+        self.conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+        self.evictions += excess
+
+    def invalidate(self, model: Optional[str] = None) -> int:
+        """Forget every vector of *model* (all models if ``None``).
+
+        Returns the number of rows removed from the disk tier.
+        """
+        with self._lock:
+            if model is None:
+                self._memory.clear()
+                cur = self.conn.execute("DELETE FROM embeddings")
+            else:
+                for key in [k for k in self._memory if k[0] == model]:
+                    del self._memory[key]
+                cur = self.conn.execute("DELETE FROM embeddings WHERE model = ?", (model,))
+            self.conn.commit()
+            return cur.rowcount
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current tier sizes."""
+        with self._lock:
+            (disk_entries,) = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
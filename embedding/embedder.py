@@ -1,11 +1,128 @@
+import asyncio
+import threading
+from typing import List, Optional
+
 import ollama
 
-def get_embedding(text: str, model: str = "nomic-embed-text"):
-    response = ollama.embeddings(
-        model=model,
-        prompt=text
-    )
-    return response["embedding"]
+from embedding.cache import EmbeddingCache
+from telemetry.metrics import record_cache, span
+
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+DEFAULT_BATCH_SIZE = 64
+
+_cache: Optional[EmbeddingCache] = None
+_cache_disabled = False
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide embedding cache, creating it on first use."""
+    global _cache
+    if _cache_disabled:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
+def set_embedding_cache(cache: Optional[EmbeddingCache]) -> None:
+    """Install *cache* as the process-wide cache; ``None`` disables caching."""
+    global _cache, _cache_disabled
+    with _cache_lock:
+        _cache = cache
+        _cache_disabled = cache is None
+
+
+def get_embedding(text: str, model: str = DEFAULT_EMBED_MODEL, use_cache: bool = True):
+    """Embed a single string. Thin wrapper around :func:`get_embeddings`."""
+    return get_embeddings([text], model=model, use_cache=use_cache)[0]
+
+
+def get_embeddings(
+    texts: List[str],
+    model: str = DEFAULT_EMBED_MODEL,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    use_cache: bool = True,
+) -> List[list]:
+    """Embed many strings using Ollama's batched ``/api/embed`` endpoint.
+
+    Texts already present in the embedding cache are served from it; only
+    the misses (deduplicated) are sent to Ollama, *batch_size* at a time, so
+    N new strings cost ``ceil(N / batch_size)`` round trips instead of N.
+    The returned list is aligned with *texts*; an entry is an empty list if
+    Ollama returned no vector for that input.
+    """
+    with span("embed", texts=len(texts), model=model):
+        cache = get_embedding_cache() if use_cache else None
+        embeddings: List[Optional[list]] = (
+            cache.get_many(model, texts) if cache else [None] * len(texts)
+        )
+
+        missing = list(dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None))
+        if cache:
+            record_cache("embedding", hits=len(texts) - embeddings.count(None), misses=len(missing))
+        computed = {}
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start : start + batch_size]
+            response = ollama.embed(model=model, input=batch)
+            vectors = list(response["embeddings"] or [])
+            # Pad defensively so callers can always zip() results with inputs
+            vectors.extend([] for _ in range(len(batch) - len(vectors)))
+            computed.update(zip(batch, vectors))
+            if cache:
+                cache.put_many(model, batch, vectors)
+
+    return [e if e is not None else computed[t] for t, e in zip(texts, embeddings)]
+
+
+async def aget_embeddings(
+    texts: List[str],
+    model: str = DEFAULT_EMBED_MODEL,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    use_cache: bool = True,
+    client: Optional[ollama.AsyncClient] = None,
+) -> List[list]:
+    """Async :func:`get_embeddings` built on ``ollama.AsyncClient``.
+
+    Cache lookups and writes (SQLite) run in a worker thread so the event
+    loop never blocks on disk.
+    """
+    client = client or ollama.AsyncClient()
+    with span("embed", texts=len(texts), model=model):
+        cache = get_embedding_cache() if use_cache else None
+        embeddings: List[Optional[list]] = (
+            await asyncio.to_thread(cache.get_many, model, texts)
+            if cache
+            else [None] * len(texts)
+        )
+
+        missing = list(dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None))
+        if cache:
+            record_cache("embedding", hits=len(texts) - embeddings.count(None), misses=len(missing))
+        batches = [missing[start : start + batch_size] for start in range(0, len(missing), batch_size)]
+        responses = await asyncio.gather(*(client.embed(model=model, input=batch) for batch in batches))
+
+        computed = {}
+        for batch, response in zip(batches, responses):
+            vectors = list(response["embeddings"] or [])
+            vectors.extend([] for _ in range(len(batch) - len(vectors)))
+            computed.update(zip(batch, vectors))
+            if cache:
+                await asyncio.to_thread(cache.put_many, model, batch, vectors)
+
+    return [e if e is not None else computed[t] for t, e in zip(texts, embeddings)]
+
+
+async def aget_embedding(
+    text: str,
+    model: str = DEFAULT_EMBED_MODEL,
+    use_cache: bool = True,
+    client: Optional[ollama.AsyncClient] = None,
+):
+    """Async :func:`get_embedding`."""
+    return (await aget_embeddings([text], model=model, use_cache=use_cache, client=client))[0]
 
 
-#TODO: write a function which writes the whole agent context into a json file
\ No newline at end of file
+#TODO: write a function which writes the whole agent context into a json file
@@ -2,28 +2,64 @@ from tools.tool_registry import update_tool_registry
 from agent.agent import Agent
 # from agent.clasical_agent import ClassicalAgent
 from agent.batch_processor import BatchProcessor
+from agent.cassette import use_cassette
 
+import argparse
 import os
 import time
 
 if __name__ == "__main__":
-    # Load tools into tool registry
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1, help="Number of queries processed concurrently")
+    parser.add_argument("--input", default="io/queries.csv", help="CSV or JSONL file of queries")
+    parser.add_argument("--output", default=None, help="CSV or JSONL results file; re-use it to resume an interrupted run")
+    parser.add_argument("--query-field", default=None, help="Column/field holding the query text")
+    parser.add_argument("--id-field", default=None, help="Column/field holding a stable query id")
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument("--record", default=None, metavar="CASSETTE", help="Record every Ollama call to this cassette (.jsonl or .jsonl.gz)")
+    cassette_group.add_argument("--replay", default=None, metavar="CASSETTE", help="Answer Ollama calls from this cassette instead of a model server")
+    args = parser.parse_args()
+
+    # Installed before anything talks to Ollama (Agent setup embeds tools)
+    cassette = use_cassette(record=args.record, replay=args.replay)
+
+    # Load tools into tool registry (lazy: modules import on first call)
     tool_registry = update_tool_registry()
 
     # Vector Route Agent
-    agent = Agent(model="functiongemma:latest")
+    agent = Agent(model="functiongemma:latest", prewarm_tools=8)
 
     # Clasical Agent
     # agent = ClassicalAgent(tool_registry,tool_embedding)
 
-    input_file = "io/queries.csv"
+    input_file = args.input
     input_file = os.path.abspath(input_file)
 
     folder = "vr" if isinstance(agent, Agent) else "clasical"
 
-    output_file = f"io/{folder}/agent_run_log_{time.time()}.csv"
+    output_file = args.output or f"io/{folder}/agent_run_log_{time.time()}.csv"
     outfile = os.path.abspath(output_file)
 
-    bp = BatchProcessor(agent,input_file,output_file)
+    bp = BatchProcessor(
+        agent,
+        input_file,
+        output_file,
+        workers=args.workers,
+        query_field=args.query_field,
+        id_field=args.id_field,
+    )
+
+    try:
+        bp.process_batch()
+    finally:
+        agent.close()
+
+    # Call counts feed the next run's pre-warm
+    agent.tool_registry.save_usage()
+    agent.tool_registry.print_import_report()
+    print(f"Tool result cache: {agent.tool_registry.result_cache.stats()}")
+    print(f"Context budget: {agent.context_budget.stats()}")
 
-    bp.process_batch()
\ No newline at end of file
+    if cassette:
+        cassette.uninstall()
+        print(f"Cassette: {cassette.stats()}")
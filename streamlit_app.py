@@ -24,9 +24,31 @@ def create_agent(model: str) -> Agent:
     return Agent(model=model)
 
 
+def stream_agent_answer(agent: Agent, prompt: str, status, meta: dict):
+    """Yield the aggregated answer's tokens for ``st.write_stream`` while
+    reporting plan/task progress in the *status* container."""
+    for event in agent.ask_stream(prompt):
+        if event["type"] == "plan":
+            status.write(f"Plan ready: {len(event['tasks'])} task(s)")
+        elif event["type"] == "task":
+            tools = ", ".join(event["tools_used"]) or "no tools"
+            status.write(f"Task {event['id']} {event['status']}: {event['query']} ({tools})")
+        elif event["type"] == "token":
+            yield event["content"]
+        elif event["type"] == "done":
+            meta["tools_used"] = event["tools_used"]
+            status.update(label="Done", state="complete")
+
+
 def load_tools_into_session():
     try:
-        st.session_state.tool_registry = FileTracker.get_tool_registry()
+        agent = st.session_state.get("agent")
+        if agent is not None:
+            # re-syncs the agent's tools (and validators) with the files on disk
+            agent.sync_tools()
+            st.session_state.tool_registry = agent.tool_registry
+        else:
+            st.session_state.tool_registry = FileTracker.get_tool_registry()
     except Exception as e:
         st.session_state.tool_registry = {}
         st.error(f"Failed to load tool registry: {e}")
@@ -112,6 +134,9 @@ def main():
     if st.sidebar.button("Start / Restart Agent"):
         st.session_state.model = model_input.strip() or st.session_state.model
         with st.spinner("Initializing agent..."):
+            if st.session_state.agent is not None:
+                # stop the previous agent's event loop thread and connections
+                st.session_state.agent.close()
             st.session_state.agent = create_agent(model=st.session_state.model)
         st.success(f"Agent initialized with model {st.session_state.model}")
 
@@ -146,20 +171,17 @@ def main():
                 response = "Please start the agent in the sidebar first."
                 st.warning(response)
             else:
-                with st.spinner("Thinking..."):
-                    try:
-                        final_message, tools_used = st.session_state.agent.ask(prompt)
-                        # The agent.ask returns a message dict or object
-                        if isinstance(final_message, dict):
-                            response = final_message.get("content", str(final_message))
-                        else:
-                            response = getattr(final_message, "content", str(final_message))
-                        
-                        if tools_used:
-                            st.caption(f"Tools used: {', '.join(tools_used)}")
-                    except Exception as e:
-                        response = f"Error invoking agent: {e}"
-                st.markdown(response)
+                meta = {"tools_used": []}
+                try:
+                    status = st.status("Thinking...")
+                    response = st.write_stream(
+                        stream_agent_answer(st.session_state.agent, prompt, status, meta)
+                    )
+                    if meta["tools_used"]:
+                        st.caption(f"Tools used: {', '.join(meta['tools_used'])}")
+                except Exception as e:
+                    response = f"Error invoking agent: {e}"
+                    st.markdown(response)
 
         # Add assistant response to chat history
         st.session_state.messages.append({"role": "assistant", "content": response})
@@ -0,0 +1,191 @@
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from telemetry.trace import current_tracer
+
+# Stages recorded by the pipeline (a span may use any name; these are the
+# ones surfaced as fixed columns, e.g. by BatchProcessor)
+STAGES = ("decompose", "embed", "route", "task", "llm", "tool", "aggregate")
+
+
+class QueryMetrics:
+    """Per-query breakdown of wall time, LLM token counts and cache hits.
+
+    Stage times are summed over every span of that stage, so with tasks
+    running concurrently the sum of the stages can exceed ``total``.
+    Thread-safe: tasks of one query record into the same object.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.stage_seconds: Dict[str, float] = defaultdict(float)
+        self.stage_calls: Dict[str, int] = defaultdict(int)
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.eval_tokens = 0
+        self.context_tokens = 0
+        self.context_tokens_saved = 0
+        self.cache: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+            self.stage_calls[stage] += 1
+
+    def add_llm(self, prompt_tokens: int, eval_tokens: int) -> None:
+        with self._lock:
+            self.llm_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.eval_tokens += eval_tokens
+
+    def add_context(self, estimated_tokens: int, saved_tokens: int) -> None:
+        with self._lock:
+            self.context_tokens += estimated_tokens
+            self.context_tokens_saved += saved_tokens
+
+    def add_cache(self, name: str, hits: int, misses: int) -> None:
+        with self._lock:
+            self.cache[name]["hits"] += hits
+            self.cache[name]["misses"] += misses
+
+    def as_dict(self) -> dict:
+        """Flat, JSON-serialisable breakdown (``<stage>_s`` keys in seconds)."""
+        with self._lock:
+            out: Dict[str, Any] = {f"{stage}_s": round(self.stage_seconds.get(stage, 0.0), 6) for stage in STAGES}
+            for stage, seconds in self.stage_seconds.items():
+                out.setdefault(f"{stage}_s", round(seconds, 6))
+            out["total_s"] = round(self.total, 6)
+            out["llm_calls"] = self.llm_calls
+            out["prompt_tokens"] = self.prompt_tokens
+            out["eval_tokens"] = self.eval_tokens
+            out["context_tokens"] = self.context_tokens
+            out["context_tokens_saved"] = self.context_tokens_saved
+            out["cache_hits"] = sum(c["hits"] for c in self.cache.values())
+            out["cache_misses"] = sum(c["misses"] for c in self.cache.values())
+            out["cache"] = {name: dict(c) for name, c in self.cache.items()}
+            return out
+
+
+class RollingStats:
+    """Rolling p50/p95/p99 of per-query stage times over the last *window* queries."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+
+    def add(self, metrics: QueryMetrics) -> None:
+        with self._lock:
+            self._samples["total"].append(metrics.total)
+            for stage, seconds in list(metrics.stage_seconds.items()):
+                self._samples[stage].append(seconds)
+
+    @staticmethod
+    def _percentile(ordered: list, q: float) -> float:
+        # nearest-rank percentile
+        index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            result = {}
+            for stage, samples in self._samples.items():
+                ordered = sorted(samples)
+                if not ordered:
+                    continue
+                result[stage] = {
+                    "count": len(ordered),
+                    "p50": self._percentile(ordered, 50),
+                    "p95": self._percentile(ordered, 95),
+                    "p99": self._percentile(ordered, 99),
+                }
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+ROLLING = RollingStats()
+
+_current: ContextVar[Optional[QueryMetrics]] = ContextVar("vectorroute_query_metrics", default=None)
+
+
+def current_metrics() -> Optional[QueryMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def collect() -> Iterator[QueryMetrics]:
+    """Collect metrics for one query; spans recorded inside (including in
+    threads/tasks started with a copy of this context) land in the yielded
+    :class:`QueryMetrics`. On exit the totals feed :data:`ROLLING`."""
+    metrics = QueryMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        metrics.total = time.perf_counter() - metrics.started
+        _current.reset(token)
+        ROLLING.add(metrics)
+
+
+@contextmanager
+def span(stage: str, **args) -> Iterator[None]:
+    """Time the enclosed block as *stage* of the current query and, when a
+    trace is active, record it on the timeline with *args*.
+
+    No-op outside :func:`collect` and :func:`telemetry.trace.tracing`.
+    """
+    metrics = _current.get()
+    tracer = current_tracer()
+    if metrics is None and tracer is None:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        if metrics is not None:
+            metrics.add_stage(stage, (end - start) / 1e9)
+        if tracer is not None:
+            tracer.complete(stage, "stage", start, end, args)
+
+
+def record_llm(response: Any) -> None:
+    """Record the prompt/eval token counts reported in an Ollama chat response."""
+    metrics = _current.get()
+    if metrics is None or response is None:
+        return
+    try:
+        prompt_tokens = response["prompt_eval_count"] or 0
+        eval_tokens = response["eval_count"] or 0
+    except (KeyError, TypeError):
+        prompt_tokens = eval_tokens = 0
+    metrics.add_llm(prompt_tokens, eval_tokens)
+
+
+def record_context(estimated_tokens: int, saved_tokens: int) -> None:
+    """Record a prompt's estimated size before budgeting and the tokens the
+    budget saved (see :class:`agent.context_budget.ContextBudget`)."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_context(estimated_tokens, saved_tokens)
+
+
+def record_cache(name: str, hits: int = 0, misses: int = 0) -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_cache(name, hits, misses)
+
+
+def latency_summary() -> Dict[str, Dict[str, float]]:
+    """Rolling p50/p95/p99 per stage over recent queries."""
+    return ROLLING.summary()
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Tracer:
+    """Records the timeline of one query as Chrome Trace Event JSON.
+
+    Spans become complete (``"X"``) events and :func:`trace_event` calls
+    become instant (``"i"``) events. Each OS thread, and each asyncio task,
+    gets its own track so concurrent tasks show up side by side. The saved
+    file opens in Perfetto (ui.perfetto.dev) or ``chrome://tracing``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self.events: List[Dict[str, Any]] = []
+        self._tracks: Dict[int, str] = {}
+
+    def _track(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is not None:
+            tid, name = id(task) & 0x7FFFFFFF, task.get_name()
+        else:
+            thread = threading.current_thread()
+            tid, name = thread.ident & 0x7FFFFFFF, thread.name
+        if tid not in self._tracks:
+            self._tracks[tid] = name
+            self.events.append(
+                {"ph": "M", "name": "thread_name", "pid": self._pid, "tid": tid, "args": {"name": name}}
+            )
+        return tid
+
+    def now_ns(self) -> int:
+        return time.perf_counter_ns()
+
+    def complete(self, name: str, cat: str, start_ns: int, end_ns: int, args: Optional[dict] = None) -> None:
+        with self._lock:
+            self.events.append(
+                {
+                    "ph": "X",
+                    "name": name,
+                    "cat": cat,
+                    "pid": self._pid,
+                    "tid": self._track(),
+                    "ts": (start_ns - self._origin) / 1000,
+                    "dur": (end_ns - start_ns) / 1000,
+                    "args": args or {},
+                }
+            )
+
+    def instant(self, name: str, cat: str = "event", args: Optional[dict] = None) -> None:
+        with self._lock:
+            self.events.append(
+                {
+                    "ph": "i",
+                    "s": "t",
+                    "name": name,
+                    "cat": cat,
+                    "pid": self._pid,
+                    "tid": self._track(),
+                    "ts": (time.perf_counter_ns() - self._origin) / 1000,
+                    "args": args or {},
+                }
+            )
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, default=str)
+
+
+_tracer: ContextVar[Optional[Tracer]] = ContextVar("vectorroute_tracer", default=None)
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _tracer.get()
+
+
+@contextmanager
+def tracing(path: Optional[str] = None, name: str = "query", **args) -> Iterator[Tracer]:
+    """Trace the enclosed block; the whole block is recorded as one root
+    event *name*, and the trace is written to *path* (if given) on exit."""
+    tracer = Tracer()
+    token = _tracer.set(tracer)
+    start = tracer.now_ns()
+    try:
+        yield tracer
+    finally:
+        tracer.complete(name, "query", start, tracer.now_ns(), args)
+        _tracer.reset(token)
+        if path:
+            tracer.save(path)
+            print(f"Trace written to {path}")
+
+
+def trace_event(name: str, **args) -> None:
+    """Record an instant event with *args* on the active trace (no-op when not tracing)."""
+    tracer = _tracer.get()
+    if tracer is not None:
+        tracer.instant(name, args=args)
@@ -0,0 +1,114 @@
+import os
+import json
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+
+# Paths (base_dir inferred from this file's parent)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CAPABILITIES_FOLDER = os.path.join(BASE_DIR, "VectorRoute-Tools", "capabilities")
+
+
+class CapabilityCatalog:
+    """In-memory catalog of the capability JSON files, parsed once.
+
+    Behaviour summary:
+    - Maps tool name (file stem) -> ``(tool_data, file_path)`` for O(1) lookups.
+    - Remembers ``(mtime_ns, size)`` per file; :meth:`refresh` only re-parses
+      files whose stat changed and drops files that disappeared.
+    - Lookups are plain dict reads and never touch the disk; the folder is
+      only rescanned by :meth:`refresh`, which ``DBConnection.update_db``
+      calls whenever the tools are re-indexed.
+    """
+
+    def __init__(self, capabilities_folder: Optional[str] = None) -> None:
+        self.capabilities_folder = capabilities_folder or DEFAULT_CAPABILITIES_FOLDER
+
+        self._lock = threading.RLock()
+        self._tools: Dict[str, Tuple[dict, str]] = {}
+        self._stats: Dict[str, Tuple[int, int]] = {}  # file_path -> (mtime_ns, size)
+        self._names_by_path: Dict[str, str] = {}
+        self.refresh()
+
+    # ---- Loading ----------------------------------------------------------
+    def _scan(self) -> Dict[str, Tuple[str, Tuple[int, int]]]:
+        """Return ``{file_path: (tool_name, (mtime_ns, size))}`` for every JSON file."""
+        found = {}
+        for root, _, files in os.walk(self.capabilities_folder):
+            for fname in files:
+                if not fname.endswith(".json"):
+                    continue
+                fpath = os.path.join(root, fname)
+                try:
+                    st = os.stat(fpath)
+                except OSError:
+                    continue
+                found[fpath] = (os.path.splitext(fname)[0], (st.st_mtime_ns, st.st_size))
+        return found
+
+    @staticmethod
+    def _parse(fpath: str) -> Optional[dict]:
+        try:
+            with open(fpath, "r") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            print(f"  ⚠ Skipping invalid JSON: {fpath}")
+        except Exception as e:
+            print(f"  ⚠ Error processing {fpath}: {e}")
+        return None
+
+    def refresh(self) -> Set[str]:
+        """Re-stat the folder and re-parse changed files.
+
+        Returns the names of tools that were added, changed or removed.
+        """
+        with self._lock:
+            changed: Set[str] = set()
+            found = self._scan()
+
+            for fpath in list(self._stats):
+                if fpath not in found:
+                    name = self._names_by_path.pop(fpath)
+                    del self._stats[fpath]
+                    if self._tools.get(name, (None, None))[1] == fpath:
+                        del self._tools[name]
+                    changed.add(name)
+
+            for fpath, (name, stat) in found.items():
+                if self._stats.get(fpath) == stat:
+                    continue
+                self._stats[fpath] = stat
+                self._names_by_path[fpath] = name
+                content = self._parse(fpath)
+                if content is None:
+                    self._tools.pop(name, None)
+                else:
+                    self._tools[name] = (content, fpath)
+                changed.add(name)
+
+            return changed
+
+    # ---- Lookups ----------------------------------------------------------
+    def get(self, tool_name: str) -> Optional[dict]:
+        """Return the capability JSON of *tool_name*, or ``None``."""
+        entry = self._tools.get(tool_name)
+        return entry[0] if entry else None
+
+    def get_path(self, tool_name: str) -> Optional[str]:
+        entry = self._tools.get(tool_name)
+        return entry[1] if entry else None
+
+    def __contains__(self, tool_name: str) -> bool:
+        return tool_name in self._tools
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def names(self) -> List[str]:
+        return sorted(self._tools)
+
+    def as_map(self) -> Dict[str, Tuple[dict, str]]:
+        """Snapshot in the ``{tool_name: (tool_data, file_path)}`` shape of
+        ``DBConnection._load_tool_docs_map``."""
+        with self._lock:
+            return dict(self._tools)
@@ -1,17 +1,22 @@
 import os
-import json
-import uuid
+import time
+import asyncio
+import hashlib
 import chromadb
 from collections import Counter
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, List, Tuple
 
-from embedding.embedder import get_embedding
+from embedding.embedder import aget_embeddings, get_embedding, get_embeddings
+from telemetry.metrics import span
+from tools.capability_catalog import CapabilityCatalog
 from tools.file_tracker import FileTracker
+from tools.routing_index import RoutingIndex
 
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CHROMA_DB_PATH = os.path.join(BASE_DIR, "embedding_db")
 COLLECTION_NAME = "tool_embeddings"
+EMBED_BATCH_SIZE = 128
 
 
 class DBConnection:
@@ -21,11 +26,21 @@ class DBConnection:
     """
 
     def __init__(
-        self, db_path: str = CHROMA_DB_PATH, similarity_methods: str = "cosine"
+        self,
+        db_path: str = CHROMA_DB_PATH,
+        similarity_methods: str = "cosine",
+        use_routing_index: bool = False,
+        catalog: Optional[CapabilityCatalog] = None,
     ):
         """
         Establish a persistent ChromaDB client and get/create the
         tool_embeddings collection.
+
+        :param use_routing_index: Route queries against an in-process NumPy
+            :class:`RoutingIndex` (exact cosine top-k) instead of a filtered
+            Chroma HNSW query. Requires ``similarity_methods="cosine"``.
+        :param catalog: Shared :class:`CapabilityCatalog`; one is created for
+            the capabilities folder if omitted.
         """
         self.client = chromadb.PersistentClient(path=db_path)
         self.collection = self.client.get_or_create_collection(
@@ -40,6 +55,11 @@ class DBConnection:
         self.capabilities_folder = os.path.join(
             BASE_DIR, "VectorRoute-Tools", "capabilities"
         )
+        # parsed capability JSONs, shared with the agent and its tasks
+        self.catalog = catalog or CapabilityCatalog(self.capabilities_folder)
+        # optional in-memory routing index, built lazily on first use
+        self.use_routing_index = use_routing_index
+        self.routing_index: Optional[RoutingIndex] = None
 
     # ── Private helpers ──────────────────────────────────────────────────
 
@@ -58,93 +78,177 @@ class DBConnection:
     #         parts.append(f"{param_name}: {param_info.get('description', '')}")
     #     return " | ".join(parts)
 
-    def _add_tool(self, tool_name: str, tool_data: dict) -> None:
+    @staticmethod
+    def _facet_id(tool_name: str, category: str, text: str) -> str:
+        """Deterministic id of a facet: same tool, category and text → same id."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        return f"{tool_name}:{category}:{digest}"
+
+    @staticmethod
+    def _collect_facets(tool_name: str, tool_data: dict) -> List[Tuple[str, str, str]]:
         """
-        Index all semantic facets of a tool into the ChromaDB collection:
+        Return every semantic facet of a tool as ``(id, category, text)``:
 
         - One entry per example user query  (category: ``example_query``)
-        - One entry for the short description (category: ``description``)
-        - One entry for the long description  (category: ``long_description``)
+        - One entry for the short description (category: ``desc``)
+        - One entry for the long description  (category: ``long_desc``)
         - One entry for the domain label      (category: ``domain``)
+
+        Ids are content hashes (see :meth:`_facet_id`), so an unchanged facet
+        keeps its id across edits of the same tool. Empty and duplicate
+        facets are skipped.
         """
         func = tool_data.get("function", {})
         examples: list = func.get("example_user_queries", [])
-        description: str = func.get("description", "")
-        long_description: str = func.get("long_description", "")
-        domain: str = func.get("domain", "")
-
-        def add_embedding(category: str, embedding_input: str):
-            embedding = get_embedding(embedding_input)
-            if not embedding:
-                print(
-                    f"[!] Skipping {category} for tool '{tool_name}' due to missing embedding."
-                )
-                return False
-            print(
-                f"  [+] Adding embedding for tool '{tool_name}' - category: {category}"
-            )
-            # Use a stable id for fixed categories (desc/long_desc/domain),
-            # but generate a unique id per example query so multiple examples
-            # for the same tool are stored instead of clobbering one id.
-            if category == "example_query":
-                id_val = f"{tool_name}_{category}_{str(uuid.uuid4())}"
-            else:
-                id_val = f"{tool_name}_{category}"
-
-            self.collection.add(
-                ids=[id_val],
-                embeddings=[embedding],
-                metadatas=[{"tool": tool_name, "category": category}],
+        facets: Dict[str, Tuple[str, str, str]] = {}
+
+        entries = [("example_query", example) for example in examples]
+        entries += [
+            (category, func.get(key, ""))
+            for category, key in (
+                ("desc", "description"),
+                ("long_desc", "long_description"),
+                ("domain", "domain"),
             )
-            return True
+        ]
+        for category, text in entries:
+            if text:
+                id_val = DBConnection._facet_id(tool_name, category, text)
+                facets.setdefault(id_val, (id_val, category, text))
+        return list(facets.values())
+
+    def _add_tools(self, tools: Dict[str, dict]) -> None:
+        """
+        Index all semantic facets of every tool in *tools* (``{name: data}``).
+        """
+        facets = [
+            (id_val, tool_name, category, text)
+            for tool_name, tool_data in tools.items()
+            for id_val, category, text in self._collect_facets(tool_name, tool_data)
+        ]
+        self._write_facets(facets, len(tools))
+
+    def _write_facets(self, facets: List[Tuple[str, str, str, str]], n_tools: int) -> None:
+        """
+        Embed and store *facets* (``(id, tool, category, text)``).
 
-        # Example queries – each gets a unique id
-        for example in examples:
-            if not add_embedding("example_query", example):
-                continue
+        All texts are embedded in large batches via :func:`get_embeddings`
+        and written with as few bulk ``collection.upsert`` calls as Chroma's
+        max batch size allows.
+        """
+        if not facets:
+            return
+        ids = [f[0] for f in facets]
+        embed_inputs = [f[3] for f in facets]
+        metadatas = [{"tool": f[1], "category": f[2]} for f in facets]
 
-        # Short description
-        add_embedding("desc", description)
+        t0 = time.perf_counter()
+        embeddings = get_embeddings(embed_inputs, batch_size=EMBED_BATCH_SIZE)
+        t_embed = time.perf_counter() - t0
 
-        # Long description
-        add_embedding("long_desc", long_description)
+        rows = []
+        for id_val, emb, meta in zip(ids, embeddings, metadatas):
+            if not emb:
+                print(
+                    f"[!] Skipping {meta['category']} for tool '{meta['tool']}' due to missing embedding."
+                )
+                continue
+            rows.append((id_val, emb, meta))
+
+        t0 = time.perf_counter()
+        batch_size = self._max_batch_size()
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start : start + batch_size]
+            self.collection.upsert(
+                ids=[r[0] for r in chunk],
+                embeddings=[r[1] for r in chunk],
+                metadatas=[r[2] for r in chunk],
+            )
+        t_write = time.perf_counter() - t0
 
-        # Domain
-        add_embedding("domain", domain)
+        print(
+            f"  [+] Indexed {len(rows)} facets for {n_tools} tools  ➜  "
+            f"embed {t_embed:.2f}s ({len(embed_inputs) / max(t_embed, 1e-9):.1f} texts/s), "
+            f"write {t_write:.2f}s"
+        )
 
-        print(f"  [+] Added tool: {tool_name} ({len(examples)} examples)")
+    def _add_tool(self, tool_name: str, tool_data: dict) -> None:
+        """Index all semantic facets of a single tool (see :meth:`_add_tools`)."""
+        self._add_tools({tool_name: tool_data})
+        print(f"  [+] Added tool: {tool_name}")
 
     def _update_tool(self, tool_name: str, tool_data: dict) -> None:
         """
-        Update all ChromaDB entries for *tool_name*:
+        Update the ChromaDB entries for *tool_name*, re-embedding only the
+        facets whose text changed (see :meth:`_sync_tools`).
+        """
+        added, removed = self._sync_tools({tool_name: tool_data})
+        print(f"  [~] Updated tool: {tool_name} (+{added} / -{removed} facets)")
 
-        1. Delete every existing entry that belongs to this tool
-           (example queries via metadata filter + the fixed-id entries).
-        2. Re-index via :meth:`_add_tool` so all categories are fresh.
+    def _sync_tools(self, tools: Dict[str, dict]) -> Tuple[int, int]:
         """
-        self._delete_tool(tool_name)
-        self._add_tool(tool_name, tool_data)
-        print(f"  [~] Updated tool: {tool_name}")
+        Bring the stored facets of every tool in *tools* in line with its
+        capability JSON by diffing facet ids: facets that are new are
+        embedded and upserted, facets that disappeared are deleted, and
+        unchanged facets are left alone. Returns ``(added, removed)``.
+        """
+        if not tools:
+            return 0, 0
+        existing = self.collection.get(
+            where={"tool": {"$in": list(tools)}},
+            include=[],  # only ids are needed
+        )
+        existing_ids = set(existing["ids"]) if existing else set()
+
+        desired = [
+            (id_val, tool_name, category, text)
+            for tool_name, tool_data in tools.items()
+            for id_val, category, text in self._collect_facets(tool_name, tool_data)
+        ]
+        desired_ids = {f[0] for f in desired}
+
+        stale = list(existing_ids - desired_ids)
+        batch_size = self._max_batch_size()
+        for start in range(0, len(stale), batch_size):
+            self.collection.delete(ids=stale[start : start + batch_size])
+
+        new = [f for f in desired if f[0] not in existing_ids]
+        self._write_facets(new, len({f[1] for f in new}))
+        return len(new), len(stale)
 
     def _delete_tool(self, tool_name: str) -> None:
         """
-        Remove every ChromaDB entry that belongs to *tool_name*:
+        Remove every ChromaDB entry that belongs to *tool_name*: entries
+        are looked up via ``where={"tool": tool_name}`` and deleted in bulk.
+        """
+        removed = self._delete_tools([tool_name])
+        print(f"  [-] Deleted tool: {tool_name} ({removed} entries)")
 
-        - Fixed-id entries: ``{tool_name}_desc``, ``{tool_name}_long_desc``,
-          ``{tool_name}_domain``.
-        - Variable-id example entries: queried via ``where={"tool": tool_name}``
-          and deleted in bulk.
+    def _delete_tools(self, tool_names: List[str]) -> int:
         """
-        # Delete all entries tagged with this tool (covers example_query entries
-        # whose ids contain a uuid and cannot be predicted)
+        Remove the entries of every tool in *tool_names* with a single
+        metadata lookup and a single bulk delete. Returns the number of
+        entries removed.
+        """
+        if not tool_names:
+            return 0
+        # Delete all entries tagged with these tools (also covers entries
+        # written with older id schemes)
         existing = self.collection.get(
-            where={"tool": tool_name},
+            where={"tool": {"$in": list(tool_names)}},
             include=[],  # only ids are needed
         )
         if existing and existing["ids"]:
             self.collection.delete(ids=existing["ids"])
+            return len(existing["ids"])
+        return 0
 
-        print(f"  [-] Deleted tool: {tool_name} ({len(existing['ids'])} entries)")
+    def _max_batch_size(self) -> int:
+        """Largest number of records Chroma accepts in one add/upsert call."""
+        try:
+            return int(self.client.get_max_batch_size())
+        except Exception:
+            return 5000
 
     # ── Public API ───────────────────────────────────────────────────────
 
@@ -153,10 +257,11 @@ class DBConnection:
         Synchronise ChromaDB with the capability JSON files on disk.
 
         1. Call *get_file_changes()* to find added / modified / deleted tools.
-        2. For each added tool   → _add_tool()   + update hash in SQLite.
-        3. For each modified tool → _update_tool() + update hash in SQLite.
-        4. For each deleted tool  → _delete_tool() (hash row stays or can be
-           pruned separately).
+        2. Deleted tools → one bulk _delete_tools() call.
+        3. Added and modified tools → one _sync_tools() call that diffs
+           their facets against the stored ones, so only new or edited
+           facets are embedded (in a few large requests) and only facets
+           that disappeared are deleted.
         """
         # Accept externally computed changes (e.g. from a FileTracker)
 
@@ -168,25 +273,33 @@ class DBConnection:
             print("No capability changes detected - ChromaDB is up to date.")
             return
 
-        # Build a {tool_name: tool_data} lookup from the capability files
-        tool_docs = self._load_tool_docs_map()
-
-        for tool_name in added:
-            if tool_name in tool_docs:
-                tool_data, _ = tool_docs[tool_name]
-                self._add_tool(tool_name, tool_data)
+        start = time.perf_counter()
 
-        for tool_name in modified:
-            if tool_name in tool_docs:
-                tool_data, _ = tool_docs[tool_name]
-                self._update_tool(tool_name, tool_data)
+        # Build a {tool_name: tool_data} lookup from the capability files,
+        # re-parsing only files that changed since the catalog last looked
+        self.catalog.refresh()
+        tool_docs = self.catalog.as_map()
 
+        removed = self._delete_tools(list(deleted))
         for tool_name in deleted:
-            self._delete_tool(tool_name)
+            print(f"  [-] Deleted tool: {tool_name}")
+
+        to_index = {
+            tool_name: tool_docs[tool_name][0]
+            for tool_name in list(added) + list(modified)
+            if tool_name in tool_docs
+        }
+        embedded, stale = self._sync_tools(to_index)
+        removed += stale
+
+        if self.use_routing_index:
+            self._build_routing_index()
 
         print(
             f"Sync complete  ➜  added={len(added)}  "
-            f"modified={len(modified)}  deleted={len(deleted)}"
+            f"modified={len(modified)}  deleted={len(deleted)}  "
+            f"(embedded {embedded} facets, removed {removed} entries, "
+            f"{time.perf_counter() - start:.2f}s)"
         )
 
     def get_top_k_counter_eg_query(
@@ -250,29 +363,12 @@ class DBConnection:
 
         Returns the matched tool name, or ``"No confident match"``.
         """
-        user_embedding = get_embedding(user_query)
-
-        # ── Step 1: search only example queries ──────────────────────
-        results = self.collection.query(
-            query_embeddings=[user_embedding],
-            n_results=top_k,
-            where={"category": "example_query"},
-        )
-
-        tools_found = []
-        for i, m in enumerate(results["metadatas"][0]):
-            tool = m["tool"]
-            dist = results["distances"][0][i]
-            # print(f"\n\nDEBUG: Ex-query match - tool: {tool}, dist: {dist}, sim: {1-dist}")
-            if 1 - dist > threshold:
-                tools_found.append(tool)
-        count = Counter(tools_found).most_common()  # tool_name -> count of example-query matches
-        print(f"Tool counts from example-query search: {dict(count)}")
-
-        for tool_name, c in dict(count).items():
-            if c >= min_example_hits:
-                return tool_name
-        return "No confident match"
+        return self.route_queries(
+            [user_query],
+            top_k=top_k,
+            threshold=threshold,
+            min_example_hits=min_example_hits,
+        )[0]
 
         # tools_found = [m["tool"] for m in results["metadatas"][0]]
         # # print(f"Tools found in example-query search: {list(tools_found)}")
@@ -313,37 +409,126 @@ class DBConnection:
 
         # return "No confident match"
 
+    def route_queries(
+        self,
+        user_queries: List[str],
+        top_k: int = 14,
+        threshold: float = 0.5,
+        min_example_hits: int = 3,
+    ) -> List[str]:
+        """
+        Batched :meth:`route_query`: embed every query in one
+        :func:`get_embeddings` call and search the example queries for all
+        of them at once. Returns one routing decision per query, in order.
+        """
+        if not user_queries:
+            return []
+        embeddings = get_embeddings(list(user_queries))
+        return self.route_embeddings(
+            embeddings,
+            top_k=top_k,
+            threshold=threshold,
+            min_example_hits=min_example_hits,
+        )
+
+    async def aroute_queries(
+        self,
+        user_queries: List[str],
+        top_k: int = 14,
+        threshold: float = 0.5,
+        min_example_hits: int = 3,
+        client=None,
+    ) -> List[str]:
+        """
+        Async :meth:`route_queries`: the queries are embedded with an
+        ``ollama.AsyncClient`` and the (blocking) index search runs in a
+        worker thread.
+        """
+        if not user_queries:
+            return []
+        embeddings = await aget_embeddings(list(user_queries), client=client)
+        return await asyncio.to_thread(
+            self.route_embeddings,
+            embeddings,
+            top_k=top_k,
+            threshold=threshold,
+            min_example_hits=min_example_hits,
+        )
+
+    def route_embeddings(
+        self,
+        query_embeddings: List[list],
+        top_k: int = 14,
+        threshold: float = 0.5,
+        min_example_hits: int = 3,
+    ) -> List[str]:
+        """
+        Route already-embedded queries. All vectors go to the routing index
+        (or to Chroma as multiple ``query_embeddings``) in a single search.
+        """
+        with span("route", queries=len(query_embeddings), index="routing_index" if self.use_routing_index else "chroma"):
+            # ── Step 1: search only example queries ──────────────────────
+            if self.use_routing_index:
+                all_matches = self._get_routing_index().search(query_embeddings, top_k)
+            else:
+                results = self.collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=top_k,
+                    where={"category": "example_query"},
+                )
+                all_matches = [
+                    [(m["tool"], 1 - dist) for m, dist in zip(metas, dists)]
+                    for metas, dists in zip(results["metadatas"], results["distances"])
+                ]
+
+            # ── Step 2: find tool with enough example matches ────────────
+            return [
+                self._vote(matches, threshold, min_example_hits) for matches in all_matches
+            ]
+
     # ── Helpers ───────────────────────────────────────────────────────────
     @staticmethod
-    def _load_tool_docs_map() -> dict:
+    def _vote(
+        matches: List[Tuple[str, float]], threshold: float, min_example_hits: int
+    ) -> str:
         """
-        Walk the capabilities folder and return a dict:
-        { tool_name: (filtered_json, file_path) }
-        excluding 'example_user_queries'.
+        Count the example-query *matches* (``(tool, similarity)`` pairs,
+        best first) whose similarity exceeds *threshold* and return the
+        first tool with at least *min_example_hits* votes, or
+        ``"No confident match"``.
         """
-        tool_map: dict = {}
-        # Ensure BASE_DIR is defined or accessible in your scope
-        caps_folder = os.path.join(BASE_DIR, "VectorRoute-Tools", "capabilities")
-
-        for root, _, files in os.walk(caps_folder):
-            for fname in files:
-                if not fname.endswith(".json"):
-                    continue
-                tool_name = os.path.splitext(fname)[0]
-                fpath = os.path.join(root, fname)
-                try:
-                    with open(fpath, "r") as f:
+        tools_found = []
+        for tool, sim in matches:
+            # print(f"\n\nDEBUG: Ex-query match - tool: {tool}, dist: {1-sim}, sim: {sim}")
+            if sim > threshold:
+                tools_found.append(tool)
+        count = Counter(tools_found).most_common()  # tool_name -> count of example-query matches
+        print(f"Tool counts from example-query search: {dict(count)}")
 
-                        content = json.load(f)
+        for tool_name, c in dict(count).items():
+            if c >= min_example_hits:
+                return tool_name
+        return "No confident match"
 
-                        # # Remove 'example_user_queries' from the loaded content
-                        # content["function"].pop("example_user_queries", None)
+    def _build_routing_index(self) -> RoutingIndex:
+        """(Re)build the in-memory routing index from the collection."""
+        index = self.routing_index or RoutingIndex()
+        index.build(self.collection)
+        self.routing_index = index
+        return index
 
-                        tool_map[tool_name] = (content, fpath)
+    def _get_routing_index(self) -> RoutingIndex:
+        if self.routing_index is None:
+            return self._build_routing_index()
+        return self.routing_index
 
-                except json.JSONDecodeError:
-                    print(f"  ⚠ Skipping invalid JSON: {fpath}")
-                except Exception as e:
-                    print(f"  ⚠ Error processing {fpath}: {e}")
+    @staticmethod
+    def _load_tool_docs_map() -> dict:
+        """
+        Walk the capabilities folder and return a dict:
+        { tool_name: (tool_json, file_path) }
 
-        return tool_map
+        Parses every file on each call; prefer the shared
+        :attr:`DBConnection.catalog`, which parses the folder once.
+        """
+        return CapabilityCatalog().as_map()
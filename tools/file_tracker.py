@@ -4,15 +4,22 @@ import hashlib
 import importlib.util
 import sys
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Set, Tuple, Callable
 import time
 
+from tools.tool_registry import ToolRegistry, build_tool_registry
+
 
 # Paths (base_dir inferred from this file's parent)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DEFAULT_DB_PATH = os.path.join(BASE_DIR, "embedding_db", "file_hashes.db")
 
+# Below this many files to hash, a thread pool costs more than it saves
+PARALLEL_HASH_MIN_FILES = 8
+HASH_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
 
 class FileTracker:
     """Tracks capability JSONs and function Python files.
@@ -59,6 +66,25 @@ class FileTracker:
             )
             """
         )
+        # Stat columns added later: migrate existing databases in place
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tools)")}
+        for column in ("mtime_ns", "size"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE tools ADD COLUMN {column} INTEGER")
+        # Capability JSONs are tracked separately: they are what gets embedded
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS capabilities (
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE,
+                file_path TEXT,
+                hash TEXT,
+                last_loaded TIMESTAMP,
+                mtime_ns INTEGER,
+                size INTEGER
+            )
+            """
+        )
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS change_log (
@@ -77,11 +103,17 @@ class FileTracker:
 
     @staticmethod
     def _compute_file_hash(file_path: str) -> str:
-        hasher = hashlib.sha256()
+        # file_digest reads in large chunks and releases the GIL while hashing
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hasher.update(chunk)
-        return hasher.hexdigest()
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+    @classmethod
+    def _hash_files(cls, file_paths: List[str]) -> List[str]:
+        """Hash *file_paths*, on a thread pool when there are enough of them."""
+        if len(file_paths) < PARALLEL_HASH_MIN_FILES:
+            return [cls._compute_file_hash(path) for path in file_paths]
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hash") as pool:
+            return list(pool.map(cls._compute_file_hash, file_paths))
 
     def log_change(
         self,
@@ -90,13 +122,15 @@ class FileTracker:
         old_hash: Optional[str],
         new_hash: Optional[str],
         file_path: Optional[str],
+        commit: bool = True,
     ) -> None:
         """Log changes to the change_log table."""
         self.conn.execute(
             "INSERT INTO change_log (file_key, change_type, old_hash, new_hash, file_path, changed_at) VALUES (?, ?, ?, ?, ?, ?)",
             (file_key, change_type, old_hash, new_hash, file_path, datetime.now(timezone.utc).isoformat()),
         )
-        self.conn.commit()
+        if commit:
+            self.conn.commit()
 
     # ---- Tool Registry ----------------------------------------------------
     @staticmethod
@@ -139,122 +173,125 @@ class FileTracker:
     #     return registry
 
     @staticmethod
-    def get_tool_registry() -> Dict[str, callable]:
-        """Dynamically import functions from the functions folder.
+    def get_tool_registry(
+        capabilities_folder: Optional[str] = None,
+        functions_folder: Optional[str] = None,
+    ) -> ToolRegistry:
+        """Build the runtime tool registry.
 
-        Returns a dict mapping tool_name -> callable. Only includes tools
+        Returns a dict mapping tool_name -> lazy callable. Only includes tools
         which have both a `.json` capability and a `.py` function file on disk.
+        Modules are imported on first call (see :mod:`tools.tool_registry`),
+        so this only lists the folders. Folders default to the
+        ``VectorRoute-Tools`` tree next to this package.
         """
-        registry: Dict[str, callable] = {}
-
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-        capabilities_folder = os.path.join(base_dir, "VectorRoute-Tools", "capabilities")
-        print(f"DEBUG: Capabilities folder set to: {capabilities_folder}")
-        functions_folder = os.path.join(base_dir, "VectorRoute-Tools", "functions")
-        print(f"DEBUG: Functions folder set to: {functions_folder}")
-
-        # Build sets for matching
-        json_files = {}
-        for root, _, files in os.walk(capabilities_folder):
-            for fn in files:
-                if fn.endswith(".json"):
-                    name = os.path.splitext(fn)[0]
-                    json_files[name] = os.path.join(root, fn)
-
-        py_paths = []
-        for root, _, files in os.walk(functions_folder):
-            for fn in files:
-                if not fn.endswith(".py"):
-                    continue
-                if fn.startswith("_"):
-                    continue
-                py_paths.append(os.path.join(root, fn))
-
-        for py_path in py_paths:
-            tool_name = os.path.splitext(os.path.basename(py_path))[0]
-            if tool_name not in json_files:
-                continue
-
-            # Import module from file path
-            module_name = os.path.relpath(py_path, functions_folder).replace(os.sep, ".")
-            spec = importlib.util.spec_from_file_location(module_name, py_path)
-            if spec is None or spec.loader is None:
-                continue
-            module = importlib.util.module_from_spec(spec)
-            try:
-                spec.loader.exec_module(module)
-            except Exception as e:
-                continue
-
-            # Prefer attribute with same name
-            attr = getattr(module, tool_name, None)
-            if callable(attr):
-                registry[tool_name] = attr
-                continue
-
-            # Fallback: first public callable in module
-            for name in dir(module):
-                if name.startswith("_"):
-                    continue
-                candidate = getattr(module, name)
-                if callable(candidate):
-                    registry[tool_name] = candidate
-                    print(f"DEBUG: Registered tool {tool_name} with fallback callable {candidate}")
-                    break
-        print(f"Built tool registry with {len(registry)} tools: {list(registry.keys())}")
-        return registry
-
-    def get_file_changes(self) -> defaultdict:
-        """Detect file changes and update the SQLite database."""
-
-        # stored = {
-        #     row["name"]: row for row in self.conn.execute("SELECT name, file_path, hash FROM tools").fetchall()
-        # }
-
-        stored = self.conn.execute("SELECT name, file_path, hash FROM tools").fetchall()
-        stored = {row[0]: {"file_path": row[1], "hash": row[2]} for row in stored}
+        return build_tool_registry(capabilities_folder, functions_folder)
+
+    def _scan_changes(
+        self, table: str, folder: str, extension: str, key_prefix: str, extra: Optional[dict] = None
+    ) -> Tuple[Set[str], Set[str], Set[str]]:
+        """Diff the *extension* files under *folder* against *table* and
+        update it; returns ``(added, modified, deleted)`` tool names.
+
+        Files whose path, ``mtime_ns`` and size match the stored row are
+        taken as unchanged without being read; only the rest are hashed
+        (in parallel), and a changed hash is what marks a tool modified.
+        *extra* holds constant column values for inserted rows.
+        """
+        stored = self.conn.execute(f"SELECT name, file_path, hash, mtime_ns, size FROM {table}").fetchall()
+        stored = {
+            row[0]: {"file_path": row[1], "hash": row[2], "stat": (row[3], row[4])}
+            for row in stored
+        }
 
         # Discover files on disk
-        py_files = {}
-        for root, _, files in os.walk(self.functions_folder):
+        disk_files = {}
+        disk_stats = {}
+        for root, _, files in os.walk(folder):
             for fn in files:
-                if not fn.endswith(".py") or fn.startswith("_"):
+                if not fn.endswith(extension):
+                    continue
+                if extension == ".py" and fn.startswith("_"):
                     continue
                 name = os.path.splitext(fn)[0]
-                py_files[name] = os.path.join(root, fn)
+                file_path = os.path.join(root, fn)
+                st = os.stat(file_path)
+                disk_files[name] = file_path
+                disk_stats[name] = (st.st_mtime_ns, st.st_size)
+
+        # Stat precheck: only files that are new or whose stat changed get hashed
+        to_hash = [
+            name for name, file_path in disk_files.items()
+            if name not in stored
+            or stored[name]["file_path"] != file_path
+            or stored[name]["stat"] != disk_stats[name]
+        ]
+        hashes = dict(zip(to_hash, self._hash_files([disk_files[name] for name in to_hash])))
 
         added, modified, deleted = set(), set(), set()
+        now = datetime.now(timezone.utc).isoformat()
+        extra = extra or {}
+        insert_columns = ["name", "file_path", "hash", "last_loaded", "mtime_ns", "size", *extra]
+        insert_sql = (
+            f"INSERT INTO {table} ({', '.join(insert_columns)}) "
+            f"VALUES ({', '.join('?' for _ in insert_columns)})"
+        )
 
-        for name, file_path in py_files.items():
-            cur_hash = self._compute_file_hash(file_path)
+        for name, cur_hash in hashes.items():
+            file_path = disk_files[name]
+            mtime_ns, size = disk_stats[name]
             if name not in stored:
                 added.add(name)
-                self.conn.execute(
-                    "INSERT INTO tools (name, file_path, hash, module, function_name, last_loaded) VALUES (?, ?, ?, ?, ?, ?)",
-                    (name, file_path, cur_hash, None, "main", datetime.now(timezone.utc).isoformat()),
-                )
-                self.log_change(f"py:{name}", "added", None, cur_hash, file_path)
+                self.conn.execute(insert_sql, (name, file_path, cur_hash, now, mtime_ns, size, *extra.values()))
+                self.log_change(f"{key_prefix}:{name}", "added", None, cur_hash, file_path, commit=False)
             elif stored[name]["hash"] != cur_hash:
                 modified.add(name)
                 self.conn.execute(
-                    "UPDATE tools SET hash = ?, last_loaded = ? WHERE name = ?",
-                    (cur_hash, datetime.now(timezone.utc).isoformat(), name),
+                    f"UPDATE {table} SET file_path = ?, hash = ?, last_loaded = ?, mtime_ns = ?, size = ? WHERE name = ?",
+                    (file_path, cur_hash, now, mtime_ns, size, name),
+                )
+                self.log_change(f"{key_prefix}:{name}", "modified", stored[name]["hash"], cur_hash, file_path, commit=False)
+            else:
+                # Touched (or moved) but identical: refresh the stat so it is skipped next time
+                self.conn.execute(
+                    f"UPDATE {table} SET file_path = ?, mtime_ns = ?, size = ? WHERE name = ?",
+                    (file_path, mtime_ns, size, name),
                 )
-                self.log_change(f"py:{name}", "modified", stored[name]["hash"], cur_hash, file_path)
 
         for name in stored:
-            if name not in py_files:
+            if name not in disk_files:
                 deleted.add(name)
-                self.conn.execute("DELETE FROM tools WHERE name = ?", (name,))
-                self.log_change(f"py:{name}", "deleted", stored[name]["hash"], None, stored[name]["file_path"])
+                self.conn.execute(f"DELETE FROM {table} WHERE name = ?", (name,))
+                self.log_change(f"{key_prefix}:{name}", "deleted", stored[name]["hash"], None, stored[name]["file_path"], commit=False)
 
-        # # Update hashes for all files before returning the result
-        # for name, file_path in py_files.items():
-        #     self.update_hash_of_file(name, file_path, "py")
+        return added, modified, deleted
+
+    def get_file_changes(self) -> defaultdict:
+        """Detect file changes and update the SQLite database.
 
+        Both the function files (``py:``) and the capability JSONs
+        (``json:``) are tracked, but only tools with both files on disk are
+        reported, as in the tool registry. A tool is added when its second
+        file appears, deleted when either file goes, and modified when
+        either file of a tool that stays complete changed.
+        """
+        py_added, py_modified, py_deleted = self._scan_changes(
+            "tools", self.functions_folder, ".py", "py", extra={"function_name": "main"}
+        )
+        json_added, json_modified, json_deleted = self._scan_changes(
+            "capabilities", self.capabilities_folder, ".json", "json"
+        )
         self.conn.commit()
 
+        py_now = {row[0] for row in self.conn.execute("SELECT name FROM tools")}
+        json_now = {row[0] for row in self.conn.execute("SELECT name FROM capabilities")}
+        complete_now = py_now & json_now
+        complete_before = ((py_now - py_added) | py_deleted) & ((json_now - json_added) | json_deleted)
+
+        added = complete_now - complete_before
+        deleted = complete_before - complete_now
+        modified = (py_modified | json_modified) & complete_now & complete_before
+
         result = defaultdict(list)
         result["added"] = sorted(list(added))
         result["modified"] = sorted(list(modified))
@@ -0,0 +1,140 @@
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+from telemetry.metrics import record_cache
+
+DEFAULT_RESULT_CACHE_SIZE = 1024
+
+_MISSING = object()
+
+
+def canonical_arguments(args: tuple, kwargs: Dict[str, Any]) -> str:
+    """Order-independent string form of a call's (validated) arguments."""
+    return json.dumps([list(args), kwargs], sort_keys=True, separators=(",", ":"), default=repr)
+
+
+class ToolResultCache:
+    """Bounded LRU of tool results with a per-entry TTL.
+
+    Only tools whose capability JSON opts in (``"cacheable": true`` and
+    ``"ttl_seconds"`` in the ``function`` object) are cached. Entries are
+    keyed by ``(tool name, tool file hash, canonical arguments)``, so an
+    edited tool never serves results of its previous version;
+    :meth:`invalidate` also drops them eagerly when ``FileTracker`` reports
+    the tool modified. Exceptions are never cached.
+
+    Results are deep-copied on the way in and on the way out, so a caller
+    mutating a returned dict or list cannot change what later hits see.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_RESULT_CACHE_SIZE) -> None:
+        """
+        :param max_entries: Results kept before the least recently used one
+            is evicted (0 disables the cache).
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[str, str, str]) -> Any:
+        """Return the cached result for *key*, or ``_MISSING``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is None:
+            record_cache("tool_result", misses=1)
+            return _MISSING
+        record_cache("tool_result", hits=1)
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: Tuple[str, str, str], value: Any, ttl_seconds: float) -> None:
+        if self.max_entries <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def call(self, tool_name: str, file_hash: str, ttl_seconds: float, func, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        """Return ``func(*args, **kwargs)``, served from the cache when possible."""
+        key = (tool_name, file_hash, canonical_arguments(args, kwargs))
+        result = self.get(key)
+        if result is _MISSING:
+            result = func(*args, **kwargs)
+            self.put(key, result, ttl_seconds)
+        return result
+
+    def call_future(self, tool_name: str, file_hash: str, ttl_seconds: float, start, kwargs: Dict[str, Any]) -> Future:
+        """:meth:`call` for a *start* returning a future; its result is
+        cached when it completes successfully."""
+        key = (tool_name, file_hash, canonical_arguments((), kwargs))
+        result = self.get(key)
+        if result is not _MISSING:
+            future = Future()
+            future.set_result(result)
+            return future
+
+        def remember(future: Future) -> None:
+            if not future.cancelled() and future.exception() is None:
+                self.put(key, future.result(), ttl_seconds)
+
+        future = start(**kwargs)
+        future.add_done_callback(remember)
+        return future
+
+    def invalidate(self, tool_name: str) -> int:
+        """Drop every cached result of *tool_name*; returns how many."""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == tool_name]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
+
+
+def cache_policy(capability: Optional[dict]) -> Optional[float]:
+    """TTL in seconds if the capability JSON marks the tool cacheable, else
+    ``None``. Cacheable tools without ``ttl_seconds`` never expire."""
+    function = (capability or {}).get("function") or {}
+    if not function.get("cacheable"):
+        return None
+    try:
+        ttl = float(function.get("ttl_seconds", float("inf")))
+    except (TypeError, ValueError):
+        return None
+    return ttl if ttl > 0 else None
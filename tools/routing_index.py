@@ -0,0 +1,99 @@
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+
+class RoutingIndex:
+    """Exact in-process nearest-neighbour index over example-query embeddings.
+
+    All ``example_query`` vectors of the Chroma collection are copied into a
+    single C-contiguous, L2-normalised float32 matrix, so a query is one
+    matrix-vector product followed by an ``argpartition`` top-k. For a few
+    thousand examples this is faster than a filtered HNSW query and fully
+    deterministic. Similarities are cosine similarities, i.e. ``1 - distance``
+    of a Chroma collection using ``hnsw:space = cosine``.
+    """
+
+    def __init__(self) -> None:
+        # (matrix, labels, tool_names) is swapped as a whole on rebuild so
+        # concurrent readers never observe a half-built index.
+        self._data: Tuple[np.ndarray, np.ndarray, List[str]] = (
+            np.zeros((0, 0), dtype=np.float32),
+            np.zeros(0, dtype=np.int32),
+            [],
+        )
+
+    def __len__(self) -> int:
+        return self._data[0].shape[0]
+
+    @staticmethod
+    def _normalise(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+    def build(self, collection) -> None:
+        """(Re)load every example-query embedding and its tool label from *collection*."""
+        start = time.perf_counter()
+        records = collection.get(
+            where={"category": "example_query"},
+            include=["embeddings", "metadatas"],
+        )
+        embeddings = records.get("embeddings")
+        metadatas = records.get("metadatas") or []
+
+        if embeddings is None or len(embeddings) == 0:
+            self._data = (np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int32), [])
+            print("Routing index built: 0 example vectors")
+            return
+
+        tool_names: List[str] = []
+        tool_ids = {}
+        labels = np.empty(len(metadatas), dtype=np.int32)
+        for i, meta in enumerate(metadatas):
+            tool = meta["tool"]
+            if tool not in tool_ids:
+                tool_ids[tool] = len(tool_names)
+                tool_names.append(tool)
+            labels[i] = tool_ids[tool]
+
+        matrix = self._normalise(np.asarray(embeddings, dtype=np.float32))
+        self._data = (matrix, labels, tool_names)
+        print(
+            f"Routing index built: {matrix.shape[0]} example vectors, "
+            f"{len(tool_names)} tools, dim={matrix.shape[1]} "
+            f"({time.perf_counter() - start:.3f}s)"
+        )
+
+    def search(
+        self, query_embeddings, top_k: int
+    ) -> List[List[Tuple[str, float]]]:
+        """Return the *top_k* ``(tool, similarity)`` pairs for each query.
+
+        *query_embeddings* is a sequence of vectors (one per query); each
+        result list is sorted by decreasing similarity.
+        """
+        matrix, labels, tool_names = self._data
+        n = matrix.shape[0]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        if n == 0 or top_k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        sims = self._normalise(queries) @ matrix.T  # (m, n)
+        k = min(top_k, n)
+        if k < n:
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(n), (sims.shape[0], n))
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_sims = np.take_along_axis(top_sims, order, axis=1)
+
+        return [
+            [(tool_names[labels[j]], float(s)) for j, s in zip(row_idx, row_sims)]
+            for row_idx, row_sims in zip(top, top_sims)
+        ]
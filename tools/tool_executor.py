@@ -0,0 +1,406 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
+
+from tools.tool_registry import LazyTool
+
+EXECUTION_MODES = ("thread", "process", "inline")
+DEFAULT_TOOL_TIMEOUT = 30.0
+THREAD_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+PROCESS_WORKERS = os.cpu_count() or 1
+
+
+class ToolTimeoutError(TimeoutError):
+    """A tool did not finish (or could not start) within its timeout."""
+
+    def __init__(self, tool: str, timeout: float, phase: str = "running") -> None:
+        super().__init__(f"Tool '{tool}' timed out after {timeout:g}s ({phase})")
+        self.tool = tool
+        self.timeout = timeout
+        self.phase = phase
+
+    def as_result(self) -> dict:
+        """Structured tool result recorded in the task's message history."""
+        return {
+            "error": "TOOL_TIMEOUT",
+            "tool": self.tool,
+            "timeout_seconds": self.timeout,
+            "phase": self.phase,
+            "message": str(self),
+        }
+
+
+class ToolPolicy:
+    """Execution hints of one tool, read from its capability JSON ``function`` object:
+
+    - ``"execution"``: ``thread`` (default, I/O-bound tools), ``process``
+      (CPU-bound tools) or ``inline`` (no pool: run in the caller's thread,
+      without a timeout, by the blocking API and in a worker thread by the
+      async one).
+    - ``"timeout_seconds"``: wall-clock limit per call, including the wait
+      for a free concurrency slot.
+    - ``"max_concurrency"``: calls of this tool running at once, process-wide.
+    """
+
+    def __init__(self, mode: str = "thread", timeout: float = DEFAULT_TOOL_TIMEOUT, max_concurrency: Optional[int] = None) -> None:
+        self.mode = mode if mode in EXECUTION_MODES else "thread"
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+
+    @classmethod
+    def from_capability(cls, capability: Optional[dict], default_timeout: float = DEFAULT_TOOL_TIMEOUT) -> "ToolPolicy":
+        function = (capability or {}).get("function") or {}
+        try:
+            timeout = float(function.get("timeout_seconds", default_timeout))
+        except (TypeError, ValueError):
+            timeout = default_timeout
+        try:
+            max_concurrency = int(function["max_concurrency"]) if function.get("max_concurrency") else None
+        except (TypeError, ValueError):
+            max_concurrency = None
+        return cls(function.get("execution", "thread"), timeout, max_concurrency)
+
+
+# ── Process workers ─────────────────────────────────────────────────────
+# Each worker process imports a tool once and keeps it for later calls.
+
+_process_tools: Dict[str, LazyTool] = {}
+
+
+def _call_in_process(name: str, file_path: str, module_name: str, kwargs: Dict[str, Any]) -> Any:
+    tool = _process_tools.get(file_path)
+    if tool is None:
+        tool = _process_tools[file_path] = LazyTool(name, file_path, module_name)
+    return tool.resolve()(**kwargs)
+
+
+class _Slots:
+    """Counting semaphore whose waiters are queued callbacks, not blocked threads."""
+
+    def __init__(self, limit: int) -> None:
+        self._lock = threading.Lock()
+        self._free = limit
+        self._waiting: Deque[Tuple["ToolCall", Callable[[], None]]] = deque()
+
+    def acquire(self, call: "ToolCall", start: Callable[[], None]) -> None:
+        """Run *start* now if a slot is free, else once one is released."""
+        with self._lock:
+            if self._free <= 0:
+                self._waiting.append((call, start))
+                return
+            self._free -= 1
+        start()
+
+    def release(self) -> None:
+        with self._lock:
+            # calls that timed out while waiting are skipped
+            while self._waiting:
+                call, start = self._waiting.popleft()
+                if not call.future.cancelled():
+                    break
+            else:
+                self._free += 1
+                return
+        start()
+
+
+class ToolCall:
+    """A tool call submitted to a :class:`ToolExecutor`.
+
+    :attr:`future` completes with the tool's result (or exception); waiting
+    through :meth:`result` or :meth:`aresult` applies the tool's timeout,
+    counted from submission. Inline calls only start once waited for.
+    """
+
+    def __init__(self, executor: "ToolExecutor", name: str, timeout: float) -> None:
+        self.executor = executor
+        self.name = name
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.future: Future = Future()
+        self.started = False
+        self._worker: Optional[Future] = None
+        self._pool: Optional[Executor] = None
+        self._inline: Optional[Callable[[], Any]] = None
+        self._inline_task: Optional[asyncio.Task] = None
+
+    def _remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def _run_inline(self) -> None:
+        # running from here on, so a timeout can no longer cancel the future
+        if not self.future.set_running_or_notify_cancel():
+            return
+        self.started = True
+        try:
+            self.future.set_result(self._inline())
+        except Exception as e:
+            self.future.set_exception(e)
+
+    def _timed_out(self) -> ToolTimeoutError:
+        # still queued for a slot (or a worker) means it never runs; a
+        # running thread is left to finish in the background, a running
+        # process worker is killed (see ToolExecutor._retire)
+        self.future.cancel()
+        if self._worker is not None and not self._worker.cancel():
+            if isinstance(self._pool, ProcessPoolExecutor):
+                self.executor._retire(self._pool, self._worker)
+        self.executor.timeouts += 1
+        phase = "running" if self.started else "waiting for a free slot"
+        return ToolTimeoutError(self.name, self.timeout, phase=phase)
+
+    def result(self) -> Any:
+        """Block until the tool finishes and return its result.
+
+        :raises ToolTimeoutError: if it does not finish by the deadline.
+        """
+        if self._inline is not None:
+            self._run_inline()
+            return self.future.result()
+        try:
+            return self.future.result(timeout=self._remaining())
+        except FutureTimeoutError:
+            raise self._timed_out() from None
+
+    async def aresult(self) -> Any:
+        """Await the tool's result without blocking the event loop."""
+        if self._inline is not None and self._inline_task is None:
+            # a worker thread, so a slow inline tool cannot stall the loop
+            self._inline_task = asyncio.ensure_future(asyncio.to_thread(self._run_inline))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self.future), self._remaining())
+        except asyncio.TimeoutError:
+            raise self._timed_out() from None
+
+
+class ToolExecutor:
+    """Runs tool calls off the caller's thread, with per-tool timeouts and
+    concurrency limits.
+
+    I/O-bound tools share a thread pool and CPU-bound ones (``"execution":
+    "process"``) a process pool, so a slow tool only ties up a worker of
+    its pool instead of the query (or the whole process). A call that
+    exceeds its timeout raises :class:`ToolTimeoutError`.
+
+    Threads cannot be killed: a timed-out thread-pool call runs to
+    completion in the background and keeps its concurrency slot (bounded by
+    ``max_concurrency``) until it does. A timed-out process-pool call
+    retires its pool instead: later calls start a fresh pool, and the old
+    one's worker processes are terminated as soon as its other in-flight
+    calls have finished, which also frees the stuck call's slot.
+    """
+
+    def __init__(
+        self,
+        thread_workers: int = THREAD_WORKERS,
+        process_workers: int = PROCESS_WORKERS,
+        default_timeout: float = DEFAULT_TOOL_TIMEOUT,
+    ) -> None:
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.default_timeout = default_timeout
+        self._lock = threading.Lock()
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._semaphores: Dict[Tuple[str, int], _Slots] = {}
+        # in-flight and timed-out futures of each live or retired process pool
+        self._process_calls: Dict[ProcessPoolExecutor, Set[Future]] = {}
+        self._stuck: Dict[ProcessPoolExecutor, Set[Future]] = {}
+        self.timeouts = 0
+        self.killed_pools = 0
+
+    # ---- Pools ------------------------------------------------------------
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="tool")
+            return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                # spawn: forking a process that already runs HTTP client threads is unsafe
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.process_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._processes
+
+    def _track(self, pool: ProcessPoolExecutor, future: Future) -> None:
+        with self._lock:
+            self._process_calls.setdefault(pool, set()).add(future)
+
+        def done(_: Future) -> None:
+            with self._lock:
+                calls = self._process_calls.get(pool)
+                if calls is not None:
+                    calls.discard(future)
+            self._reap(pool)
+
+        future.add_done_callback(done)
+
+    def _retire(self, pool: ProcessPoolExecutor, future: Future) -> None:
+        """Stop handing work to *pool*, whose worker is stuck on *future*."""
+        with self._lock:
+            if self._processes is pool:
+                self._processes = None
+            self._stuck.setdefault(pool, set()).add(future)
+        self._reap(pool)
+
+    def _reap(self, pool: ProcessPoolExecutor) -> None:
+        """Terminate a retired *pool* once only its stuck calls are left."""
+        with self._lock:
+            stuck = self._stuck.get(pool)
+            if stuck is None or not self._process_calls.get(pool, set()) <= stuck:
+                return
+            del self._stuck[pool]
+            self._process_calls.pop(pool, None)
+        self._kill(pool)
+
+    def _kill(self, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            self.killed_pools += 1
+        # ProcessPoolExecutor has no public way to stop a busy worker; the
+        # stuck futures then fail with BrokenProcessPool, releasing their slots
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _slots(self, tool: str, limit: Optional[int]) -> Optional[_Slots]:
+        if not limit:
+            return None
+        with self._lock:
+            # keyed by the limit too, so an edited max_concurrency takes effect
+            return self._semaphores.setdefault((tool, limit), _Slots(limit))
+
+    # ---- Calls ------------------------------------------------------------
+    def policy(self, tool: Callable) -> ToolPolicy:
+        capability = tool.capability if isinstance(tool, LazyTool) else None
+        return ToolPolicy.from_capability(capability, self.default_timeout)
+
+    def submit(self, tool: Callable, kwargs: Dict[str, Any]) -> ToolCall:
+        """Start ``tool(**kwargs)`` according to its policy without waiting for it.
+
+        Calls over the tool's ``max_concurrency`` queue for a slot without
+        holding a thread. Inline tools run once the call is waited for.
+        """
+        name = getattr(tool, "name", None) or getattr(tool, "__name__", repr(tool))
+        if isinstance(tool, LazyTool):
+            tool.resolve()  # policy and cache settings come with the module
+        policy = self.policy(tool)
+        call = ToolCall(self, name, policy.timeout)
+        if policy.mode == "inline":
+            call._inline = functools.partial(tool, **kwargs)
+            return call
+
+        if policy.mode == "process" and isinstance(tool, LazyTool):
+            # the cache and usage counts stay in this process
+            def in_process(**kw) -> Future:
+                args = (tool.name, tool.file_path, tool.module_name, kw)
+                return self._start(call, policy, self._process_pool(), _call_in_process, args, {})
+
+            call.future = tool.invoke_future(in_process, kwargs)
+            return call
+        self._start(call, policy, self._thread_pool(), contextvars.copy_context().run, (tool,), kwargs)
+        return call
+
+    def run(self, tool: Callable, kwargs: Dict[str, Any]) -> Any:
+        """Call ``tool(**kwargs)`` according to its policy and return the result.
+
+        :raises ToolTimeoutError: if no concurrency slot frees up or the
+            call does not finish within the tool's timeout.
+        """
+        return self.submit(tool, kwargs).result()
+
+    def _start(
+        self,
+        call: ToolCall,
+        policy: ToolPolicy,
+        pool: Executor,
+        fn: Callable,
+        args: tuple,
+        kwargs: Dict[str, Any],
+    ) -> Future:
+        """Submit ``fn(*args, **kwargs)`` once *call* holds a concurrency slot;
+        its outcome is copied to ``call.future``, which is returned."""
+        slots = self._slots(call.name, policy.max_concurrency)
+        outer = call.future
+
+        def finish(worker: Future) -> None:
+            if slots is not None:
+                slots.release()
+            if worker.cancelled():
+                return
+            error = worker.exception()
+            if error is not None:
+                outer.set_exception(error)
+            else:
+                outer.set_result(worker.result())
+
+        def start() -> None:
+            if not outer.set_running_or_notify_cancel():
+                # timed out while waiting: pass the slot on
+                if slots is not None:
+                    slots.release()
+                return
+            call.started = True
+            call._pool = pool
+            try:
+                call._worker = pool.submit(fn, *args, **kwargs)
+            except BaseException as e:
+                if slots is not None:
+                    slots.release()
+                outer.set_exception(e)
+                return
+            if isinstance(pool, ProcessPoolExecutor):
+                self._track(pool, call._worker)
+            call._worker.add_done_callback(finish)
+
+        if slots is None:
+            start()
+        else:
+            slots.acquire(call, start)
+        return outer
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pools = [p for p in (self._threads, self._processes) if p is not None]
+            self._threads = self._processes = None
+            retired = list(self._stuck)
+            self._stuck.clear()
+            self._process_calls.clear()
+        for pool in retired:
+            self._kill(pool)
+        for pool in pools:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_default_executor: Optional[ToolExecutor] = None
+_default_lock = threading.Lock()
+
+
+def get_tool_executor() -> ToolExecutor:
+    """Process-wide executor shared by every task, so pools and per-tool
+    concurrency limits apply across concurrent queries."""
+    global _default_executor
+    with _default_lock:
+        if _default_executor is None:
+            _default_executor = ToolExecutor()
+        return _default_executor
+
+
+def submit_tool(tool: Callable, kwargs: Dict[str, Any]) -> ToolCall:
+    """Start ``tool(**kwargs)`` on the shared :class:`ToolExecutor`."""
+    return get_tool_executor().submit(tool, kwargs)
+
+
+def run_tool(tool: Callable, kwargs: Dict[str, Any]) -> Any:
+    """Run ``tool(**kwargs)`` on the shared :class:`ToolExecutor`."""
+    return get_tool_executor().run(tool, kwargs)
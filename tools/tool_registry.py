@@ -0,0 +1,353 @@
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from agent.validation import ArgumentValidator
+from tools.result_cache import DEFAULT_RESULT_CACHE_SIZE, ToolResultCache, cache_policy
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CAPABILITIES_FOLDER = os.path.join(BASE_DIR, "VectorRoute-Tools", "capabilities")
+DEFAULT_FUNCTIONS_FOLDER = os.path.join(BASE_DIR, "VectorRoute-Tools", "functions")
+DEFAULT_USAGE_PATH = os.path.join(BASE_DIR, "embedding_db", "tool_usage.json")
+
+
+class LazyTool:
+    """Callable stand-in for a tool function that imports its module on first use.
+
+    Loading happens once, under a per-tool lock, so concurrent first calls
+    import the module a single time. ``__wrapped__`` resolves to the real
+    function, which keeps ``inspect.signature`` working on the proxy. The
+    argument validator is compiled alongside the function, from its
+    signature and the parameter types in the capability JSON. Tools whose
+    capability JSON sets ``"cacheable": true`` (and ``"ttl_seconds"``)
+    have their results cached in the registry's :class:`ToolResultCache`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        file_path: str,
+        module_name: str,
+        registry: Optional["ToolRegistry"] = None,
+        capability_path: Optional[str] = None,
+    ) -> None:
+        self.__name__ = name
+        self.name = name
+        self.file_path = file_path
+        self.module_name = module_name
+        self.capability_path = capability_path
+        self._registry = registry
+        self._lock = threading.Lock()
+        self._func: Optional[Callable] = None
+        self._validator: Optional[ArgumentValidator] = None
+        self._capability: Optional[dict] = None
+        self.cache_ttl: Optional[float] = None
+        self.file_hash: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.import_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._func is not None
+
+    def _import(self) -> Callable:
+        spec = importlib.util.spec_from_file_location(self.module_name, self.file_path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Cannot load tool module from {self.file_path}")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        # Prefer attribute with same name
+        attr = getattr(module, self.name, None)
+        if callable(attr):
+            return attr
+
+        # Fallback: first public callable in module
+        for attr_name in dir(module):
+            if attr_name.startswith("_"):
+                continue
+            candidate = getattr(module, attr_name)
+            if callable(candidate):
+                print(f"Registered tool {self.name} with fallback callable {attr_name}")
+                return candidate
+        raise ImportError(f"No callable found in {self.file_path}")
+
+    def resolve(self) -> Callable:
+        """Return the real function, importing its module the first time."""
+        func = self._func
+        if func is not None:
+            return func
+        with self._lock:
+            if self._func is None:
+                if self.error is not None:
+                    raise ImportError(f"Tool '{self.name}' failed to import: {self.error}") from self.error
+                start = time.perf_counter()
+                try:
+                    func = self._import()
+                    self._capability = self._read_capability()
+                    self.cache_ttl = cache_policy(self._capability)
+                    if self.cache_ttl is not None:
+                        # results are keyed by the code that produced them
+                        with open(self.file_path, "rb") as f:
+                            self.file_hash = hashlib.file_digest(f, "sha256").hexdigest()
+                    self._func = func
+                except Exception as e:
+                    self.error = e
+                    print(f"WARNING: Failed to import tool {self.name} from {self.file_path}: {e}")
+                    raise ImportError(f"Tool '{self.name}' failed to import: {e}") from e
+                finally:
+                    self.import_seconds = time.perf_counter() - start
+            return self._func
+
+    def _read_capability(self) -> Optional[dict]:
+        if not self.capability_path:
+            return None
+        try:
+            with open(self.capability_path) as f:
+                capability = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return capability if isinstance(capability, dict) else None
+
+    @property
+    def validator(self) -> ArgumentValidator:
+        """Argument validator for this tool, compiled on first use."""
+        validator = self._validator
+        if validator is not None:
+            return validator
+        func = self.resolve()
+        with self._lock:
+            if self._validator is None:
+                parameters = ((self._capability or {}).get("function") or {}).get("parameters")
+                self._validator = ArgumentValidator(func, parameters)
+            return self._validator
+
+    def reset(self) -> None:
+        """Forget the loaded function and validator (and any import error)
+        so the next call re-imports."""
+        with self._lock:
+            self._func = None
+            self._validator = None
+            self._capability = None
+            self.cache_ttl = None
+            self.file_hash = None
+            self.error = None
+            self.import_seconds = None
+
+    @property
+    def __wrapped__(self) -> Callable:
+        return self.resolve()
+
+    @property
+    def capability(self) -> Optional[dict]:
+        """The capability JSON read when the tool was loaded."""
+        self.resolve()
+        return self._capability
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.invoke(self.resolve(), args, kwargs)
+
+    def invoke(self, func: Callable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        """Call *func* (the tool itself, or a stand-in running it elsewhere)
+        with this tool's usage counting and result caching."""
+        self.resolve()
+        registry = self._registry
+        if registry is None:
+            return func(*args, **kwargs)
+        registry.record_call(self.name)
+        if self.cache_ttl is not None:
+            return registry.result_cache.call(self.name, self.file_hash, self.cache_ttl, func, args, kwargs)
+        return func(*args, **kwargs)
+
+    def invoke_future(self, start: Callable[..., Future], kwargs: Dict[str, Any]) -> Future:
+        """:meth:`invoke` for a *start* that runs the tool elsewhere and
+        returns a future; a cached result comes back as a finished future."""
+        self.resolve()
+        registry = self._registry
+        if registry is None:
+            return start(**kwargs)
+        registry.record_call(self.name)
+        if self.cache_ttl is not None:
+            return registry.result_cache.call_future(self.name, self.file_hash, self.cache_ttl, start, kwargs)
+        return start(**kwargs)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else ("failed" if self.error else "lazy")
+        return f"<LazyTool {self.name} ({state}) {self.file_path}>"
+
+
+class ToolRegistry(dict):
+    """``{tool_name: LazyTool}`` plus usage counts, pre-warming, an import
+    report and the shared result cache of cacheable tools.
+
+    Behaves like the plain ``{name: callable}`` dict it replaces.
+    """
+
+    def __init__(
+        self,
+        usage_path: Optional[str] = DEFAULT_USAGE_PATH,
+        capabilities_folder: Optional[str] = None,
+        functions_folder: Optional[str] = None,
+        result_cache_size: int = DEFAULT_RESULT_CACHE_SIZE,
+    ) -> None:
+        super().__init__()
+        self.result_cache = ToolResultCache(result_cache_size)
+        self.usage_path = usage_path
+        self.capabilities_folder = capabilities_folder or DEFAULT_CAPABILITIES_FOLDER
+        self.functions_folder = functions_folder or DEFAULT_FUNCTIONS_FOLDER
+        self._usage_lock = threading.Lock()
+        self.usage: Counter = Counter(self._load_usage())
+        self._prewarm_thread: Optional[threading.Thread] = None
+
+    # ---- Usage counts -----------------------------------------------------
+    def _load_usage(self) -> Dict[str, int]:
+        if not self.usage_path or not os.path.exists(self.usage_path):
+            return {}
+        try:
+            with open(self.usage_path) as f:
+                return {k: int(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def record_call(self, name: str) -> None:
+        with self._usage_lock:
+            self.usage[name] += 1
+
+    def save_usage(self) -> None:
+        """Persist call counts so the next session can pre-warm the busiest tools."""
+        if not self.usage_path:
+            return
+        with self._usage_lock:
+            usage = dict(self.usage)
+        os.makedirs(os.path.dirname(os.path.abspath(self.usage_path)), exist_ok=True)
+        with open(self.usage_path, "w") as f:
+            json.dump(usage, f)
+
+    # ---- Loading ----------------------------------------------------------
+    def most_used(self, n: int) -> List[str]:
+        with self._usage_lock:
+            return [name for name, _ in self.usage.most_common() if name in self][:n]
+
+    def prewarm(self, names: Optional[Iterable[str]] = None, top_n: int = 8, background: bool = True) -> Optional[threading.Thread]:
+        """Import *names* (default: the *top_n* most used tools) ahead of
+        their first call, on a daemon thread unless *background* is false."""
+        names = list(names) if names is not None else self.most_used(top_n)
+        if not names:
+            return None
+
+        def load_all() -> None:
+            for name in names:
+                tool = self.get(name)
+                if isinstance(tool, LazyTool):
+                    try:
+                        tool.resolve()
+                    except ImportError:
+                        pass  # recorded on the proxy, shown in import_report()
+
+        if not background:
+            load_all()
+            return None
+        self._prewarm_thread = threading.Thread(target=load_all, name="tool-prewarm", daemon=True)
+        self._prewarm_thread.start()
+        return self._prewarm_thread
+
+    def invalidate(self, names: Iterable[str]) -> None:
+        """Drop the loaded functions, validators and cached results of
+        *names* (e.g. tools reported modified)."""
+        for name in names:
+            self.result_cache.invalidate(name)
+            tool = self.get(name)
+            if isinstance(tool, LazyTool):
+                tool.reset()
+
+    def apply_changes(self, changes: Dict[str, List[str]]) -> None:
+        """Bring the registry in line with a :meth:`FileTracker.get_file_changes` result.
+
+        Modified tools are reloaded on their next call, deleted ones are
+        dropped and added ones are picked up from the tool folders.
+        """
+        self.invalidate(changes.get("modified", []))
+        for name in changes.get("deleted", []):
+            self.result_cache.invalidate(name)
+            self.pop(name, None)
+        if changes.get("added"):
+            fresh = build_tool_registry(self.capabilities_folder, self.functions_folder, usage_path=None)
+            for name in changes["added"]:
+                tool = fresh.get(name)
+                if tool is not None:
+                    tool._registry = self
+                    self[name] = tool
+
+    def import_report(self) -> List[Dict[str, Any]]:
+        """Per-tool import status: ``{tool, loaded, import_s, error, calls}``, slowest first."""
+        rows = [
+            {
+                "tool": name,
+                "loaded": tool.loaded,
+                "import_s": tool.import_seconds,
+                "error": repr(tool.error) if tool.error else None,
+                "calls": self.usage.get(name, 0),
+            }
+            for name, tool in self.items()
+            if isinstance(tool, LazyTool)
+        ]
+        rows.sort(key=lambda r: (r["error"] is None, -(r["import_s"] or 0.0)))
+        return rows
+
+    def print_import_report(self, limit: int = 20) -> None:
+        rows = self.import_report()
+        loaded = sum(r["loaded"] for r in rows)
+        failed = [r for r in rows if r["error"]]
+        print(f"Tool imports: {loaded}/{len(rows)} loaded, {len(failed)} failed")
+        for row in rows[:limit]:
+            if row["error"]:
+                print(f"  FAILED {row['tool']}: {row['error']}")
+            elif row["loaded"]:
+                print(f"  {row['tool']:<40} {row['import_s'] * 1000:8.2f} ms  calls={row['calls']}")
+
+
+def build_tool_registry(
+    capabilities_folder: Optional[str] = None,
+    functions_folder: Optional[str] = None,
+    usage_path: Optional[str] = DEFAULT_USAGE_PATH,
+) -> ToolRegistry:
+    """Build a lazy registry of every tool that has both a `.json`
+    capability and a `.py` function file on disk. Nothing is imported here;
+    only the folders are listed."""
+    capabilities_folder = capabilities_folder or DEFAULT_CAPABILITIES_FOLDER
+    functions_folder = functions_folder or DEFAULT_FUNCTIONS_FOLDER
+
+    json_paths = {}
+    for root, _, files in os.walk(capabilities_folder):
+        for fn in files:
+            if fn.endswith(".json"):
+                json_paths[os.path.splitext(fn)[0]] = os.path.join(root, fn)
+
+    registry = ToolRegistry(usage_path, capabilities_folder, functions_folder)
+    for root, _, files in os.walk(functions_folder):
+        for fn in files:
+            if not fn.endswith(".py") or fn.startswith("_"):
+                continue
+            tool_name = os.path.splitext(fn)[0]
+            if tool_name not in json_paths:
+                continue
+            py_path = os.path.join(root, fn)
+            module_name = os.path.splitext(os.path.relpath(py_path, functions_folder))[0].replace(os.sep, ".")
+            registry[tool_name] = LazyTool(tool_name, py_path, module_name, registry, json_paths[tool_name])
+
+    print(f"Built lazy tool registry with {len(registry)} tools")
+    return registry
+
+
+def update_tool_registry(
+    capabilities_folder: Optional[str] = None,
+    functions_folder: Optional[str] = None,
+) -> ToolRegistry:
+    """Build the lazy tool registry for the default (or given) tool folders."""
+    return build_tool_registry(capabilities_folder, functions_folder)